@@ -0,0 +1,41 @@
+import pandas as pd
+import trazas
+
+# --- AGREGADOS EN LA BASE ---
+# Envoltorios de las funciones RPC de sql/003_agregados.sql: los filtros viajan como
+# parámetros y solo vuelven las filas agrupadas. 'Todos' o None = sin filtro.
+# Se llaman por sus variantes *_json (sql/005_agregados_json.sql): un solo valor que el
+# max-rows de PostgREST no corta, así el agregado se calcula una sola vez por consulta.
+
+COLUMNAS_PARETO = ['producto_final', 'gasto_total', 'porcentaje', 'acumulado', 'categoria']
+COLUMNAS_PRECIOS = ['cadena', 'producto_final', 'compras', 'precio_promedio', 'precio_min', 'precio_max']
+
+
+def _param(valor):
+    if valor is None or valor == 'Todos': return None
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def _rpc(supabase, nombre, params):
+    with trazas.tramo(f"rpc {nombre}") as t:
+        filas = supabase.rpc(f"{nombre}_json", params).execute().data or []
+        t['filas'] = len(filas)
+    return filas
+
+
+def pareto(supabase, desde=None, hasta=None, rubro=None, tipo=None, user_id=None):
+    # Gasto por producto con % y % acumulado y clase ABC, ordenado de mayor a menor gasto
+    filas = _rpc(supabase, 'pareto_productos', {
+        'p_desde': _param(desde), 'p_hasta': _param(hasta), 'p_rubro': _param(rubro),
+        'p_tipo': _param(tipo), 'p_user_id': _param(user_id),
+    })
+    return pd.DataFrame(filas, columns=COLUMNAS_PARETO)
+
+
+def precios_por_cadena(supabase, desde=None, hasta=None, rubro=None, tipo=None, producto=None, por_producto=False):
+    # Precio promedio/mínimo/máximo y cantidad de compras por cadena (y producto si por_producto)
+    filas = _rpc(supabase, 'precios_por_cadena', {
+        'p_desde': _param(desde), 'p_hasta': _param(hasta), 'p_rubro': _param(rubro),
+        'p_tipo': _param(tipo), 'p_producto': _param(producto), 'p_por_producto': por_producto,
+    })
+    return pd.DataFrame(filas, columns=COLUMNAS_PRECIOS)
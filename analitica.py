@@ -0,0 +1,274 @@
+import os
+import json
+import threading
+import pandas as pd
+import backend
+import busqueda
+import cadenas
+import datos
+import graficos
+import trazas
+
+# --- MOTOR ANALÍTICO (DuckDB, opcional) ---
+# Copia columnar del espejo (solo items con precio > 0, con cadena y tipo ya resueltos) en un
+# archivo DuckDB. Los filtros, el gasto por mes y cadena, el Pareto y el historial de un producto
+# se resuelven como SQL: DuckDB agrega en paralelo sobre las columnas y a la página llegan solo
+# las filas del resultado, sin armar un DataFrame del historial por sesión.
+# Se activa con MOTOR_ANALISIS=duckdb (secrets o .env) y el paquete duckdb instalado; si no,
+# las páginas siguen con el índice en pandas (filtros.IndiceFiltros).
+# Un archivo DuckDB solo admite un proceso escritor: worker.py no lo abre.
+
+RUTA_DUCKDB = os.environ.get("RUTA_DUCKDB") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "analisis.duckdb")
+HILOS = int(os.environ.get("ANALITICA_HILOS", 0))  # 0 = todos los núcleos
+LOTE = 200_000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id VARCHAR, user_id VARCHAR, fecha DATE, supermercado_nombre VARCHAR, cadena VARCHAR, tipo_comercio VARCHAR,
+    sucursal_localidad VARCHAR, producto_final VARCHAR, rubro VARCHAR, marca VARCHAR,
+    cantidad DOUBLE, precio_neto_unitario DOUBLE, gasto_total DOUBLE, ticket_id VARCHAR
+);
+CREATE TABLE IF NOT EXISTS meta (clave VARCHAR PRIMARY KEY, valor VARCHAR);
+"""
+COLUMNAS = ['id', 'user_id', 'fecha', 'supermercado_nombre', 'cadena', 'tipo_comercio', 'sucursal_localidad',
+            'producto_final', 'rubro', 'marca', 'cantidad', 'precio_neto_unitario', 'gasto_total', 'ticket_id']
+TEXTO = {'user_id', 'supermercado_nombre', 'cadena', 'tipo_comercio', 'sucursal_localidad', 'producto_final', 'rubro', 'marca'}
+
+_con = None
+_lock = threading.Lock()
+_version = None  # versión GLOBAL de datos ya copiada
+
+
+def activo():
+    if (backend.clave("MOTOR_ANALISIS") or '').lower() != 'duckdb': return False
+    import importlib.util
+    return importlib.util.find_spec('duckdb') is not None
+
+
+def _conexion():
+    global _con
+    if _con is None:
+        import duckdb
+        os.makedirs(os.path.dirname(RUTA_DUCKDB), exist_ok=True)
+        _con = duckdb.connect(RUTA_DUCKDB)
+        if HILOS: _con.execute(f"SET threads = {HILOS}")
+        _con.execute(ESQUEMA)
+        _con.execute("ALTER TABLE items ADD COLUMN IF NOT EXISTS ticket_id VARCHAR")  # archivos anteriores a la columna
+    return _con
+
+
+def _cursor():
+    # Un cursor por consulta: DuckDB no comparte una misma conexión entre hilos
+    with _lock: return _conexion().cursor()
+
+
+# --- CARGA INCREMENTAL DESDE EL ESPEJO ---
+def _leer_meta(con, clave):
+    fila = con.execute("SELECT valor FROM meta WHERE clave = ?", [clave]).fetchone()
+    return json.loads(fila[0]) if fila else None
+
+
+def _guardar_meta(con, clave, valor):
+    con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", [clave, json.dumps(valor)])
+
+
+def _copiar(con, marca, ultimo_id):
+    # Filas del espejo posteriores a (marca, ultimo_id), por lotes. Devuelve la nueva marca de agua.
+    # Como datos.sincronizar, se relee SOLAPE_SYNC antes de la marca (el espejo puede recibir filas
+    # con created_at anterior a la última copiada) y se saltean los ids que ya están.
+    sql = ("SELECT id, created_at, CAST(ticket_id AS TEXT) AS ticket_id, user_id, fecha, supermercado_nombre, sucursal_localidad, "
+           "coalesce(producto_generico, nombre_producto) AS producto_final, rubro, marca, cantidad, precio_neto_unitario FROM items")
+    params = []
+    if marca is not None:
+        sql += " WHERE created_at >= ?"
+        params = [datos._con_solape(marca)]
+    sql += " ORDER BY created_at, id"
+    with datos._lock:
+        espejo = datos._conectar()
+        try:
+            for df in pd.read_sql_query(sql, espejo, params=params, chunksize=LOTE):
+                if df.empty: continue
+                marca, ultimo_id = df['created_at'].iloc[-1], df['id'].tolist()[-1]
+                df = df[df['precio_neto_unitario'] > 0]
+                cadena = cadenas.columna_cadena(df['supermercado_nombre'])
+                lote = df.drop(columns='created_at').assign(
+                    id=df['id'].astype(str), ticket_id=df['ticket_id'].astype(str), fecha=pd.to_datetime(df['fecha'], errors='coerce'),
+                    cadena=cadena.astype(str), tipo_comercio=cadenas.columna_tipo(cadena).astype(str),
+                )
+                con.register('lote', lote)
+                columnas = [c for c in COLUMNAS if c != 'gasto_total']
+                con.execute(f"INSERT INTO items ({', '.join(columnas)}, gasto_total) SELECT {', '.join(columnas)}, "
+                            "precio_neto_unitario * cantidad FROM lote" + (" WHERE id NOT IN (SELECT id FROM items)" if params else ""))
+                con.unregister('lote')
+        finally: espejo.close()
+    return marca, ultimo_id
+
+
+def _del_espejo(sql, params=()):
+    with datos._lock:
+        espejo = datos._conectar()
+        try: return espejo.execute(sql, params).fetchall()
+        finally: espejo.close()
+
+
+def _quitar_borrados(con, seq):
+    # Tickets borrados del espejo desde 'seq' (datos.borrar_ticket_local): se quitan solo sus filas
+    filas = _del_espejo("SELECT seq, CAST(ticket_id AS TEXT) FROM borrados WHERE seq > ? ORDER BY seq", (seq or 0,))
+    if not filas: return seq, 0
+    tickets = [f[1] for f in filas]
+    antes = con.execute("SELECT count(*) FROM items").fetchone()[0]
+    con.execute("DELETE FROM items WHERE ticket_id IN (SELECT unnest(?::VARCHAR[]))", [tickets])
+    return filas[-1][0], antes - con.execute("SELECT count(*) FROM items").fetchone()[0]
+
+
+def actualizar(supabase):
+    # Sincroniza el espejo y copia a DuckDB lo que falte. Con la misma versión de datos no hace nada.
+    global _version
+    version = datos.version(supabase)
+    if version == _version: return
+    with _lock:
+        if version == _version: return
+        con = _conexion()
+        with trazas.tramo('analitica actualizar') as t:
+            nueva_marca, ultimo_id = _copiar(con, _leer_meta(con, 'marca'), _leer_meta(con, 'ultimo_id'))
+            seq, t['borradas'] = _quitar_borrados(con, _leer_meta(con, 'borrados'))
+            # Red de seguridad (espejo rearmado, archivo sin ticket_id): si los conteos no cierran se recarga todo
+            espejo = _del_espejo("SELECT count(*) FROM items WHERE precio_neto_unitario > 0")[0][0]
+            if con.execute("SELECT count(*) FROM items").fetchone()[0] != espejo:
+                con.execute("DELETE FROM items")
+                nueva_marca, ultimo_id = _copiar(con, None, None)
+                seq = (_del_espejo("SELECT max(seq) FROM borrados")[0][0]) or seq
+                t['recarga'] = True
+            _guardar_meta(con, 'marca', nueva_marca)
+            _guardar_meta(con, 'ultimo_id', ultimo_id)
+            _guardar_meta(con, 'borrados', seq)
+            con.execute("CHECKPOINT")
+            t['filas'] = con.execute("SELECT count(*) FROM items").fetchone()[0]
+        _version = version
+
+
+# --- CONSULTAS ---
+class Vista:
+    # Mismas consultas que usan las páginas sobre filtros.IndiceFiltros (valores, fechas) más los
+    # agregados de graficos / agregados, resueltos en DuckDB. 'nombres' traduce nombres de columna
+    # de la página a los de la tabla ({'cadena_comercial': 'cadena'}); 'rubro_nulo' es el rubro de
+    # los items sin clasificar y 'user_id' limita todo a un socio.
+    def __init__(self, supabase, rubro_nulo='Otros', user_id=None, nombres=None):
+        actualizar(supabase)
+        self.rubro_nulo, self.user_id = rubro_nulo, str(user_id) if user_id else None
+        self.nombres = nombres or {}
+        self._fechas = None
+
+    def _col(self, nombre):
+        col = self.nombres.get(nombre, nombre)
+        if col not in COLUMNAS: raise ValueError(f"Columna desconocida: {nombre}")
+        return col
+
+    def _desde(self, desde=None, hasta=None, texto='', columnas_texto=None, **filtros):
+        # FROM + WHERE con parámetros nombrados (se le pueden sumar condiciones con AND).
+        # 'Todos' o None = sin filtro, como en IndiceFiltros.
+        condiciones, params = ['true'], {'rubro_nulo': self.rubro_nulo}
+        if self.user_id:
+            condiciones.append("user_id = $user_id"); params['user_id'] = self.user_id
+        if desde is not None:
+            condiciones.append("fecha >= $desde"); params['desde'] = pd.Timestamp(desde).date()
+        if hasta is not None:
+            condiciones.append("fecha <= $hasta"); params['hasta'] = pd.Timestamp(hasta).date()
+        for i, (nombre, valor) in enumerate(filtros.items()):
+            if valor is None or valor == 'Todos': continue
+            condiciones.append(f"{self._col(nombre)} = $f{i}"); params[f'f{i}'] = valor
+        texto = busqueda.normalizar(texto)
+        if texto:
+            # Igual que tablas.posiciones_tabla: texto normalizado (busqueda.normalizar) en alguna columna de texto
+            cols = [self._col(c) for c in (columnas_texto or []) if self._col(c) in TEXTO] or ['producto_final']
+            condiciones.append('(' + ' OR '.join(f"trim(regexp_replace(strip_accents(lower({c})), '[^a-z0-9]+', ' ', 'g')) LIKE $texto" for c in cols) + ')')
+            params['texto'] = f"%{texto}%"
+        return "FROM (SELECT * REPLACE (coalesce(rubro, $rubro_nulo) AS rubro) FROM items) WHERE " + " AND ".join(condiciones), params
+
+    def _df(self, nombre, sql, params):
+        with trazas.tramo(f"duckdb {nombre}") as t:
+            df = _cursor().execute(sql, params).df()
+            t['filas'] = len(df)
+        return df
+
+    @property
+    def fecha_min(self):
+        return self._rango()[0]
+
+    @property
+    def fecha_max(self):
+        return self._rango()[1]
+
+    def _rango(self):
+        if self._fechas is None:
+            sql, params = self._desde()
+            fila = self._df('fechas', f"SELECT min(fecha) AS min, max(fecha) AS max {sql}", params).iloc[0]
+            self._fechas = tuple(None if pd.isna(v) else pd.Timestamp(v) for v in fila)
+        return self._fechas
+
+    def valores(self, columna, desde=None, hasta=None, **filtros):
+        col = self._col(columna)
+        sql, params = self._desde(desde, hasta, **filtros)
+        return self._df('valores', f"SELECT DISTINCT {col} AS v {sql} AND {col} IS NOT NULL ORDER BY 1", params)['v'].tolist()
+
+    def totales(self, desde=None, hasta=None, **filtros):
+        sql, params = self._desde(desde, hasta, **filtros)
+        fila = self._df('totales', f"SELECT count(*) AS filas, coalesce(sum(gasto_total), 0) AS gasto, coalesce(sum(cantidad), 0) AS unidades {sql}", params).iloc[0]
+        return {'filas': int(fila['filas']), 'gasto': float(fila['gasto']), 'unidades': float(fila['unidades'])}
+
+    def _serie(self, color, desde, hasta, filtros):
+        # Las MAX_SERIES categorías con más gasto con nombre propio; el resto (y los nulos) como OTRAS
+        col = self._col(color)
+        sql, params = self._desde(desde, hasta, **filtros)
+        params['max_series'], params['otras'] = graficos.MAX_SERIES, graficos.OTRAS
+        base = (f"WITH f AS (SELECT fecha, {col} AS serie, gasto_total {sql}), "
+                "top AS (SELECT serie FROM f WHERE serie IS NOT NULL GROUP BY serie ORDER BY sum(gasto_total) DESC LIMIT $max_series), "
+                "g AS (SELECT fecha, CASE WHEN serie IN (SELECT serie FROM top) THEN serie ELSE $otras END AS serie, gasto_total FROM f) ")
+        return base, params
+
+    def gasto_por_mes(self, color, desde=None, hasta=None, **filtros):
+        # Como graficos.gasto_por_mes: una fila por (mes, color) con la suma del gasto
+        base, params = self._serie(color, desde, hasta, filtros)
+        df = self._df('gasto_por_mes', base + "SELECT CAST(date_trunc('month', fecha) AS TIMESTAMP) AS mes, serie, sum(gasto_total) AS gasto_total "
+                      "FROM g WHERE fecha IS NOT NULL GROUP BY ALL ORDER BY mes, serie", params)
+        return df.rename(columns={'serie': color})
+
+    def gasto_por(self, color, desde=None, hasta=None, **filtros):
+        base, params = self._serie(color, desde, hasta, filtros)
+        df = self._df('gasto_por', base + "SELECT serie, sum(gasto_total) AS gasto_total FROM g GROUP BY ALL ORDER BY gasto_total DESC", params)
+        return df.rename(columns={'serie': color})
+
+    def pareto(self, desde=None, hasta=None, **filtros):
+        # Misma salida que agregados.pareto (sql/003_agregados.sql), calculado sobre el archivo local
+        sql, params = self._desde(desde, hasta, **filtros)
+        return self._df('pareto', f"""
+            WITH g AS (SELECT producto_final, sum(gasto_total) AS gasto_total {sql} GROUP BY producto_final),
+            p AS (SELECT producto_final, gasto_total, 100 * gasto_total / sum(gasto_total) OVER () AS porcentaje,
+                         100 * sum(gasto_total) OVER (ORDER BY gasto_total DESC, producto_final ROWS UNBOUNDED PRECEDING)
+                             / sum(gasto_total) OVER () AS acumulado FROM g)
+            SELECT producto_final, gasto_total, porcentaje, acumulado,
+                   CASE WHEN acumulado <= 80 THEN 'A - Vital (80% Gasto)' WHEN acumulado <= 95 THEN 'B - Importante' ELSE 'C - Trivial' END AS categoria
+            FROM p ORDER BY gasto_total DESC, producto_final""", params)
+
+    def precios_por_cadena(self, producto=None, por_producto=False, desde=None, hasta=None, **filtros):
+        # Misma salida que agregados.precios_por_cadena
+        sql, params = self._desde(desde, hasta, producto_final=producto, **filtros)
+        prod = 'producto_final' if por_producto else 'NULL'
+        return self._df('precios_por_cadena', f"SELECT cadena, {prod} AS producto_final, count(*) AS compras, avg(precio_neto_unitario) AS precio_promedio, "
+                        f"min(precio_neto_unitario) AS precio_min, max(precio_neto_unitario) AS precio_max {sql} GROUP BY ALL ORDER BY precio_promedio", params)
+
+    def filas(self, columnas, orden=None, ascendente=True, limite=None, offset=0, texto='', columnas_texto=None, desde=None, hasta=None, **filtros):
+        # Filas con 'columnas' (nombres de la página). Para el historial de un producto o una página de tabla.
+        sql, params = self._desde(desde, hasta, texto, columnas_texto, **filtros)
+        select = ', '.join(f"{self._col(c)} AS \"{c}\"" for c in columnas)
+        if orden: sql += f" ORDER BY {self._col(orden)} {'ASC' if ascendente else 'DESC'} NULLS LAST, id"
+        if limite is not None:
+            sql += " LIMIT $limite OFFSET $offset"; params.update(limite=int(limite), offset=int(offset))
+        df = self._df('filas', f"SELECT {select} {sql}", params)
+        df.columns = columnas
+        if 'fecha' in df: df['fecha'] = pd.to_datetime(df['fecha'])
+        return df
+
+    def contar(self, texto='', columnas_texto=None, desde=None, hasta=None, **filtros):
+        sql, params = self._desde(desde, hasta, texto, columnas_texto, **filtros)
+        return int(self._df('contar', f"SELECT count(*) AS n {sql}", params)['n'].iloc[0])
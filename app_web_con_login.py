@@ -1,13 +1,9 @@
 import streamlit as st
 import time
-import json
-import re
-import os
-from PIL import Image
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from supabase import create_client, Client
+import backend
+import trazas
+import ingesta
+import cola
 
 # --- CONFIGURACIÓN VISUAL ---
 st.set_page_config(page_title="Club de Precios", page_icon="🛒", layout="wide", initial_sidebar_state="collapsed")
@@ -26,21 +22,18 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+trazas.iniciar("Inicio")  # tramos de esta ejecución (panel de perfilado para admins)
+
 # --- BACKEND ---
+# Clientes compartidos del proceso (backend.py): se crean una vez y se reusan en cada rerun
 try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    GOOGLE_KEY = st.secrets["GOOGLE_API_KEY"] if "GOOGLE_API_KEY" in st.secrets else os.environ.get("GOOGLE_API_KEY")
-
-    if not URL or not KEY or not GOOGLE_KEY:
-        st.error("❌ Faltan claves.")
-        st.stop()
-
-    supabase: Client = create_client(URL, KEY)
-    client = genai.Client(api_key=GOOGLE_KEY)
-    MODELO_IA = 'gemini-2.5-flash' 
+    supabase, client = backend.iniciar(con_gemini=True)
+    ingesta.precargar_supers(supabase)  # una vez por proceso
+    cola.iniciar_en_proceso(supabase, client)  # hilos de fondo, una vez por proceso
 
+except RuntimeError as e:
+    st.error(f"❌ {e}")
+    st.stop()
 except Exception as e:
     st.error(f"Error config: {e}")
     st.stop()
@@ -48,52 +41,6 @@ except Exception as e:
 PAISES_SOPORTADOS = ["Argentina", "Brasil", "Uruguay", "Chile", "Paraguay", "Bolivia", "Perú", "Colombia", "México", "España", "USA", "Otro"]
 CODIGOS_PAIS = {"Argentina 🇦🇷": "+549", "Brasil 🇧🇷": "+55", "Uruguay 🇺🇾": "+598", "Chile 🇨🇱": "+56", "México 🇲🇽": "+52", "Colombia 🇨🇴": "+57", "España 🇪🇸": "+34", "USA 🇺🇸": "+1", "Otro": "+"}
 
-RUBROS_VALIDOS = """
-- Almacén
-- Bebidas s/Alcohol
-- Bebidas c/Alcohol
-- Carnicería
-- Pescadería
-- Frutas y Verduras
-- Lácteos
-- Quesos y Fiambres
-- Panadería y Galletitas
-- Golosinas
-- Congelados y Helados
-- Comida Elaborada / Rotisería
-- Limpieza
-- Perfumería e Higiene
-- Farmacia
-- Bebés y Maternidad
-- Mascotas
-- Electro y Tecnología
-- Juguetería
-- Ropa y Calzado
-- Librería
-- Hogar, Muebles y Bazar
-- Ferretería y Herramientas
-- Automotor
-- Otros
-"""
-
-def limpiar_numero(valor):
-    if not valor: return 0.0
-    if isinstance(valor, (int, float)): return float(valor)
-    texto = str(valor).replace('$', '').replace('kg', '').replace('lt', '').replace('un', '').strip()
-    texto = re.sub(r'[^\d.,-]', '', texto)
-    try: return float(texto)
-    except:
-        try:
-            if ',' in texto and '.' in texto: texto = texto.replace('.', '').replace(',', '.')
-            elif ',' in texto: texto = texto.replace(',', '.')
-            return float(texto)
-        except: return 0.0
-
-def limpiar_fecha(fecha_str):
-    if not fecha_str: return "2025-01-01"
-    if len(fecha_str) != 10: return time.strftime("%Y-%m-%d")
-    return fecha_str
-
 # --- LOGIN ---
 if 'user' not in st.session_state: st.session_state['user'] = None
 
@@ -105,7 +52,7 @@ def login():
         password = st.text_input("Contraseña", type="password", key="l_pass")
         if st.button("Entrar", key="btn_ent"):
             try:
-                session = supabase.auth.sign_in_with_password({"email": email, "password": password})
+                session = backend.supabase_auth().auth.sign_in_with_password({"email": email, "password": password})
                 st.session_state['user'] = session.user
                 st.rerun()
             except: st.error("Email o contraseña incorrectos")
@@ -117,7 +64,7 @@ def login():
         ciudad = c2.text_input("Ciudad")
         if st.button("Registrarme"):
             try:
-                res = supabase.auth.sign_up({"email": new_email, "password": new_pass})
+                res = backend.supabase_auth().auth.sign_up({"email": new_email, "password": new_pass})
                 if res.user:
                     try: supabase.table('perfiles').insert({"id": res.user.id, "pais": pais, "ciudad": ciudad}).execute()
                     except: pass
@@ -125,92 +72,12 @@ def login():
             except Exception as e: st.error(f"Error: {e}")
 
 def logout():
-    supabase.auth.sign_out()
+    # La sesión nunca se guarda en el cliente compartido; alcanza con olvidar el usuario
+    try: backend.supabase_auth().auth.sign_out()
+    except Exception: pass
     st.session_state['user'] = None
     st.rerun()
 
-# --- BACKEND ---
-def guardar_en_supabase(data):
-    try: user_id = st.session_state['user'].id
-    except: user_id = None 
-    nombre_super = data['supermercado'].strip().upper()
-    
-    res_super = supabase.table('supermercados').select('id').ilike('nombre', nombre_super).execute()
-    if res_super.data: super_id = res_super.data[0]['id']
-    else:
-        res_new = supabase.table('supermercados').insert({"nombre": nombre_super}).execute()
-        super_id = res_new.data[0]['id']
-
-    ticket_data = {
-        "user_id": user_id, "supermercado_id": super_id, "fecha": limpiar_fecha(data['fecha']),
-        "hora": data['hora'], "monto_total": limpiar_numero(data['total_pagado']),
-        "imagen_url": "v5.1_codigos", "sucursal_direccion": data.get('sucursal_direccion'),
-        "sucursal_localidad": data.get('sucursal_localidad'), "sucursal_provincia": data.get('sucursal_provincia'),
-        "sucursal_pais": data.get('sucursal_pais'), "moneda": data.get('moneda')
-    }
-    try:
-        res_ticket = supabase.table('tickets').insert(ticket_data).execute()
-        ticket_id = res_ticket.data[0]['id']
-        items = []
-        for item in data['items']:
-            items.append({
-                "ticket_id": ticket_id, "nombre_producto": item['nombre'],
-                "cantidad": limpiar_numero(item['cantidad']), "precio_neto_unitario": limpiar_numero(item['precio_neto_final']),
-                "unidad_medida": item['unidad_medida'], "rubro": item.get('rubro'),
-                "marca": item.get('marca'), "producto_generico": item.get('producto_generico'),
-                "contenido_neto": limpiar_numero(item.get('contenido_neto')), 
-                "unidad_contenido": item.get('unidad_contenido'),
-                "codigo_barras": item.get('codigo_barras') # NUEVO CAMPO
-            })
-        if items:
-            supabase.table('items_compra').insert(items).execute()
-            return len(items)
-        else: return 0
-    except Exception as e:
-        if "unique" in str(e).lower(): return "DUPLICADO"
-        st.error(f"Error DB: {e}")
-        return False
-
-def procesar_imagenes(lista_imagenes):
-    contenido = []
-    
-    # --- PROMPT MEJORADO PARA LEER CÓDIGOS ---
-    prompt = f"""
-    Analiza este ticket. REGLA DE ORO: Si el nombre ocupa 2 líneas, ÚNELAS.
-    
-    NUEVA MISIÓN: Extraer el CÓDIGO DE BARRAS (EAN).
-    - En tickets como COTO, suele estar DEBAJO del nombre del producto (ej: 000264.. 779007...).
-    - El código EAN suele tener 13 dígitos y empezar con 779 (Argentina).
-    - Si lo encuentras, extráelo en el campo "codigo_barras".
-    - Para productos frescos (carne, verdura) suele no haber EAN, déjalo null.
-    
-    1. SUPERMERCADO: Nombre + Sucursal.
-    2. PRODUCTOS: Marca, genérico, rubro, contenido, unidad y CÓDIGO.
-    
-    Rubros: {RUBROS_VALIDOS}
-    
-    JSON Estricto:
-    {{
-        "supermercado": "Str", "sucursal_direccion": "Str", "sucursal_localidad": "Str",
-        "sucursal_provincia": "Str", "sucursal_pais": "Str", "moneda": "Str",
-        "fecha": "YYYY-MM-DD", "hora": "HH:MM", "nro_ticket": "str", "total_pagado": num,
-        "items": [
-            {{ "nombre": "Str", "codigo_barras": "Str o null", "cantidad": num, "unidad_medida": "Str", "precio_neto_final": num,
-               "marca": "Str", "producto_generico": "Str", "rubro": "Str", "contenido_neto": num, "unidad_contenido": "Str" }}
-        ]
-    }}
-    """
-    contenido.append(prompt)
-    for img in lista_imagenes: contenido.append(Image.open(img))
-    try:
-        response = client.models.generate_content(
-            model=MODELO_IA, contents=contenido, config=types.GenerateContentConfig(response_mime_type='application/json')
-        )
-        return json.loads(response.text)
-    except Exception as e:
-        st.error(f"Error IA: {e}")
-        return None
-
 # --- APP PRINCIPAL ---
 if not st.session_state['user']:
     login()
@@ -251,28 +118,76 @@ else:
 
         st.divider()
         if st.button("Salir"): logout()
+        t = backend.tiempos
+        st.caption(f"⏱️ Arranque {t['arranque_s']:.1f} s · setup {t['ultimo_setup_ms']:.0f} ms")
+        if trazas.es_admin() and hasattr(client, 'metricas'):
+            m = client.metricas()
+            st.caption(f"🤖 IA: {m['ok']}/{m['llamadas']} ok · {m['reintentos']} reintentos · {m['limitadas']} 429 · "
+                       f"{m['hedges']} hedges · {m['tasa_rps']} req/s · circuito {m['circuito']} · p95 {m['p95_ms'] or 0:.0f} ms")
 
     # PANTALLA PRINCIPAL
     st.markdown("<h1>🛒 Club de Precios v5.1</h1>", unsafe_allow_html=True)
     st.info("💡 **Tip:** Asegúrate de que los números debajo de los productos sean legibles en la foto.")
 
     if 'uploader_key' not in st.session_state: st.session_state['uploader_key'] = 0
+    user_id = st.session_state['user'].id
 
     uploaded_files = st.file_uploader("📂 Subir fotos", accept_multiple_files=True, type=['jpg','png','jpeg'], key=f"uploader_{st.session_state['uploader_key']}")
 
     if uploaded_files:
         st.write(f"🎞️ **{len(uploaded_files)} imágenes**")
+        modo_lote = st.toggle("📦 Modo lote (varios tickets a la vez)")
+
+    # La IA y la base trabajan en segundo plano (cola.py): acá solo se encola y se muestra el estado
+    if uploaded_files and modo_lote:
+        agrupar = st.radio("¿Cómo se arman los tickets?", ["Una foto = un ticket", "Agrupar por nombre de archivo (ticket1_a, ticket1_b...)"], horizontal=True)
+        grupos = ingesta.agrupar_por_nombre(uploaded_files) if agrupar.startswith("Agrupar") else {f.name: [f] for f in uploaded_files}
+        if st.button(f"🚀 PROCESAR {len(grupos)} TICKETS", type="primary", use_container_width=True):
+            for n, imgs in grupos.items(): cola.encolar(user_id, imgs, nombre=n)
+            st.session_state['uploader_key'] += 1
+            st.rerun()
+
+    elif uploaded_files:
+        # El aviso de posible duplicado lo da la cola (antes de llamar a la IA) en "Mis cargas"
         if st.button("🚀 PROCESAR TICKET", type="primary", use_container_width=True):
-            with st.spinner("🧠 Leyendo códigos EAN y precios..."):
-                data = procesar_imagenes(uploaded_files)
-                if data:
-                    res = guardar_en_supabase(data)
-                    if res == "DUPLICADO": st.warning("⚠️ Ticket ya cargado.")
-                    elif res is not False:
-                        st.balloons()
-                        total = f"{data.get('moneda','$')} {data.get('total_pagado')}"
-                        st.success(f"✅ **¡Carga Exitosa!**\n\n💰 **{total}** ({res} items)\n📍 {data.get('supermercado')}")
-                        st.session_state['uploader_key'] += 1
-                        time.sleep(4)
-                        st.rerun()
-                    else: st.error("Error técnico.")
\ No newline at end of file
+            cola.encolar(user_id, uploaded_files, nombre=uploaded_files[0].name)
+            st.session_state['uploader_key'] += 1
+            st.rerun()
+
+    # --- ESTADO DE MIS CARGAS (se refresca solo) ---
+    ICONOS = {'en_cola': "⏳ En cola", 'procesando': "🧠 Leyendo...", 'listo': "✅ Cargado", 'fallido': "❌ Error", 'revisar': "⚠️ ¿Repetido?"}
+
+    @st.fragment(run_every=1)
+    def mis_cargas():
+        trabajos = cola.trabajos_de(user_id)
+        if not trabajos: return
+        # Lo que la IA ya leyó de los tickets en curso, renglón por renglón (llega en streaming)
+        for t in trabajos:
+            if t['estado'] != 'procesando': continue
+            items = cola.items_parciales(t['id'])
+            if not items: continue
+            st.markdown(f"#### 🧠 Leyendo {t['nombre']} · {len(items)} productos")
+            st.dataframe([{"Producto": i.get('nombre'), "Cant.": i.get('cantidad'), "Precio": i.get('precio_neto_final'), "Rubro": i.get('rubro')} for i in items],
+                         hide_index=True, use_container_width=True)
+        st.markdown("#### 📋 Mis cargas")
+        filas = []
+        for t in trabajos:
+            r = t['resultado'] or {}
+            estado = ICONOS.get(t['estado'], t['estado'])
+            if r.get('estado') == 'duplicado': estado = "⚠️ Ya cargado"
+            if r.get('estado') == 'ok': detalle = f"{r.get('supermercado')} · {r.get('moneda') or '$'} {r.get('total')} · {r.get('items')} items"
+            elif t['estado'] == 'revisar': detalle = f"Se parece a un ticket ya guardado ({r.get('supermercado')} del {r.get('fecha')})"
+            else: detalle = t['error'] or r.get('supermercado') or ""
+            filas.append({"Ticket": t['nombre'], "Estado": estado, "Detalle": detalle})
+        st.dataframe(filas, hide_index=True, use_container_width=True)
+        # Posibles duplicados: no se gastó la llamada a la IA; el socio decide
+        for t in trabajos:
+            if t['estado'] != 'revisar': continue
+            c1, c2, c3 = st.columns([3, 1, 1])
+            c1.caption(f"⚠️ {t['nombre']}: ¿es otro ticket?")
+            if c2.button("Procesar igual", key=f"forzar_{t['id']}"): cola.forzar(t['id'])
+            if c3.button("Descartar", key=f"descartar_{t['id']}"): cola.descartar(t['id'])
+
+    mis_cargas()
+
+trazas.cerrar()
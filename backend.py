@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import trazas
+
+# --- BACKEND COMPARTIDO ---
+# Claves, clientes de Supabase y Gemini y tiempos de arranque en un solo lugar.
+# Los clientes se crean una vez por proceso y se reusan en todos los reruns y sesiones
+# (mantienen abiertas sus conexiones HTTP). Las librerías pesadas se importan recién al
+# crear el cliente, así una página que no usa la IA no paga el import de google.genai.
+#
+# Ojo: el cliente compartido es anónimo. Login / registro / logout cambian el estado de
+# auth del cliente, por eso usan uno propio (supabase_auth).
+
+_INICIO = time.perf_counter()  # primer import de este módulo ~ arranque del proceso
+_lock = threading.Lock()
+_clientes = {}
+_dotenv = False
+
+tiempos = {'arranque_s': None, 'ultimo_setup_ms': None, 'setups': 0}
+
+
+def clave(nombre):
+    # st.secrets si existe, si no variables de entorno (.env)
+    global _dotenv
+    if not _dotenv:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv = True
+    try:
+        import streamlit as st
+        if nombre in st.secrets: return st.secrets[nombre]
+    except Exception: pass  # sin Streamlit (worker.py) o sin secrets.toml
+    return os.environ.get(nombre)
+
+
+def _claves(*nombres):
+    valores = [clave(n) for n in nombres]
+    faltan = [n for n, v in zip(nombres, valores) if not v]
+    if faltan: raise RuntimeError(f"Faltan claves: {', '.join(faltan)}")
+    return valores
+
+
+def _cliente(nombre, crear):
+    with _lock:
+        if nombre not in _clientes: _clientes[nombre] = crear()
+        return _clientes[nombre]
+
+
+def supabase(servicio=False):
+    # Cliente compartido del proceso. servicio=True prefiere SUPABASE_SERVICE_KEY (worker sin sesión, sin RLS).
+    def crear():
+        from supabase import create_client
+        url, key = _claves("SUPABASE_URL", "SUPABASE_KEY")
+        if servicio: key = clave("SUPABASE_SERVICE_KEY") or key
+        return create_client(url, key)
+    return _cliente('supabase_servicio' if servicio else 'supabase', crear)
+
+
+def supabase_auth():
+    # Cliente nuevo para operaciones de sesión (no contamina al compartido)
+    from supabase import create_client
+    return create_client(*_claves("SUPABASE_URL", "SUPABASE_KEY"))
+
+
+def gemini():
+    # Envuelto en la pasarela (pasarela.py): límite de tasa, reintentos y cortacircuitos compartidos
+    def crear():
+        from google import genai
+        import pasarela
+        return pasarela.Pasarela(genai.Client(api_key=_claves("GOOGLE_API_KEY")[0]))
+    return _cliente('gemini', crear)
+
+
+def iniciar(con_gemini=False):
+    # Lo que corre al principio de cada rerun: devuelve (supabase, gemini|None) y mide cuánto tardó.
+    # La primera vez en el proceso incluye imports y creación de clientes (arranque en frío).
+    t0 = time.perf_counter()
+    with trazas.tramo('setup', frio=tiempos['setups'] == 0):
+        sb = supabase()
+        cliente = gemini() if con_gemini else None
+    ahora = time.perf_counter()
+    with _lock:
+        if tiempos['arranque_s'] is None: tiempos['arranque_s'] = ahora - _INICIO
+        tiempos['ultimo_setup_ms'] = (ahora - t0) * 1000
+        tiempos['setups'] += 1
+    return sb, cliente
@@ -0,0 +1,51 @@
+# Compara el aplanado viejo (varios .apply sobre 'tickets') contra datos.aplanar.
+# Uso: python benchmarks/bench_aplanado.py [filas ...]   (por defecto 100k y 1M)
+import os
+import sys
+import time
+import random
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import datos
+
+CADENAS = ['COTO', 'JUMBO', 'CARREFOUR MAXI', 'DIA %', 'DISCO', 'VEA', 'MAKRO', 'FARMACITY']
+
+
+def generar(n):
+    rnd = random.Random(42)
+    filas = []
+    for i in range(n):
+        sup = None if rnd.random() < 0.02 else {'nombre': rnd.choice(CADENAS)}
+        filas.append({
+            'id': i, 'created_at': f"2025-01-01T00:00:{i % 60:02d}", 'ticket_id': i // 20,
+            'nombre_producto': f"PRODUCTO {i % 5000}", 'producto_generico': None, 'marca': None, 'rubro': 'Almacén',
+            'cantidad': 1, 'precio_neto_unitario': round(rnd.uniform(100, 5000), 2),
+            'tickets': {'fecha': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}", 'user_id': 'u1',
+                        'sucursal_localidad': None if i % 7 else 'CABA', 'supermercados': sup},
+        })
+    return filas
+
+
+def apply_viejo(filas):
+    df = pd.DataFrame(filas)
+    df['fecha'] = pd.to_datetime(df['tickets'].apply(lambda x: x['fecha']))
+    df['sucursal_original'] = df['tickets'].apply(lambda x: x['supermercados']['nombre'] if x['supermercados'] else "Desconocido")
+    df['Localidad'] = df['tickets'].apply(lambda x: x['sucursal_localidad'] or 'S/D')
+    return df
+
+
+def medir(fn, filas):
+    t0 = time.perf_counter()
+    fn(filas)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'filas':>10} {'apply (s)':>10} {'aplanar (s)':>12} {'x':>6}")
+    for n in tamanos:
+        filas = generar(n)
+        t_viejo = medir(apply_viejo, filas)
+        t_nuevo = medir(datos.aplanar, filas)
+        print(f"{n:>10} {t_viejo:>10.2f} {t_nuevo:>12.2f} {t_viejo / t_nuevo:>6.1f}")
@@ -0,0 +1,215 @@
+# Carga sintética de punta a punta, sin red: Supabase y Gemini son los dobles de sintetico.py.
+# Por cada tamaño genera el dataset, sincroniza el espejo y corre el pipeline de datos de cada
+# página (carga, aplanado, canonización, filtros, agregados) y el guardado de tickets.
+# Informa tiempo y pico de memoria por paso (memoria residente por encima de la del inicio del paso).
+# Uso: python benchmarks/bench_carga.py [filas ...] [--json salida.json] [--comparar base.json]
+#      por defecto 10k, 100k y 1M filas; 5M anda pero tarda varios minutos en sincronizar.
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import tempfile
+import tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.mkdtemp()
+os.environ["RUTA_ESPEJO"] = os.path.join(_TMP, "espejo.sqlite")
+os.environ["RUTA_CACHE_OCR"] = os.path.join(_TMP, "ocr.sqlite")
+os.environ["RUTA_TRAZAS"] = os.path.join(_TMP, "trazas.jsonl")  # las trazas del benchmark no van al .cache real
+import cola
+import datos
+import cadenas
+import filtros
+import graficos
+import tablas
+import agregados
+from sintetico import Dataset, SupabaseFalso, GeminiFalso
+
+TICKETS_GUARDAR = 50
+MUESTREO_S = 0.005
+TOLERANCIA = 1.25  # con --comparar: más de 25% peor en tiempo o memoria se marca como regresión
+
+
+class _PicoRSS:
+    # Muestrea la memoria residente del proceso (Linux) en un hilo: cuenta también numpy, SQLite
+    # y Arrow, y no frena el código medido como tracemalloc. Pico = máximo sobre la base inicial.
+    def __enter__(self):
+        self.base = self.pico = _rss()
+        self.parar = threading.Event()
+        self.hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self.hilo.start()
+        return self
+
+    def _muestrear(self):
+        while not self.parar.wait(MUESTREO_S): self.pico = max(self.pico, _rss())
+
+    def __exit__(self, *exc):
+        self.parar.set()
+        self.hilo.join()
+        self.pico = max(self.pico, _rss())
+
+    @property
+    def mb(self): return (self.pico - self.base) / 2**20
+
+
+def _rss():
+    with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def medir(nombre, fn, resultados):
+    # Sin /proc (macOS, Windows) se usa tracemalloc: solo ve memoria de Python y suma demora
+    if os.path.exists('/proc/self/statm'):
+        with _PicoRSS() as m:
+            t0 = time.perf_counter()
+            valor = fn()
+            seg = time.perf_counter() - t0
+        pico = m.mb
+    else:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        valor = fn()
+        seg = time.perf_counter() - t0
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    resultados[nombre] = {'seg': round(seg, 4), 'pico_mb': round(pico, 1)}
+    return valor
+
+
+# --- PIPELINES (los mismos pasos que cada página, sin la parte visual) ---
+def mis_estadisticas(sb, user_id):
+    df = datos.cargar_analisis(sb, ['fecha', 'supermercado_nombre', 'rubro', 'marca', 'producto_final', 'precio_neto_unitario', 'cantidad'],
+                               user_id=user_id, rellenar={'rubro': 'Otros', 'marca': 'Genérica'})
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    df['supermercado'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    producto = df['producto_final'].value_counts().index[0]
+    datos.resumen_precio(producto, user_id=user_id)
+    return graficos.serie_reducida(df[df['producto_final'] == producto], color='supermercado')
+
+
+def club(sb):
+    df = datos.cargar_analisis(sb, ['fecha', 'supermercado_nombre', 'sucursal_localidad', 'producto_final', 'precio_neto_unitario'],
+                               rellenar={'sucursal_localidad': 'S/D'}
+                               ).rename(columns={'fecha': 'Fecha', 'sucursal_localidad': 'Localidad', 'producto_final': 'Producto', 'precio_neto_unitario': 'Precio'})
+    df['Supermercado'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    agregados.precios_por_cadena(sb)
+    producto = df['Producto'].value_counts().index[0]
+    agregados.precios_por_cadena(sb, producto=producto, por_producto=True)
+    datos.resumen_precio(producto)
+    return graficos.serie_reducida(df[df['Producto'] == producto], x='Fecha', y='Precio', color='Supermercado')
+
+
+def indice_tablero(sb):
+    df = datos.cargar_analisis(sb, ['fecha', 'supermercado_nombre', 'producto_final', 'rubro', 'cantidad', 'precio_neto_unitario'],
+                               rellenar={'rubro': 'Sin Clasificar'})
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    df['cadena_comercial'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    df['tipo_comercio'] = cadenas.columna_tipo(df['cadena_comercial'])
+    return filtros.IndiceFiltros(df, ['tipo_comercio', 'rubro', 'cadena_comercial', 'producto_final'])
+
+
+def tablero(indice):
+    desde, hasta = indice.fecha_max - timedelta(days=90), indice.fecha_max
+    filtro = {'tipo_comercio': 'Supermercado', 'rubro': indice.valores('rubro', desde, hasta, tipo_comercio='Supermercado')[0]}
+    indice.valores('cadena_comercial', desde, hasta, **filtro)
+    df = indice.filtrar(desde, hasta, **filtro)
+    graficos.gasto_por_mes(df, 'cadena_comercial')
+    graficos.gasto_por(df, 'cadena_comercial')
+    pos = tablas.posiciones_tabla(indice.df, indice.posiciones(desde, hasta, **filtro), 'a', 'fecha', False, ['producto_final', 'cadena_comercial'])
+    return tablas.pagina(indice.df, pos, 0, 50, ['fecha', 'producto_final', 'cadena_comercial', 'precio_neto_unitario'])
+
+
+def pareto(sb, indice):
+    desde, hasta = (indice.fecha_max - timedelta(days=90)).date(), indice.fecha_max.date()
+    ranking = agregados.pareto(sb, desde, hasta)
+    producto = ranking['producto_final'].iloc[0]
+    pos = indice.posiciones(desde, hasta, producto_final=producto)
+    datos.resumen_precio(producto, desde=desde, hasta=hasta)
+    graficos.serie_reducida(indice.df.iloc[pos[::-1]], color='cadena_comercial')
+    return tablas.pagina(indice.df, tablas.posiciones_tabla(indice.df, pos, orden='fecha'), 0, 50, ['fecha', 'cadena_comercial', 'precio_neto_unitario'])
+
+
+def buscador(sb, eans):
+    return [len(datos.historial_ean(sb, e)) for e in eans]
+
+
+def fotos(k):
+    # Una foto distinta por ticket (si no, el caché de OCR respondería sin llamar al modelo)
+    from PIL import Image, ImageDraw
+    salida = []
+    for i in range(k):
+        img = Image.new('RGB', (900, 1600), 'white')
+        d = ImageDraw.Draw(img)
+        for y in range(40, 1560, 30): d.text((40, y), f"TICKET {i} PRODUCTO {y} $ {y * 7 + i}", fill='black')
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=90)
+        buf.name = f"ticket{i}.jpg"
+        salida.append(buf)
+    return salida
+
+
+def guardar(sb, gemini, imagenes, user_id):
+    # El mismo camino que la página: un trabajo por ticket y los hilos de cola.trabajar.
+    # forzar=True: cada tamaño vuelve a pasar por el modelo (sin caché ni aviso de duplicado)
+    for f in imagenes: cola.encolar(user_id, [f], nombre=f.name, forzar=True)
+    parar = threading.Event()
+    hilos = [threading.Thread(target=cola.trabajar, args=(sb, gemini, parar, 0.01), daemon=True) for _ in range(cola.HILOS)]
+    for h in hilos: h.start()
+    while True:
+        trabajos = cola.trabajos_de(user_id, len(imagenes))
+        if all(t['estado'] not in ('en_cola', 'procesando') for t in trabajos): break
+        time.sleep(0.01)
+    parar.set()
+    for h in hilos: h.join()
+    return sum(t['estado'] == 'listo' for t in trabajos)
+
+
+def correr(n):
+    r = {}
+    datos.RUTA_ESPEJO = os.path.join(_TMP, f"espejo_{n}.sqlite")
+    cola.RUTA_COLA = os.path.join(_TMP, f"cola_{n}.sqlite")
+    datos._ultimo_sync = 0.0
+    ds = medir('generar', lambda: Dataset(n), r)
+    sb = SupabaseFalso(ds)
+    medir('sincronizar', lambda: datos.sincronizar(sb, forzar=True), r)
+    usuario = ds.usuarios[0]  # el más activo (zipf)
+    medir('mis_estadisticas', lambda: mis_estadisticas(sb, usuario), r)
+    medir('club', lambda: club(sb), r)
+    indice = medir('indice_tablero', lambda: indice_tablero(sb), r)
+    medir('tablero_filtros', lambda: tablero(indice), r)
+    medir('pareto', lambda: pareto(sb, indice), r)
+    eans = [e for e in ds.p_ean if e][:20]
+    medir('buscador_ean', lambda: buscador(sb, eans), r)
+    imagenes = fotos(TICKETS_GUARDAR)
+    medir('guardar_tickets', lambda: guardar(sb, GeminiFalso(ds), imagenes, usuario), r)
+    return r
+
+
+def comparar(actual, base):
+    for n, pasos in actual.items():
+        for paso, v in pasos.items():
+            b = base.get(n, {}).get(paso)
+            if not b: continue
+            peor = [k for k in ('seg', 'pico_mb') if b[k] and v[k] > b[k] * TOLERANCIA]
+            if peor: print(f"⚠️  {n} {paso}: " + ', '.join(f"{k} {b[k]} -> {v[k]}" for k in peor))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument('filas', nargs='*', type=int)
+    ap.add_argument('--json')
+    ap.add_argument('--comparar')
+    args = ap.parse_args()
+
+    todos = {}
+    print(f"{'filas':>10} {'paso':<18} {'seg':>9} {'pico MB':>9}")
+    for n in args.filas or [10_000, 100_000, 1_000_000]:
+        todos[str(n)] = correr(n)
+        for paso, v in todos[str(n)].items(): print(f"{n:>10} {paso:<18} {v['seg']:>9.3f} {v['pico_mb']:>9.1f}")
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(todos, f, indent=1)
+    if args.comparar:
+        with open(args.comparar) as f: comparar(todos, json.load(f))
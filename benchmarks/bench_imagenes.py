@@ -0,0 +1,73 @@
+# Bytes enviados y latencia de punta a punta de extraer_ticket, con y sin preprocesamiento.
+# Las fotos de prueba se generan (12 MP, EXIF rotado, ruido de sensor) y Gemini es un cliente
+# falso cuya demora crece con los bytes subidos y los tiles de 768px que procesa el modelo.
+# Uso: python benchmarks/bench_imagenes.py [cantidad_fotos]
+import io
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+from types import SimpleNamespace
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extraccion
+import cache_ocr
+
+SUBIDA_BYTES_S = 1_500_000   # ~12 Mbit/s de subida desde el celular
+SEG_POR_TILE = 0.08          # costo del modelo por tile de 768x768
+SEG_BASE = 0.8
+
+
+class GeminiFalso:
+    def __init__(self):
+        self.bytes_enviados = 0
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        demora = SEG_BASE
+        for parte in contents:
+            datos = getattr(getattr(parte, 'inline_data', None), 'data', None)
+            if not datos: continue
+            self.bytes_enviados += len(datos)
+            ancho, alto = Image.open(io.BytesIO(datos)).size
+            demora += len(datos) / SUBIDA_BYTES_S + SEG_POR_TILE * (-(-ancho // 768)) * (-(-alto // 768))
+        time.sleep(demora)
+        return SimpleNamespace(text=json.dumps({"supermercado": "COTO", "items": []}))
+
+
+def generar_fotos(n, carpeta):
+    rnd = random.Random(7)
+    rutas = []
+    for i in range(n):
+        img = Image.effect_noise((4032, 3024), 18).convert('RGB')
+        img = Image.blend(img, Image.new('RGB', img.size, (214, 210, 200)), 0.75)
+        d = ImageDraw.Draw(img)
+        for y in range(300, 2800, 46):  # renglones del ticket
+            x = 900
+            while x < 3100:
+                w = rnd.randint(20, 160)
+                d.rectangle([x, y, x + w, y + 24], fill=(60, 60, 60))
+                x += w + rnd.randint(15, 40)
+        exif = Image.Exif()
+        exif[0x0112] = 6  # foto sacada con el celular vertical
+        ruta = os.path.join(carpeta, f"ticket_{i}.jpg")
+        img.save(ruta, format='JPEG', quality=92, exif=exif)
+        rutas.append(ruta)
+    return rutas
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as carpeta:
+        fotos = generar_fotos(n, carpeta)
+        print(f"{'perfil':>10} {'KB/foto':>10} {'s/ticket':>10}")
+        for perfil in ['original', 'ticket']:
+            cliente = GeminiFalso()
+            cache_ocr.RUTA_CACHE = os.path.join(carpeta, f"ocr_{perfil}.sqlite")  # sin aciertos de caché
+            t0 = time.perf_counter()
+            for foto in fotos: extraccion.extraer_ticket(cliente, [foto], perfil=perfil)
+            seg = (time.perf_counter() - t0) / n
+            print(f"{perfil:>10} {cliente.bytes_enviados / n / 1024:>10.0f} {seg:>10.2f}")
@@ -0,0 +1,63 @@
+# Bytes por fila del dataset de las páginas: cargar_items completo (todas las columnas, object)
+# contra cargar_analisis con proyección, categóricas y float32.
+# Uso: python benchmarks/bench_memoria.py [filas ...]   (por defecto 100k y 1M)
+import os
+import sys
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.mkdtemp()
+os.environ["RUTA_ESPEJO"] = os.path.join(_TMP, "espejo.sqlite")
+os.environ["RUTA_TRAZAS"] = os.path.join(_TMP, "trazas.jsonl")
+import datos
+import cadenas
+from bench_aplanado import generar
+
+COLUMNAS_TABLERO = ['fecha', 'supermercado_nombre', 'producto_final', 'rubro', 'cantidad', 'precio_neto_unitario']
+
+
+def poblar(n):
+    filas = generar(n)
+    rnd = random.Random(7)
+    for f in filas:
+        f['rubro'] = rnd.choice(['Almacén', 'Limpieza', 'Bebidas', None])
+        f['marca'] = rnd.choice(['MARCA A', 'MARCA B', None])
+    con = datos._conectar()
+    con.execute("DELETE FROM items")
+    con.executemany(f"INSERT INTO items VALUES ({','.join('?' * len(datos.COLUMNAS))})", datos._filas_sqlite(datos.aplanar(filas)))
+    con.commit()
+    con.close()
+    datos._ultimo_sync = time.time()  # sin Supabase: el espejo ya está al día
+
+
+def viejo():
+    # Lo que armaba el Tablero antes: todas las columnas + derivadas
+    df = datos.cargar_items(None)
+    df = df[df['precio_neto_unitario'] > 0].copy()
+    df['sucursal_original'] = df['supermercado_nombre']
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    df['cadena_comercial'] = cadenas.columna_cadena(df['sucursal_original'])
+    df['tipo_comercio'] = cadenas.columna_tipo(df['cadena_comercial'])
+    df['producto_final'] = df['producto_generico'].fillna(df['nombre_producto'])
+    df['rubro'] = df['rubro'].fillna('Sin Clasificar')
+    return df
+
+
+def nuevo():
+    df = datos.cargar_analisis(None, COLUMNAS_TABLERO, rellenar={'rubro': 'Sin Clasificar'})
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    df['cadena_comercial'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    df['tipo_comercio'] = cadenas.columna_tipo(df['cadena_comercial'])
+    return df
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'filas':>10} {'antes B/fila':>13} {'después B/fila':>15} {'antes MB':>9} {'después MB':>11}")
+    for n in tamanos:
+        poblar(n)
+        a, d = viejo(), nuevo()
+        print(f"{n:>10} {datos.bytes_por_fila(a):>13.0f} {datos.bytes_por_fila(d):>15.0f} "
+              f"{a.memory_usage(deep=True).sum() / 2**20:>9.1f} {d.memory_usage(deep=True).sum() / 2**20:>11.1f}")
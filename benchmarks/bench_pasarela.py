@@ -0,0 +1,70 @@
+# Llamadas al modelo en hora pico, directas y a través de pasarela.py, contra GeminiInestable
+# (cuota por segundo con 429, 503 al azar, latencias lentas y caídas). Escenarios:
+#   rafaga: muchos pedidos juntos contra la cuota -> cuántos terminan bien y a qué ritmo
+#   cola_lenta: algunos pedidos tardan mucho -> p95 con y sin pedido de cobertura (hedge)
+#   caida: el servicio cae unos segundos -> cuánto tarda en fallar cada pedido con el cortacircuitos
+# Uso: python benchmarks/bench_pasarela.py [pedidos] [hilos]
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TRAZAS_JSONL", "0")
+import pasarela
+from sintetico import Dataset, GeminiFalso, GeminiInestable
+
+MODELO = 'gemini-falso'
+
+
+def correr(cliente, pedidos, hilos):
+    # Devuelve (ok, fallidos, segundos, latencias ms de cada pedido, terminado bien o no)
+    def uno(_):
+        t0 = time.perf_counter()
+        try:
+            cliente.models.generate_content(model=MODELO, contents=[])
+            return True, (time.perf_counter() - t0) * 1000
+        except Exception:
+            return False, (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(hilos) as pool: res = list(pool.map(uno, range(pedidos)))
+    seg = time.perf_counter() - t0
+    ok = [ms for bien, ms in res if bien]
+    mal = [ms for bien, ms in res if not bien]
+    return len(ok), len(mal), seg, sorted(ok), sorted(mal)
+
+
+def _p(valores, p):
+    return valores[min(len(valores) - 1, int(p * len(valores)))] if valores else float('nan')
+
+
+def informe(escenario, modo, r, cliente):
+    ok, mal, seg, lat, lat_mal = r
+    extra = ''
+    if isinstance(cliente, pasarela.Pasarela):
+        m = cliente.metricas()
+        extra = f"reintentos {m['reintentos']} · 429 {m['limitadas']} · hedges {m['hedges']}/{m['hedges_ganados']} · rechazadas {m['rechazadas']}"
+    print(f"{escenario:<11} {modo:<10} {ok:>4} {mal:>5} {seg:>7.2f} {ok / seg:>6.2f} {_p(lat, .5):>8.0f} {_p(lat, .95):>8.0f} {_p(lat_mal, .5):>9.0f}  {extra}")
+
+
+if __name__ == "__main__":
+    pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    hilos = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    base = GeminiFalso(Dataset(2000))
+    print(f"{'escenario':<11} {'modo':<10} {'ok':>4} {'error':>5} {'seg':>7} {'ok/s':>6} {'p50 ms':>8} {'p95 ms':>8} {'falla ms':>9}")
+
+    for modo in ('directo', 'pasarela'):
+        falso = GeminiInestable(base, cuota_rps=4, p_error=0.05, p_lento=0.0)
+        cliente = falso if modo == 'directo' else pasarela.Pasarela(falso, hedge_s=0)
+        informe('rafaga', modo, correr(cliente, pedidos, hilos), cliente)
+
+    for modo, hedge in (('sin hedge', 0), ('hedge 0.5s', 0.5)):
+        falso = GeminiInestable(base, cuota_rps=100, p_error=0.0, p_lento=0.15, lento_s=2.0)
+        cliente = pasarela.Pasarela(falso, pasarela.Cubeta(tasa=50, rafaga=50, concurrencia=hilos * 2), hedge_s=hedge)
+        informe('cola_lenta', modo, correr(cliente, pedidos, hilos), cliente)
+
+    for modo in ('directo', 'pasarela'):
+        falso = GeminiInestable(base, cuota_rps=100, p_error=0.0, p_lento=0.0)
+        falso.caida(3)
+        cliente = falso if modo == 'directo' else pasarela.Pasarela(falso, pasarela.Cubeta(tasa=50, rafaga=50), pasarela.Cortacircuitos(corte_s=2), hedge_s=0)
+        informe('caida', modo, correr(cliente, pedidos, hilos), cliente)
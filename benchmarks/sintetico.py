@@ -0,0 +1,388 @@
+# Datos sintéticos con forma de producción y dobles locales de Supabase y Gemini para los benchmarks.
+# Todo en memoria y sin red: el dataset se guarda por columnas (numpy) y las filas con la forma de
+# la respuesta de PostgREST (SELECT_ITEMS, con 'tickets' anidado) se arman recién al pedir cada página.
+import json
+import time
+import threading
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+import cadenas
+import codigos
+import extraccion
+import ingesta
+
+RUBROS = [r.strip('- ').strip() for r in extraccion.RUBROS_VALIDOS.strip().splitlines()]
+PESO_RUBRO = {'Almacén': 8, 'Bebidas s/Alcohol': 5, 'Lácteos': 5, 'Limpieza': 4, 'Frutas y Verduras': 4, 'Carnicería': 3,
+              'Perfumería e Higiene': 3, 'Panadería y Galletitas': 3, 'Quesos y Fiambres': 3, 'Golosinas': 2,
+              'Bebidas c/Alcohol': 2, 'Congelados y Helados': 2}
+FRESCOS = {'Carnicería', 'Pescadería', 'Frutas y Verduras', 'Comida Elaborada / Rotisería'}  # sin EAN, se venden por kg
+PRECIO_RUBRO = {'Carnicería': 9000, 'Pescadería': 12000, 'Electro y Tecnología': 90000, 'Ropa y Calzado': 25000,
+                'Hogar, Muebles y Bazar': 15000, 'Ferretería y Herramientas': 8000, 'Juguetería': 12000,
+                'Bebidas c/Alcohol': 4500, 'Farmacia': 6000}
+
+# (nombre de sucursal como viene en el ticket, peso, factor de precio de la cadena)
+SUCURSALES = [
+    ('COTO SUC 45', 10, 1.00), ('Coto Digital', 3, 1.00), ('JUMBO UNICENTER', 5, 1.12), ('Jumbo Palermo', 3, 1.12),
+    ('CARREFOUR MAXI', 6, 0.97), ('Carrefour Express', 6, 1.05), ('DIA %', 8, 0.93), ('Día Express', 5, 0.95),
+    ('DISCO', 5, 1.08), ('VEA', 4, 0.98), ('MAKRO', 2, 0.88), ('FARMACITY', 3, 1.10), ('SIMPLICITY', 1, 1.10),
+    ('SELMA DIGITAL', 1, 1.05), ('ALMACEN DON PEPE', 2, 1.15), ('AUTOSERVICIO EL SOL', 2, 1.02),
+]
+LOCALIDADES = ['CABA', 'CABA', 'CABA', 'La Plata', 'Rosario', 'Córdoba', 'Mar del Plata', 'Quilmes', 'Morón', None]
+MARCAS = ['La Serenísima', 'Arcor', 'Molinos', 'Marolio', 'Coca-Cola', 'Quilmes', 'Ledesma', 'Ayudín', 'Skip',
+          'Sancor', 'Paladini', 'Knorr', 'Cuisine & Co', 'Great Value', 'Natura', 'Bagley', 'Terrabusi', 'Dove']
+UNIDADES = [('g', 500), ('g', 1000), ('ml', 1500), ('ml', 500), ('un', 1), ('kg', 1)]
+
+PRECIO_CERO = 0.01   # fracción de items con precio 0 (errores de lectura que las páginas descartan)
+EAN_CON_ESPACIOS = 0.02
+
+
+def _ean(rnd):
+    base = '779' + ''.join(str(d) for d in rnd.integers(0, 10, 9))
+    return base + str(codigos.digito_control(base))
+
+
+class Dataset:
+    # n items repartidos en tickets de 3 a 40 items, con usuarios, cadenas, rubros, EANs e inflación mensual.
+    # created_at crece con el id (como en Supabase, que asigna los dos al insertar).
+    def __init__(self, n, semilla=42, inicio=date(2023, 1, 1), meses=24, inflacion=0.04, usuarios=None):
+        rnd = np.random.default_rng(semilla)
+        self.n, self.inicio, self.inflacion = n, inicio, inflacion
+
+        # Catálogo de productos (popularidad tipo Zipf)
+        p = int(min(20_000, max(200, n // 50)))
+        pesos = np.array([PESO_RUBRO.get(r, 1) for r in RUBROS], dtype=float)
+        self.p_rubro = rnd.choice(len(RUBROS), p, p=pesos / pesos.sum())
+        self.p_marca = rnd.integers(0, len(MARCAS), p)
+        self.p_unidad = rnd.integers(0, len(UNIDADES), p)
+        frescos = np.array([RUBROS[r] in FRESCOS for r in self.p_rubro])
+        self.p_generico = [f"{RUBROS[r].split()[0].upper()} {i}" for i, r in enumerate(self.p_rubro)]
+        self.p_nombre = [f"{self.p_generico[i]} {MARCAS[self.p_marca[i]].upper()} {UNIDADES[self.p_unidad[i]][1]}{UNIDADES[self.p_unidad[i]][0].upper()}"
+                         for i in range(p)]
+        self.p_sin_generico = rnd.random(p) < 0.3
+        self.p_ean = [None if f else _ean(rnd) for f in frescos]
+        self.p_fresco = frescos
+        self.p_precio = np.array([PRECIO_RUBRO.get(RUBROS[r], 1800) for r in self.p_rubro]) * rnd.lognormal(0, 0.5, p)
+
+        # Tickets
+        tamanos = rnd.integers(3, 41, n // 3 + 2)
+        self.item_ticket = np.repeat(np.arange(len(tamanos), dtype=np.int32), tamanos)[:n]
+        t = int(self.item_ticket[-1]) + 1 if n else 0
+        u = usuarios or max(5, n // 5_000)
+        self.usuarios = [f"00000000-0000-4000-8000-{i:012d}" for i in range(u)]
+        self.t_usuario = (rnd.zipf(1.6, t) - 1) % u
+        pesos = np.array([s[1] for s in SUCURSALES], dtype=float)
+        self.t_sucursal = rnd.choice(len(SUCURSALES), t, p=pesos / pesos.sum())
+        self.t_sucursal[rnd.random(t) < 0.02] = -1  # supermercado sin reconocer
+        self.t_localidad = rnd.integers(0, len(LOCALIDADES), t)
+        # Carga pareja a lo largo del período; la fecha del ticket es de 0 a 3 días antes de subirlo
+        segundos = meses * 30 * 86400
+        self.paso = segundos / max(1, n)
+        primer_item = np.searchsorted(self.item_ticket, np.arange(t))
+        self.t_dia = np.maximum(0, (primer_item * self.paso // 86400).astype(np.int32) - rnd.integers(0, 4, t))
+        self.t_hora = rnd.integers(8 * 60, 22 * 60, t)
+
+        # Items
+        z = 1 / np.arange(1, p + 1)
+        self.i_producto = rnd.choice(p, n, p=z / z.sum()).astype(np.int32)
+        fresco = self.p_fresco[self.i_producto]
+        self.i_cantidad = np.where(fresco, np.round(rnd.uniform(0.2, 2.5, n), 3), rnd.choice([1, 1, 1, 1, 2, 3], n)).astype(np.float32)
+        mes = self.t_dia[self.item_ticket] / 30
+        factor = np.array([s[2] for s in SUCURSALES] + [1.0])[self.t_sucursal[self.item_ticket]]
+        precio = self.p_precio[self.i_producto] * (1 + inflacion) ** mes * factor * rnd.lognormal(0, 0.05, n)
+        precio[rnd.random(n) < PRECIO_CERO] = 0
+        self.i_precio = np.round(precio, 2)
+        self.i_ean_espacios = rnd.random(n) < EAN_CON_ESPACIOS
+        self._analisis = None
+
+    def fecha(self, ticket):
+        return (self.inicio + timedelta(days=int(self.t_dia[ticket]))).isoformat()
+
+    def created_at(self, i):
+        return (datetime(self.inicio.year, self.inicio.month, self.inicio.day) + timedelta(seconds=i * self.paso)).isoformat(timespec='microseconds')
+
+    def primero_desde(self, marca):
+        # Índice del primer item con created_at >= marca (created_at crece con el índice)
+        ini, fin = 0, self.n
+        while ini < fin:
+            medio = (ini + fin) // 2
+            if self.created_at(medio) < marca: ini = medio + 1
+            else: fin = medio
+        return ini
+
+    def _item(self, i):
+        prod = self.i_producto[i]
+        ean = self.p_ean[prod]
+        if ean and self.i_ean_espacios[i]: ean = f"{ean[:1]} {ean[1:7]} {ean[7:]}"
+        unidad, contenido = UNIDADES[self.p_unidad[prod]]
+        return prod, ean, unidad, contenido
+
+    def filas(self, ini, fin):
+        # Filas [ini, fin) como las devuelve items_compra.select(SELECT_ITEMS); ids desde 1
+        filas = []
+        for i in range(ini, min(fin, self.n)):
+            prod, ean, unidad, contenido = self._item(i)
+            tk = int(self.item_ticket[i])
+            suc = self.t_sucursal[tk]
+            filas.append({
+                'id': i + 1, 'created_at': self.created_at(i), 'ticket_id': tk + 1,
+                'nombre_producto': self.p_nombre[prod], 'producto_generico': None if self.p_sin_generico[prod] else self.p_generico[prod],
+                'marca': MARCAS[self.p_marca[prod]], 'rubro': RUBROS[self.p_rubro[prod]],
+                'cantidad': float(self.i_cantidad[i]), 'precio_neto_unitario': float(self.i_precio[i]),
+                'unidad_medida': 'kg' if self.p_fresco[prod] else 'un', 'contenido_neto': contenido, 'unidad_contenido': unidad,
+                'codigo_barras': ean,
+                'tickets': {'fecha': self.fecha(tk), 'user_id': self.usuarios[self.t_usuario[tk]],
+                            'sucursal_localidad': LOCALIDADES[self.t_localidad[tk]],
+                            'supermercados': None if suc < 0 else {'nombre': SUCURSALES[suc][0]}},
+            })
+        return filas
+
+    def ticket(self, tk):
+        # El ticket 'tk' con la forma del JSON que devuelve la extracción (PROMPT_TICKET)
+        ini, fin = np.searchsorted(self.item_ticket, [tk, tk + 1])
+        items = []
+        for i in range(ini, fin):
+            prod, ean, unidad, contenido = self._item(i)
+            items.append({
+                'nombre': self.p_nombre[prod], 'codigo_barras': ean, 'cantidad': float(self.i_cantidad[i]),
+                'unidad_medida': 'kg' if self.p_fresco[prod] else 'un', 'precio_neto_final': float(self.i_precio[i]),
+                'marca': MARCAS[self.p_marca[prod]], 'producto_generico': self.p_generico[prod], 'rubro': RUBROS[self.p_rubro[prod]],
+                'contenido_neto': contenido, 'unidad_contenido': unidad,
+            })
+        suc = self.t_sucursal[tk]
+        return {
+            'supermercado': SUCURSALES[suc][0] if suc >= 0 else 'SUPER SIN NOMBRE', 'sucursal_direccion': 'Av. Siempre Viva 742',
+            'sucursal_localidad': LOCALIDADES[self.t_localidad[tk]], 'sucursal_provincia': 'Buenos Aires', 'sucursal_pais': 'Argentina',
+            'moneda': 'ARS', 'fecha': self.fecha(tk), 'hora': f"{self.t_hora[tk] // 60:02d}:{self.t_hora[tk] % 60:02d}",
+            'nro_ticket': str(tk + 1), 'total_pagado': round(sum(x['cantidad'] * x['precio_neto_final'] for x in items), 2), 'items': items,
+        }
+
+    def analisis(self):
+        # Vista v_items_analisis (sql/003_agregados.sql) en pandas, para las RPC de agregados
+        if self._analisis is None:
+            tk = self.item_ticket
+            suc = pd.Series(self.t_sucursal[tk])
+            nombres = pd.Categorical.from_codes(suc.where(suc >= 0, len(SUCURSALES)), categories=[s[0] for s in SUCURSALES] + [''])
+            cadena = cadenas.columna_cadena(pd.Series(nombres))
+            genericos = np.array(self.p_generico, dtype=object)
+            producto = np.where(self.p_sin_generico, np.array(self.p_nombre, dtype=object), genericos)[self.i_producto]
+            df = pd.DataFrame({
+                'user_id': np.array(self.usuarios, dtype=object)[self.t_usuario[tk]],
+                'fecha': pd.to_datetime(self.inicio) + pd.to_timedelta(self.t_dia[tk], unit='D'),
+                'rubro': np.array(RUBROS, dtype=object)[self.p_rubro[self.i_producto]],
+                'producto_final': producto, 'cadena': cadena.astype(str).replace('', 'DESCONOCIDO').to_numpy(),
+                'tipo_comercio': cadenas.columna_tipo(cadena).to_numpy(),
+                'precio': self.i_precio, 'cantidad': self.i_cantidad.astype('float64'),
+            })
+            df['gasto_total'] = df['precio'] * df['cantidad']
+            self._analisis = df[df['precio'] > 0].reset_index(drop=True)
+        return self._analisis
+
+
+# --- SUPABASE FALSO ---
+# Lo que usan datos.py, ingesta.py y agregados.py: select paginado (range / limit / keyset por
+# (created_at, id) / count), upsert y select de supermercados y las RPC guardar_ticket,
+# pareto_productos y precios_por_cadena. 'latencia' simula el ida y vuelta de cada request.
+
+class _Respuesta:
+    # Respuesta de rpc(): las listas salen cortadas en max-rows (tope), como en PostgREST
+    # (tope None: un valor json escalar, que no se corta)
+    def __init__(self, fn, tope):
+        self._fn, self.tope, self.offset, self.limite = fn, tope, 0, None
+
+    def range(self, a, b):
+        self.offset, self.limite = a, b - a + 1
+        return self
+
+    def execute(self):
+        r = self._fn()
+        if isinstance(r.data, list) and self.tope:
+            fin = self.offset + min(self.tope, self.limite if self.limite is not None else self.tope)
+            r.data = r.data[self.offset:fin]
+        return r
+
+
+class _Consulta:
+    def __init__(self, sb, tabla):
+        self.sb, self.tabla = sb, tabla
+        self.desde_id, self.offset, self.tope, self.contar, self.fila = 0, 0, None, False, None
+
+    def select(self, columnas='*', count=None):
+        self.contar = count == 'exact'
+        return self
+
+    def or_(self, expr):
+        # Keyset de datos._desde: created_at crece con el id, así que alcanza con el id
+        self.desde_id = int(expr.rsplit('id.gt.', 1)[1].rstrip(')'))
+        return self
+
+    def gte(self, columna, valor):
+        # Primera página con solape de datos.sincronizar (created_at >= marca)
+        self.desde_id = self.sb.dataset.primero_desde(valor)
+        return self
+
+    def order(self, *a, **k): return self
+    def eq(self, *a, **k): return self
+
+    def limit(self, n):
+        self.tope = n
+        return self
+
+    def range(self, a, b):
+        self.offset, self.tope = a, b - a + 1
+        return self
+
+    def upsert(self, fila, on_conflict=None):
+        self.fila = fila
+        return self
+
+    def execute(self):
+        self.sb._esperar()
+        if self.tabla == 'items_compra':
+            ini = self.desde_id + self.offset
+            fin = self.sb.dataset.n if self.tope is None else ini + min(self.tope, self.sb.tope)
+            return SimpleNamespace(data=self.sb.dataset.filas(ini, fin), count=self.sb.dataset.n - self.desde_id if self.contar else None)
+        if self.tabla == 'supermercados':
+            if self.fila: return SimpleNamespace(data=[{'id': self.sb.super_id(self.fila['nombre']), 'nombre': self.fila['nombre']}], count=None)
+            filas = [{'id': i, 'nombre': n} for n, i in self.sb.supers.items()]
+            return SimpleNamespace(data=filas[:self.tope] if self.tope else filas, count=None)
+        return SimpleNamespace(data=[], count=0)
+
+
+class SupabaseFalso:
+    def __init__(self, dataset, latencia=0.0, tope=1000):
+        self.dataset, self.latencia, self.tope = dataset, latencia, tope  # tope = max-rows de PostgREST
+        self.supers = {ingesta.normalizar_super(s[0]): i + 1 for i, s in enumerate(SUCURSALES)}
+        self.tickets, self.items_guardados, self.requests = set(), 0, 0
+        self._lock = threading.Lock()
+
+    def _esperar(self):
+        with self._lock: self.requests += 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def super_id(self, nombre):
+        with self._lock: return self.supers.setdefault(nombre, len(self.supers) + 1)
+
+    def table(self, nombre): return _Consulta(self, nombre)
+
+    def rpc(self, nombre, params):
+        # Las variantes *_json (sql/005) devuelven lo mismo en un solo valor json
+        base, escalar = (nombre[:-5], True) if nombre.endswith('_json') else (nombre, False)
+        return _Respuesta(lambda: (self._esperar(), getattr(self, '_rpc_' + base)(**params))[1], None if escalar else self.tope)
+
+    def _rpc_guardar_ticket(self, p_ticket, p_items):
+        clave = tuple(p_ticket[c] for c in ('user_id', 'supermercado_id', 'fecha', 'hora', 'monto_total'))
+        with self._lock:
+            if clave in self.tickets: raise Exception('duplicate key value violates unique constraint "tickets_unico"')
+            self.tickets.add(clave)
+            self.items_guardados += len(p_items)
+        return SimpleNamespace(data=len(p_items))
+
+    def _filtrar(self, p_desde=None, p_hasta=None, p_rubro=None, p_tipo=None, p_user_id=None, p_producto=None):
+        df = self.dataset.analisis()
+        m = np.ones(len(df), dtype=bool)
+        if p_desde: m &= (df['fecha'] >= p_desde).to_numpy()
+        if p_hasta: m &= (df['fecha'] <= p_hasta).to_numpy()
+        for col, valor in (('rubro', p_rubro), ('tipo_comercio', p_tipo), ('user_id', p_user_id), ('producto_final', p_producto)):
+            if valor: m &= (df[col] == valor).to_numpy()
+        return df[m]
+
+    def _rpc_pareto_productos(self, **filtros):
+        g = self._filtrar(**filtros).groupby('producto_final')['gasto_total'].sum().reset_index()
+        g = g.sort_values(['gasto_total', 'producto_final'], ascending=[False, True])
+        total = g['gasto_total'].sum()
+        g['porcentaje'] = 100 * g['gasto_total'] / total
+        g['acumulado'] = 100 * g['gasto_total'].cumsum() / total
+        g['categoria'] = np.select([g['acumulado'] <= 80, g['acumulado'] <= 95], ['A - Vital (80% Gasto)', 'B - Importante'], 'C - Trivial')
+        return SimpleNamespace(data=g.to_dict('records'))
+
+    def _rpc_precios_por_cadena(self, p_por_producto=False, **filtros):
+        claves = ['cadena', 'producto_final'] if p_por_producto else ['cadena']
+        g = self._filtrar(**filtros).groupby(claves)['precio'].agg(['size', 'mean', 'min', 'max']).reset_index()
+        g.columns = claves + ['compras', 'precio_promedio', 'precio_min', 'precio_max']
+        if not p_por_producto: g['producto_final'] = None
+        return SimpleNamespace(data=g.sort_values('precio_promedio').to_dict('records'))
+
+
+# --- GEMINI FALSO ---
+# generate_content devuelve el JSON de un ticket del dataset (uno distinto por llamada), con una
+# demora fija + proporcional a los bytes de imagen subidos. generate_content_stream lo entrega en trozos.
+class GeminiFalso:
+    def __init__(self, dataset, demora=0.0, seg_por_mb=0.0):
+        self.dataset, self.demora, self.seg_por_mb = dataset, demora, seg_por_mb
+        self.models = self
+        self.llamadas, self.bytes_enviados = 0, 0
+        self._lock = threading.Lock()
+
+    def _pedido(self, contents):
+        subidos = sum(len(getattr(getattr(p, 'inline_data', None), 'data', None) or b'') for p in contents)
+        with self._lock:
+            tk = self.llamadas % (int(self.dataset.item_ticket[-1]) + 1)
+            self.llamadas += 1
+            self.bytes_enviados += subidos
+        return json.dumps(self.dataset.ticket(tk)), subidos / 2**20 * self.seg_por_mb
+
+    def generate_content(self, model, contents, config=None):
+        texto, subida = self._pedido(contents)
+        time.sleep(self.demora + subida)
+        return SimpleNamespace(text=texto)
+
+    def generate_content_stream(self, model, contents, config=None, trozo=200):
+        # Misma respuesta en trozos de 'trozo' caracteres: la demora se reparte a lo largo del texto
+        texto, subida = self._pedido(contents)
+        time.sleep(subida)
+        trozos = [texto[i:i + trozo] for i in range(0, len(texto), trozo)]
+        for t in trozos:
+            time.sleep(self.demora / len(trozos))
+            yield SimpleNamespace(text=t)
+
+
+# --- GEMINI INESTABLE ---
+# Envuelve a otro cliente (GeminiFalso) con las fallas de hora pico: cuota por segundo (429 al
+# pasarse, como RESOURCE_EXHAUSTED), 503 al azar, una cola lenta de latencias y caídas totales
+# (caida(seg): durante seg segundos cada pedido espera lento_s y termina en 504). La demora base es
+# 'latencia' por pedido.
+class ErrorIAFalso(Exception):
+    def __init__(self, code, mensaje):
+        super().__init__(f"{code} {mensaje}")
+        self.code = code
+
+
+class GeminiInestable:
+    def __init__(self, cliente, cuota_rps=4, p_error=0.05, p_lento=0.05, latencia=0.2, lento_s=2.0, semilla=0):
+        self.cliente, self.cuota_rps, self.p_error, self.p_lento = cliente, cuota_rps, p_error, p_lento
+        self.latencia, self.lento_s = latencia, lento_s
+        self.models = self
+        self.pedidos, self.errores = 0, {}
+        self._rnd = np.random.default_rng(semilla)
+        self._ventana = []   # instantes de los pedidos aceptados en el último segundo
+        self._caida_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def caida(self, seg):
+        self._caida_hasta = time.monotonic() + seg
+
+    def _admitir(self):
+        # Espera la demora del pedido y lanza el error que corresponda (si corresponde)
+        with self._lock:
+            self.pedidos += 1
+            ahora = time.monotonic()
+            self._ventana = [t for t in self._ventana if ahora - t < 1.0]
+            if ahora < self._caida_hasta: demora, error = self.lento_s, (504, 'DEADLINE_EXCEEDED')
+            elif len(self._ventana) >= self.cuota_rps: demora, error = 0.0, (429, 'RESOURCE_EXHAUSTED')
+            elif self._rnd.random() < self.p_error: demora, error = 0.0, (503, 'UNAVAILABLE')
+            else: demora, error = (self.lento_s if self._rnd.random() < self.p_lento else self.latencia), None
+            if error: self.errores[error[0]] = self.errores.get(error[0], 0) + 1
+            else: self._ventana.append(ahora)
+        time.sleep(demora)
+        if error: raise ErrorIAFalso(*error)
+
+    def generate_content(self, model, contents, config=None):
+        self._admitir()
+        return self.cliente.generate_content(model, contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._admitir()
+        yield from self.cliente.generate_content_stream(model, contents, config)
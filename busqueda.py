@@ -0,0 +1,29 @@
+import re
+import unicodedata
+import pandas as pd
+
+# --- BÚSQUEDA DIFUSA DE PRODUCTOS ---
+# Envoltorio de buscar_productos (sql/004_busqueda_productos.sql, índice de trigramas en la base).
+
+COLUMNAS = ['precio_neto_unitario', 'nombre_producto', 'producto_generico', 'marca', 'codigo_barras', 'fecha', 'supermercado', 'puntaje']
+MARGEN = 0.15  # resultados a esta distancia del mejor puntaje se consideran el mismo producto
+
+
+def buscar(supabase, texto, limite=200):
+    # Compras parecidas al texto, de la más parecida a la menos (a igual puntaje, más barata primero)
+    res = supabase.rpc('buscar_productos', {'p_texto': texto, 'p_limite': limite}).execute()
+    df = pd.DataFrame(res.data or [], columns=COLUMNAS)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+def mejores(df, margen=MARGEN):
+    # Se queda con el grupo de mejor puntaje y lo ordena por precio
+    if df.empty: return df
+    return df[df['puntaje'] >= df['puntaje'].max() - margen].sort_values('precio_neto_unitario').reset_index(drop=True)
+
+
+# Texto sin acentos, en minúsculas y solo letras/números (las búsquedas locales de tablas y analitica)
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', texto.lower()).strip()
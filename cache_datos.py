@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+import trazas
+
+# --- CACHÉ DE DATASETS DE LAS PÁGINAS ---
+# Un valor por (nombre, ámbito): ámbito '*' para datos de todo el club o el user_id para los
+# de un socio. Cada entrada guarda la versión de datos con la que se calculó (datos.version);
+# mientras la versión no cambie se devuelve el mismo objeto (sin copiar, las páginas solo lo
+# leen) y en cuanto la carga o el borrado de un ticket la suben, el próximo rerun recalcula.
+# El tope es en bytes aproximados y no en entradas: mil resultados chicos de un filtro no
+# desalojan un dataset de análisis completo, que es lo caro de recalcular.
+
+MAX_MB = int(os.environ.get("CACHE_DATOS_MB", 1024))
+
+_entradas = OrderedDict()   # (nombre, ambito) -> (version, valor, bytes)
+_bytes = 0
+_lock = threading.Lock()
+_calculando = {}            # (nombre, ambito) -> Lock: una sola sesión recalcula cada entrada
+
+
+def _tamano(valor):
+    # DataFrame (o IndiceFiltros, por su .df) sin 'deep': no recorre cada string y alcanza como estimación
+    df = getattr(valor, 'df', valor)
+    if hasattr(df, 'memory_usage'): return int(df.memory_usage(index=True, deep=False).sum())
+    return sys.getsizeof(valor)
+
+
+def obtener(nombre, ambito, version, calcular):
+    clave = (nombre, str(ambito))
+    with trazas.tramo(f"cache {nombre[0] if isinstance(nombre, tuple) else nombre}", cache='hit') as t:
+        return _obtener(clave, version, calcular, t)
+
+
+def _obtener(clave, version, calcular, t):
+    global _bytes
+    with _lock:
+        hit = _entradas.get(clave)
+        if hit and hit[0] == version:
+            _entradas.move_to_end(clave)
+            return hit[1]
+        lock_clave = _calculando.setdefault(clave, threading.Lock())
+    with lock_clave:
+        # Otra sesión pudo haberlo calculado mientras esperábamos
+        with _lock:
+            hit = _entradas.get(clave)
+            if hit and hit[0] == version: return hit[1]
+        t['cache'] = 'miss'
+        valor = calcular()
+        tamano = _tamano(valor)
+        with _lock:
+            if clave in _entradas: _bytes -= _entradas[clave][2]
+            _entradas[clave] = (version, valor, tamano)
+            _entradas.move_to_end(clave)
+            _bytes += tamano
+            # La entrada recién calculada queda aunque sola pase el tope
+            while _bytes > MAX_MB * 2**20 and len(_entradas) > 1:
+                viejo, (_, _, b) = _entradas.popitem(last=False)
+                _bytes -= b
+                _calculando.pop(viejo, None)
+    return valor
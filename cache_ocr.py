@@ -0,0 +1,162 @@
+import io
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import imagenes
+
+# --- CACHÉ DE RESULTADOS DE LA IA ---
+# Clave exacta: sha256 de los bytes de las fotos (en orden). Además guardamos un hash perceptual
+# (dHash 64 bits por foto) para avisar "esto parece un ticket ya cargado" aunque la foto se haya
+# re-comprimido o recortado un poco, antes de gastar una llamada a Gemini.
+# Vive en un SQLite local con desalojo por tamaño (se borran primero los menos usados).
+# El aviso de duplicado mira solo tickets que se guardaron de verdad (tabla guardados); al borrar
+# un ticket se olvida su resultado, así volver a subir las mismas fotos las lee de nuevo.
+
+RUTA_CACHE = os.environ.get("RUTA_CACHE_OCR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ocr.sqlite")
+MAX_BYTES = int(os.environ.get("CACHE_OCR_MAX_MB", 50)) * 2**20
+UMBRAL_PARECIDO = 6  # bits distintos de 64 por foto para considerarla "la misma"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    tipo TEXT, clave TEXT, phash TEXT, resultado TEXT, bytes INTEGER, usado REAL,
+    PRIMARY KEY (tipo, clave)
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_usado ON resultados (usado);
+CREATE TABLE IF NOT EXISTS guardados (
+    clave TEXT PRIMARY KEY, phash TEXT, user_id TEXT, fecha TEXT, monto REAL, resumen TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_guardados_ticket ON guardados (user_id, fecha, monto);
+"""
+MAX_HUELLAS = 256  # dHash recientes por sha256 de la foto: la misma foto no se decodifica dos veces
+
+_lock = threading.Lock()
+_dhashes = OrderedDict()
+_esquema_listo = set()   # rutas ya preparadas en este proceso
+_lock_esquema = threading.Lock()
+
+
+def _conectar():
+    # El esquema se prepara una vez por proceso y archivo, no en cada trabajo de la cola
+    if RUTA_CACHE not in _esquema_listo:
+        with _lock_esquema:
+            if RUTA_CACHE not in _esquema_listo:
+                os.makedirs(os.path.dirname(RUTA_CACHE), exist_ok=True)
+                con = sqlite3.connect(RUTA_CACHE, timeout=30)
+                try: con.executescript(ESQUEMA)
+                finally: con.close()
+                _esquema_listo.add(RUTA_CACHE)
+    return sqlite3.connect(RUTA_CACHE, timeout=30, check_same_thread=False)
+
+
+def _dhash(datos):
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(datos))).convert('L').resize((9, 8), Image.LANCZOS)
+    px = list(img.getdata())
+    bits = 0
+    for fila in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[fila * 9 + col] > px[fila * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def huella(lista_imagenes):
+    # (sha256 del conjunto, dHash de cada foto separados por coma)
+    sha = hashlib.sha256()
+    phashes = []
+    for img in lista_imagenes:
+        datos = imagenes.leer_bytes(img)
+        digest = hashlib.sha256(datos).digest()
+        sha.update(digest)
+        with _lock:
+            phash = _dhashes.get(digest)
+        if phash is None:
+            phash = _dhash(datos)
+            with _lock:
+                _dhashes[digest] = phash
+                while len(_dhashes) > MAX_HUELLAS: _dhashes.popitem(last=False)
+        phashes.append(phash)
+    return sha.hexdigest(), ','.join(phashes)
+
+
+def buscar(tipo, h):
+    # Resultado guardado para exactamente estas fotos (o None)
+    with _lock:
+        con = _conectar()
+        try:
+            fila = con.execute("SELECT resultado FROM resultados WHERE tipo = ? AND clave = ?", (tipo, h[0])).fetchone()
+            if fila:
+                con.execute("UPDATE resultados SET usado = ? WHERE tipo = ? AND clave = ?", (time.time(), tipo, h[0]))
+                con.commit()
+        finally: con.close()
+    return fila[0] if fila else None
+
+
+def parecido_guardado(h, user_id=None, umbral=UMBRAL_PARECIDO):
+    # Resumen (texto JSON) de un ticket guardado con fotos casi iguales (misma cantidad, cada foto
+    # a <= umbral bits), o None
+    sql, params = "SELECT phash, resumen FROM guardados", ()
+    if user_id: sql, params = sql + " WHERE user_id = ?", (str(user_id),)
+    with _lock:
+        con = _conectar()
+        try: filas = con.execute(sql, params).fetchall()
+        finally: con.close()
+    objetivo = [int(p, 16) for p in h[1].split(',')]
+    for phash, resumen in filas:
+        otros = [int(p, 16) for p in phash.split(',')]
+        if len(otros) == len(objetivo) and all(bin(a ^ b).count('1') <= umbral for a, b in zip(objetivo, otros)):
+            return resumen
+    return None
+
+
+def marcar_guardado(h, user_id, fecha, monto, resumen):
+    # El ticket de estas fotos quedó guardado en la base
+    with _lock:
+        con = _conectar()
+        try:
+            con.execute("INSERT OR REPLACE INTO guardados VALUES (?, ?, ?, ?, ?, ?)", (h[0], h[1], str(user_id), str(fecha), float(monto), resumen))
+            con.commit()
+        finally: con.close()
+
+
+def olvidar_ticket(user_id, fecha, monto):
+    # Ticket borrado: deja de contar como duplicado y su lectura sale del caché (se vuelve a leer)
+    with _lock:
+        con = _conectar()
+        try:
+            claves = [f[0] for f in con.execute("SELECT clave FROM guardados WHERE user_id = ? AND fecha = ? AND abs(monto - ?) < 0.005",
+                                                (str(user_id), str(fecha), float(monto)))]
+            con.executemany("DELETE FROM guardados WHERE clave = ?", [(c,) for c in claves])
+            con.executemany("DELETE FROM resultados WHERE tipo = 'ticket' AND clave = ?", [(c,) for c in claves])
+            con.commit()
+        finally: con.close()
+    return len(claves)
+
+
+def guardar(tipo, h, resultado):
+    with _lock:
+        con = _conectar()
+        try:
+            con.execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?)",
+                        (tipo, h[0], h[1], resultado, len(resultado.encode()), time.time()))
+            total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM resultados").fetchone()[0]
+            # Desalojo: los menos usados hasta volver a entrar en el tope
+            for clave_tipo, clave, b in con.execute("SELECT tipo, clave, bytes FROM resultados ORDER BY usado").fetchall():
+                if total <= MAX_BYTES: break
+                con.execute("DELETE FROM resultados WHERE tipo = ? AND clave = ?", (clave_tipo, clave))
+                total -= b
+            con.commit()
+        finally: con.close()
+
+
+def obtener(tipo, lista_imagenes, calcular, forzar=False):
+    # Memoiza calcular() (que devuelve texto) por el contenido exacto de las fotos.
+    # forzar=True no mira el caché (vuelve a calcular y reemplaza lo guardado).
+    h = huella(lista_imagenes)
+    previo = None if forzar else buscar(tipo, h)
+    if previo is not None: return previo
+    resultado = calcular()
+    guardar(tipo, h, resultado)
+    return resultado
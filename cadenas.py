@@ -0,0 +1,61 @@
+import re
+import unicodedata
+from functools import lru_cache
+import pandas as pd
+
+# --- CANONIZACIÓN DE CADENAS ---
+# Tabla de alias -> cadena canónica. Para sumar una cadena nueva alcanza con agregarla acá.
+# Los alias se buscan como palabra completa ('DIA' no matchea en 'MEDIA' ni 'INDIANA').
+ALIAS_CADENAS = {
+    'COTO': ['COTO'],
+    'JUMBO': ['JUMBO'],
+    'CARREFOUR': ['CARREFOUR'],
+    'DIA': ['DIA'],
+    'DISCO': ['DISCO'],
+    'VEA': ['VEA'],
+    'MAKRO': ['MAKRO'],
+    'FARMACITY': ['FARMACITY', 'SIMPLICITY', 'FARMCITY'],
+    'SELMA': ['SELMA'],
+}
+
+TIPO_POR_CADENA = {'FARMACITY': 'Farmacia', 'SELMA': 'Farmacia'}
+
+_CANONICA = {alias: cadena for cadena, alias_lista in ALIAS_CADENAS.items() for alias in alias_lista}
+# Un solo patrón compilado; los alias largos van primero para que ganen sobre los cortos
+_PATRON = re.compile(r'(?<![A-Z0-9])(' + '|'.join(re.escape(a) for a in sorted(_CANONICA, key=len, reverse=True)) + r')(?![A-Z0-9])')
+
+
+def _normalizar(nombre):
+    # Mayúsculas sin acentos ('Día' -> 'DIA')
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    return ' '.join(texto.upper().split())
+
+
+@lru_cache(maxsize=4096)
+def canonizar(nombre):
+    # Nombre de sucursal tal como vino del ticket -> cadena canónica (o el nombre normalizado)
+    if not nombre: return ''
+    n = _normalizar(nombre)
+    m = _PATRON.search(n)
+    return _CANONICA[m.group(1)] if m else n
+
+
+def _categorica(codigos, valores, index):
+    # 'valores' es un valor por código original (puede repetir); arma la categórica sin recorrer filas
+    cod_nuevos, categorias = pd.factorize(pd.Index(valores))
+    return pd.Series(pd.Categorical.from_codes(cod_nuevos[codigos], categories=categorias), index=index)
+
+
+def columna_cadena(serie):
+    # Canoniza una vez por nombre distinto y devuelve una columna categórica alineada a 'serie'
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Ya viene categórica: se canoniza por categoría; el código -1 (nulo) toma el '' agregado al final
+        return _categorica(serie.cat.codes.to_numpy(), [canonizar(u) for u in serie.cat.categories] + [''], serie.index)
+    codigos, unicos = pd.factorize(serie.fillna(''))
+    return _categorica(codigos, [canonizar(u) for u in unicos], serie.index)
+
+
+def columna_tipo(cadenas):
+    # 'Farmacia' / 'Supermercado' a partir de la columna categórica de cadenas
+    tipos = [TIPO_POR_CADENA.get(c, 'Supermercado') for c in cadenas.cat.categories]
+    return _categorica(cadenas.cat.codes.to_numpy(), tipos, cadenas.index)
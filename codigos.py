@@ -0,0 +1,106 @@
+import io
+import re
+from collections import Counter
+import imagenes
+
+# --- CÓDIGOS DE BARRAS (EAN-13 / UPC-A) ---
+# Lector en Python puro sobre Pillow: recorre varias líneas horizontales de la foto,
+# las binariza, arma las corridas de barras/espacios y las compara con los patrones EAN.
+# Si no hay un código legible devuelve None y el Buscador sigue por la IA.
+
+# Anchos (en módulos) de los dígitos codificados L; G es L al revés y R tiene los mismos anchos que L
+_L = ['3211', '2221', '2122', '1411', '1132', '1231', '1114', '1312', '1213', '3112']
+_PATRONES_IZQ = [([int(c) for c in p], d, 'L') for d, p in enumerate(_L)] + [([int(c) for c in reversed(p)], d, 'G') for d, p in enumerate(_L)]
+_PATRONES_DER = [([int(c) for c in p], d) for d, p in enumerate(_L)]
+_PRIMER_DIGITO = {'LLLLLL': 0, 'LLGLGG': 1, 'LLGGLG': 2, 'LLGGGL': 3, 'LGLLGG': 4, 'LGGLLG': 5, 'LGGGLG': 6, 'LGLGLG': 7, 'LGLGGL': 8, 'LGGLGL': 9}
+_CORRIDAS = 59       # 3 guarda + 24 + 5 centro + 24 + 3 guarda
+ERROR_MAX = 1.2      # desvío máximo (en módulos) aceptado por dígito
+VOTOS_MIN = 2        # líneas que tienen que coincidir para aceptar un código
+LINEAS = 24          # líneas horizontales a probar por orientación
+ANCHO_TRABAJO = 1000
+
+
+def digito_control(doce):
+    suma = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(doce))
+    return str((10 - suma % 10) % 10)
+
+
+def ean_valido(codigo):
+    return bool(re.fullmatch(r'\d{13}', codigo or '')) and digito_control(codigo[:12]) == codigo[12]
+
+
+def normalizar_ean(texto):
+    # Solo dígitos; UPC-A (12) pasa a EAN-13 con un 0 adelante
+    digitos = re.sub(r'\D', '', str(texto or ''))
+    if len(digitos) == 12: digitos = '0' + digitos
+    return digitos if ean_valido(digitos) else None
+
+
+def _digito(anchos, patrones):
+    total = sum(anchos)
+    if not total: return None
+    norm = [w * 7 / total for w in anchos]
+    error, patron = min((sum(abs(a - b) for a, b in zip(norm, p[0])), p) for p in patrones)
+    return patron if error <= ERROR_MAX else None
+
+
+def _decodificar_corridas(corridas):
+    # corridas: anchos alternados empezando por una barra (oscuro)
+    for ini in range(0, len(corridas) - _CORRIDAS + 1, 2):
+        c = corridas[ini:ini + _CORRIDAS]
+        modulo = sum(c) / 95
+        if any(abs(w / modulo - 1) > 0.7 for w in c[:3]): continue  # guarda de inicio 1-1-1
+        izq, paridad = '', ''
+        for k in range(6):
+            p = _digito(c[3 + 4 * k:7 + 4 * k], _PATRONES_IZQ)
+            if not p: break
+            izq += str(p[1]); paridad += p[2]
+        if len(izq) < 6 or paridad not in _PRIMER_DIGITO: continue
+        der = ''
+        for k in range(6):
+            p = _digito(c[32 + 4 * k:36 + 4 * k], _PATRONES_DER)
+            if not p: break
+            der += str(p[1])
+        codigo = f"{_PRIMER_DIGITO[paridad]}{izq}{der}"
+        if len(der) == 6 and ean_valido(codigo): return codigo
+    return None
+
+
+def _corridas(fila):
+    umbral = (min(fila) + max(fila)) / 2
+    bits = [v < umbral for v in fila]  # True = barra
+    corridas, actual, largo = [], bits[0], 0
+    for b in bits:
+        if b == actual: largo += 1
+        else:
+            corridas.append((actual, largo))
+            actual, largo = b, 1
+    corridas.append((actual, largo))
+    # Empezamos en la primera barra
+    while corridas and not corridas[0][0]: corridas.pop(0)
+    return [w for _, w in corridas]
+
+
+def _leer_orientacion(img):
+    ancho, alto = img.size
+    px = img.load()
+    votos = Counter()
+    for j in range(LINEAS):
+        y = int(alto * (0.15 + 0.7 * j / max(1, LINEAS - 1)))
+        fila = [px[x, y] for x in range(ancho)]
+        if max(fila) - min(fila) < 40: continue  # sin contraste
+        corridas = _corridas(fila)
+        codigo = _decodificar_corridas(corridas) or _decodificar_corridas(_corridas(fila[::-1]))
+        if codigo: votos[codigo] += 1
+    return votos
+
+
+def leer_codigo(archivo):
+    # EAN-13 leído de la foto (str) o None
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(imagenes.leer_bytes(archivo)))).convert('L')
+    if img.width > ANCHO_TRABAJO: img = img.resize((ANCHO_TRABAJO, int(img.height * ANCHO_TRABAJO / img.width)), Image.LANCZOS)
+    for orientacion in (img, img.transpose(Image.Transpose.ROTATE_90)):  # el segundo intento es para códigos verticales
+        votos = _leer_orientacion(orientacion).most_common(1)
+        if votos and votos[0][1] >= VOTOS_MIN: return votos[0][0]
+    return None
@@ -0,0 +1,240 @@
+import io
+import os
+import json
+import time
+import uuid
+import itertools
+import sqlite3
+import threading
+import extraccion
+import imagenes
+import ingesta
+import trazas
+
+# --- COLA DE TRABAJOS DE TICKETS ---
+# La página de carga solo encola las fotos y consulta el estado; la IA y la base corren
+# en hilos de fondo (dentro del proceso de Streamlit) o en procesos aparte (worker.py).
+# El estado vive en un SQLite compartido, así un refresh del navegador no pierde nada.
+# Estados: en_cola -> procesando -> listo | fallido | revisar (parece un ticket ya guardado:
+# espera que el socio lo mande igual con forzar() o lo descarte)
+
+RUTA_COLA = os.environ.get("RUTA_COLA") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "cola.sqlite")
+HILOS = int(os.environ.get("COLA_HILOS", 4))
+VENCIMIENTO = 600   # segundos: un trabajo 'procesando' más viejo que esto se da por abandonado
+MAX_INTENTOS = 3
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY, user_id TEXT, nombre TEXT, estado TEXT NOT NULL, intentos INTEGER DEFAULT 0,
+    creado REAL, actualizado REAL, resultado TEXT, error TEXT, forzar INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado);
+CREATE INDEX IF NOT EXISTS idx_trabajos_user ON trabajos (user_id, creado);
+CREATE TABLE IF NOT EXISTS imagenes_trabajo (
+    trabajo_id TEXT, orden INTEGER, datos BLOB, PRIMARY KEY (trabajo_id, orden)
+);
+CREATE TABLE IF NOT EXISTS items_trabajo (
+    trabajo_id TEXT, orden INTEGER, item TEXT, PRIMARY KEY (trabajo_id, orden)
+);
+"""
+
+
+_esquema_listo = set()   # rutas ya preparadas en este proceso (el WAL queda grabado en el archivo)
+_lock_esquema = threading.Lock()
+
+
+def _conectar():
+    # El esquema y el modo WAL se preparan una vez por proceso, no en cada consulta del refresco de la página
+    if RUTA_COLA not in _esquema_listo:
+        with _lock_esquema:
+            if RUTA_COLA not in _esquema_listo:
+                os.makedirs(os.path.dirname(RUTA_COLA), exist_ok=True)
+                con = sqlite3.connect(RUTA_COLA, timeout=30, isolation_level=None)
+                try:
+                    con.execute("PRAGMA journal_mode=WAL")
+                    con.executescript(ESQUEMA)
+                    # Colas creadas antes de la columna forzar
+                    if 'forzar' not in {c[1] for c in con.execute("PRAGMA table_info(trabajos)")}:
+                        con.execute("ALTER TABLE trabajos ADD COLUMN forzar INTEGER DEFAULT 0")
+                finally: con.close()
+                _esquema_listo.add(RUTA_COLA)
+    con = sqlite3.connect(RUTA_COLA, timeout=30, isolation_level=None, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def encolar(user_id, lista_imagenes, nombre=None, forzar=False):
+    # Guarda las fotos y deja el trabajo en cola. Devuelve el id.
+    # forzar=True: sin aviso de duplicado y sin caché de lecturas (se vuelve a leer con la IA)
+    trabajo_id = uuid.uuid4().hex
+    ahora = time.time()
+    con = _conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        con.execute("INSERT INTO trabajos (id, user_id, nombre, estado, creado, actualizado, forzar) VALUES (?, ?, ?, 'en_cola', ?, ?, ?)",
+                    (trabajo_id, str(user_id) if user_id else None, nombre, ahora, ahora, int(forzar)))
+        con.executemany("INSERT INTO imagenes_trabajo VALUES (?, ?, ?)",
+                        [(trabajo_id, i, imagenes.leer_bytes(img)) for i, img in enumerate(lista_imagenes)])
+        con.execute("COMMIT")
+    finally: con.close()
+    return trabajo_id
+
+
+def tomar():
+    # Reserva el trabajo más viejo en cola (o uno abandonado) de forma atómica entre procesos
+    con = _conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        # Abandonados en el último intento (el proceso murió procesándolos): no se reintentan más
+        vencidos = con.execute("SELECT id FROM trabajos WHERE estado = 'procesando' AND actualizado < ? AND intentos >= ?",
+                               (time.time() - VENCIMIENTO, MAX_INTENTOS)).fetchall()
+        for v in vencidos:
+            con.execute("UPDATE trabajos SET estado = 'fallido', error = ?, actualizado = ? WHERE id = ?",
+                        ("Se interrumpió el procesamiento demasiadas veces", time.time(), v['id']))
+            con.execute("DELETE FROM imagenes_trabajo WHERE trabajo_id = ?", (v['id'],))
+            con.execute("DELETE FROM items_trabajo WHERE trabajo_id = ?", (v['id'],))
+        fila = con.execute(
+            "SELECT id, user_id, intentos, forzar FROM trabajos WHERE estado = 'en_cola' OR (estado = 'procesando' AND actualizado < ? AND intentos < ?) "
+            "ORDER BY creado LIMIT 1", (time.time() - VENCIMIENTO, MAX_INTENTOS)).fetchone()
+        if not fila:
+            con.execute("COMMIT")
+            return None
+        con.execute("UPDATE trabajos SET estado = 'procesando', intentos = intentos + 1, actualizado = ? WHERE id = ?", (time.time(), fila['id']))
+        imgs = [r['datos'] for r in con.execute("SELECT datos FROM imagenes_trabajo WHERE trabajo_id = ? ORDER BY orden", (fila['id'],))]
+        con.execute("COMMIT")
+        return {'id': fila['id'], 'user_id': fila['user_id'], 'intentos': fila['intentos'] + 1, 'forzar': bool(fila['forzar']), 'imagenes': imgs}
+    finally: con.close()
+
+
+def _cerrar(trabajo_id, estado, resultado=None, error=None):
+    con = _conectar()
+    try:
+        con.execute("UPDATE trabajos SET estado = ?, resultado = ?, error = ?, actualizado = ? WHERE id = ?",
+                    (estado, json.dumps(resultado) if resultado is not None else None, error, time.time(), trabajo_id))
+        # Las fotos ya no hacen falta una vez terminado; los items parciales tampoco (un reintento relee)
+        if estado in ('listo', 'fallido'): con.execute("DELETE FROM imagenes_trabajo WHERE trabajo_id = ?", (trabajo_id,))
+        con.execute("DELETE FROM items_trabajo WHERE trabajo_id = ?", (trabajo_id,))
+    finally: con.close()
+
+
+PENDIENTES = ('en_cola', 'procesando', 'revisar')
+
+
+def trabajos_de(user_id, limite=10):
+    # Todos los trabajos sin terminar (un lote grande no deja 'revisar' fuera de la vista)
+    # más los últimos 'limite' terminados
+    con = _conectar()
+    try:
+        filas = con.execute(
+            "SELECT * FROM trabajos WHERE user_id = ? AND estado IN (?, ?, ?) "
+            "UNION ALL SELECT * FROM (SELECT * FROM trabajos WHERE user_id = ? AND estado NOT IN (?, ?, ?) ORDER BY creado DESC LIMIT ?) "
+            "ORDER BY creado DESC", (str(user_id), *PENDIENTES, str(user_id), *PENDIENTES, limite)).fetchall()
+    finally: con.close()
+    trabajos = []
+    for f in filas:
+        t = dict(f)
+        t['resultado'] = json.loads(t['resultado']) if t['resultado'] else None
+        trabajos.append(t)
+    return trabajos
+
+
+def forzar(trabajo_id):
+    # "Procesar igual" de un trabajo en revisar: vuelve a la cola sin aviso de duplicado ni caché
+    con = _conectar()
+    try: con.execute("UPDATE trabajos SET estado = 'en_cola', forzar = 1, intentos = 0, error = NULL, actualizado = ? "
+                     "WHERE id = ? AND estado = 'revisar'", (time.time(), trabajo_id))
+    finally: con.close()
+
+
+def descartar(trabajo_id):
+    _cerrar(trabajo_id, 'fallido', error="Descartado (posible duplicado)")
+
+
+def items_parciales(trabajo_id):
+    # Productos ya leídos de un ticket que la IA todavía está devolviendo (streaming)
+    con = _conectar()
+    try: filas = con.execute("SELECT item FROM items_trabajo WHERE trabajo_id = ? ORDER BY orden", (trabajo_id,)).fetchall()
+    finally: con.close()
+    return [json.loads(f['item']) for f in filas]
+
+
+def _anotador(trabajo_id):
+    # al_item para extraccion.extraer_ticket: cada producto que llega queda visible para la página
+    con = _conectar()
+    con.execute("DELETE FROM items_trabajo WHERE trabajo_id = ?", (trabajo_id,))
+    orden = itertools.count()
+    def al_item(item):
+        con.execute("INSERT OR REPLACE INTO items_trabajo VALUES (?, ?, ?)", (trabajo_id, next(orden), json.dumps(item, ensure_ascii=False)))
+    return con, al_item
+
+
+def procesar(trabajo, supabase, client):
+    # Una traza por ticket procesado: extracción (caché / IA) + guardado + sincronización
+    with trazas.traza('cola ticket', user_id=str(trabajo['user_id']), intentos=trabajo['intentos'],
+                      bytes=sum(len(b) for b in trabajo['imagenes'])) as t:
+        r = _procesar(trabajo, supabase, client)
+        t['resultado'] = r['estado']
+    return r
+
+
+def _procesar(trabajo, supabase, client):
+    imgs = [io.BytesIO(b) for b in trabajo['imagenes']]
+    forzado = trabajo.get('forzar', False)
+    # Aviso de duplicado acá y no en la página: el dHash de las fotos no frena el script de Streamlit
+    previo = None if forzado else extraccion.posible_duplicado(imgs, trabajo['user_id'])
+    if previo:
+        _cerrar(trabajo['id'], 'revisar', {'estado': 'posible_duplicado', 'supermercado': previo.get('supermercado'), 'fecha': previo.get('fecha')})
+        return {'estado': 'posible_duplicado'}
+    con, al_item = _anotador(trabajo['id'])
+    try:
+        r = ingesta.procesar_ticket(
+            imgs,
+            extraer=lambda fotos: extraccion.extraer_ticket(client, fotos, al_item=al_item, forzar=forzado),
+            guardar=lambda data: ingesta.guardar_ticket(supabase, data, trabajo['user_id']),
+        )
+    finally: con.close()
+    data = r.get('data') or {}
+    resumen = {'estado': r['estado'], 'items': r.get('items'), 'supermercado': data.get('supermercado'),
+               'fecha': data.get('fecha'), 'total': data.get('total_pagado'), 'moneda': data.get('moneda')}
+    if r['estado'] == 'error' and trabajo['intentos'] < MAX_INTENTOS:
+        _cerrar(trabajo['id'], 'en_cola', error=r['detalle'])  # se reintenta
+    elif r['estado'] == 'error': _cerrar(trabajo['id'], 'fallido', resumen, r['detalle'])
+    else: _cerrar(trabajo['id'], 'listo', resumen)
+    if r['estado'] in ('ok', 'duplicado'): extraccion.recordar_guardado(imgs, data, trabajo['user_id'])
+    if r['estado'] == 'ok':
+        # El espejo suma el ticket nuevo a los agregados de precios sin esperar al próximo refresco
+        import datos  # pandas/pyarrow: no hacen falta para encolar, solo en los hilos que procesan
+        try: datos.sincronizar(supabase, forzar=True)
+        except Exception: pass
+    return r
+
+
+def trabajar(supabase, client, parar=None, espera=1.0):
+    # Bucle de un hilo trabajador: toma, procesa y vuelve a esperar
+    while not (parar and parar.is_set()):
+        # Con el cortacircuitos de la IA abierto no se toman trabajos (fallarían y gastarían intentos)
+        circuito = getattr(client, 'circuito', None)
+        if circuito and circuito.cortado():
+            time.sleep(espera)
+            continue
+        trabajo = tomar()
+        if not trabajo:
+            time.sleep(espera)
+            continue
+        try: procesar(trabajo, supabase, client)
+        except Exception as e: _cerrar(trabajo['id'], 'fallido', error=str(e))
+
+
+_hilos = []
+_lock_hilos = threading.Lock()
+
+
+def iniciar_en_proceso(supabase, client, hilos=HILOS):
+    # Arranca los hilos de fondo una sola vez por proceso (COLA_SOLO_EXTERNA=1 los deja a worker.py)
+    if os.environ.get("COLA_SOLO_EXTERNA") == "1": return
+    with _lock_hilos:
+        if _hilos: return
+        for i in range(hilos):
+            h = threading.Thread(target=trabajar, args=(supabase, client), name=f"cola-{i}", daemon=True)
+            h.start()
+            _hilos.append(h)
@@ -0,0 +1,433 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+import cadenas
+import trazas
+
+# --- ESPEJO LOCAL DE PRECIOS ---
+# Copia local (SQLite) de items_compra + tickets + supermercados ya aplanada.
+# Cada refresco trae solo las filas nuevas (marca de agua created_at/id),
+# así las páginas no vuelven a bajar toda la tabla en cada expiración de caché.
+# Los borrados hechos desde la app (borrar_ticket_local) se replican; uno hecho a mano en
+# Supabase no llega nunca: para eso hay que borrar el archivo del espejo y se rearma solo.
+
+RUTA_ESPEJO = os.environ.get("RUTA_ESPEJO") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "espejo_precios.sqlite")
+INTERVALO_SYNC = 30  # segundos mínimos entre dos consultas de sincronización
+TAMANO_LOTE = 1000   # filas pedidas por página (el max-rows de PostgREST puede devolver menos)
+# created_at se asigna al empezar la transacción, no al confirmarla: un guardado lento (otro hilo
+# de la cola, worker.py) puede aparecer con un created_at anterior a la marca. Cada sync vuelve a
+# pedir este margen y descarta lo que ya está en el espejo.
+SOLAPE_SYNC = int(os.environ.get("SOLAPE_SYNC", 300))  # segundos
+
+SELECT_ITEMS = (
+    'id, created_at, ticket_id, nombre_producto, producto_generico, marca, rubro, cantidad, '
+    'precio_neto_unitario, unidad_medida, contenido_neto, unidad_contenido, codigo_barras, '
+    'tickets!inner(fecha, user_id, sucursal_localidad, supermercados(nombre))'
+)
+
+COLUMNAS = [
+    'id', 'created_at', 'ticket_id', 'user_id', 'fecha', 'supermercado_nombre', 'sucursal_localidad',
+    'nombre_producto', 'producto_generico', 'marca', 'rubro', 'cantidad', 'precio_neto_unitario',
+    'unidad_medida', 'contenido_neto', 'unidad_contenido', 'codigo_barras'
+]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id PRIMARY KEY, created_at TEXT, ticket_id, user_id TEXT, fecha TEXT,
+    supermercado_nombre TEXT, sucursal_localidad TEXT, nombre_producto TEXT, producto_generico TEXT,
+    marca TEXT, rubro TEXT, cantidad REAL, precio_neto_unitario REAL, unidad_medida TEXT,
+    contenido_neto REAL, unidad_contenido TEXT, codigo_barras TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_marca ON items (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_items_user ON items (user_id);
+CREATE INDEX IF NOT EXISTS idx_items_ticket ON items (ticket_id);
+CREATE INDEX IF NOT EXISTS idx_items_ean ON items (codigo_barras, fecha);
+CREATE INDEX IF NOT EXISTS idx_items_user_fecha ON items (user_id, fecha);
+CREATE TABLE IF NOT EXISTS versiones (ambito TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS borrados (seq INTEGER PRIMARY KEY AUTOINCREMENT, ticket_id);
+CREATE TABLE IF NOT EXISTS precios_diarios (
+    producto TEXT, user_id TEXT, cadena TEXT, fecha TEXT, rubro TEXT,
+    compras INTEGER, minimo REAL, maximo REAL, suma REAL,
+    primero REAL, primero_marca TEXT, primero_id, ultimo REAL, ultimo_marca TEXT, ultimo_id,
+    PRIMARY KEY (producto, user_id, cadena, fecha, rubro)
+);
+"""
+
+_lock = threading.Lock()
+_ultimo_sync = 0.0
+_sincronizando = 0   # sync en curso en este proceso (fuera de _lock mientras espera la red)
+_con_esquema = set()  # archivos en los que ya se corrió ESQUEMA en este proceso
+
+
+def _conectar():
+    os.makedirs(os.path.dirname(RUTA_ESPEJO), exist_ok=True)
+    con = sqlite3.connect(RUTA_ESPEJO, timeout=30, check_same_thread=False)
+    if RUTA_ESPEJO not in _con_esquema:
+        con.executescript(ESQUEMA)
+        # Agregados diarios de antes de la columna rubro: se tiran y sincronizar() los rearma
+        if 'rubro' not in {c[1] for c in con.execute("PRAGMA table_info(precios_diarios)")}:
+            con.execute("DROP TABLE precios_diarios")
+            con.executescript(ESQUEMA)
+        _con_esquema.add(RUTA_ESPEJO)
+    return con
+
+
+def _marca_de_agua(con):
+    fila = con.execute("SELECT created_at, id FROM items ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+    return fila if fila else (None, None)
+
+
+# Rutas del join anidado -> columna plana
+RUTAS_JOIN = {
+    'tickets.fecha': 'fecha', 'tickets.user_id': 'user_id',
+    'tickets.sucursal_localidad': 'sucursal_localidad', 'tickets.supermercados.nombre': 'supermercado_nombre',
+}
+NUMERICAS = ['cantidad', 'precio_neto_unitario', 'contenido_neto']
+
+
+def aplanar(filas):
+    # Aplana la respuesta del join (tickets -> supermercados) en columnas tipadas de una sola vez:
+    # Arrow arma structs anidados en C y flatten() los vuelve columnas 'tickets.x' sin recorrer filas.
+    # Supermercado ausente (join nulo) -> 'Desconocido'; fecha a datetime y números a float.
+    if not filas: return pd.DataFrame(columns=list(COLUMNAS))
+    try:
+        tabla = pa.Table.from_pylist(filas)
+        while any(pa.types.is_struct(c.type) for c in tabla.columns): tabla = tabla.flatten()
+        df = tabla.to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Tipos mezclados en alguna columna (ej. "1" y 1): camino lento pero tolerante
+        df = pd.json_normalize(filas)
+    df = df.rename(columns=RUTAS_JOIN)
+    for col in RUTAS_JOIN.values():
+        if col not in df: df[col] = None
+    # Restos del anidado (ej. 'tickets.supermercados' cuando vino null en todo el lote)
+    df = df.drop(columns=[c for c in df.columns if c == 'tickets' or c.startswith('tickets.')])
+    df['supermercado_nombre'] = df['supermercado_nombre'].fillna('Desconocido')
+    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce', format='%Y-%m-%d')
+    # Código de barras solo con dígitos, así el índice EAN matchea aunque la IA lo haya escrito con espacios
+    if 'codigo_barras' in df:
+        ean = df['codigo_barras'].astype('string').str.replace(r'\D', '', regex=True)
+        df['codigo_barras'] = ean.mask(ean == '')
+    for col in NUMERICAS:
+        if col in df: df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+def _filas_sqlite(df):
+    df = df.reindex(columns=COLUMNAS)
+    df['fecha'] = df['fecha'].dt.strftime('%Y-%m-%d')
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _con_solape(marca):
+    # Marca de agua menos SOLAPE_SYNC, en el mismo formato ISO que created_at
+    if not marca: return None
+    return (pd.Timestamp(marca) - pd.Timedelta(seconds=SOLAPE_SYNC)).isoformat(timespec='microseconds')
+
+
+def _desde(q, marca, ultimo_id):
+    # Sin ultimo_id: desde el instante 'marca' inclusive (primera página con solape)
+    if not marca: return q
+    if ultimo_id is None: return q.gte('created_at', marca)
+    return q.or_(f'created_at.gt."{marca}",and(created_at.eq."{marca}",id.gt.{ultimo_id})')
+
+
+def _pagina(supabase, marca, ultimo_id, tamano):
+    q = _desde(supabase.table('items_compra').select(SELECT_ITEMS), marca, ultimo_id).order('created_at').order('id')
+    return q.limit(tamano).execute()
+
+
+def iterar_items(supabase, marca=None, ultimo_id=None, tamano=TAMANO_LOTE):
+    # Recorre items_compra por keyset (created_at, id) desde la marca dada, en lotes ordenados.
+    # El servidor puede devolver menos de 'tamano' (su max-rows manda): se sigue hasta una página
+    # vacía, nunca por el largo de la página. El keyset no saltea filas si se borra algo durante el
+    # recorrido (los offsets sí). La página siguiente se pide en un hilo mientras el llamador
+    # procesa la actual: a lo sumo dos páginas en memoria.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        siguiente = pool.submit(_pagina, supabase, marca, ultimo_id, tamano)
+        while True:
+            lote = siguiente.result().data or []
+            if not lote: return
+            ultimo = lote[-1]
+            siguiente = pool.submit(_pagina, supabase, ultimo['created_at'], ultimo['id'], tamano)
+            yield lote
+
+
+def sincronizar(supabase, forzar=False):
+    # Trae lo que es más nuevo que la última fila del espejo (con SOLAPE_SYNC de margen). Devuelve filas nuevas.
+    # Las páginas se piden fuera de _lock: las lecturas del espejo solo esperan la escritura de cada lote.
+    # Dos sync a la vez (hilos de la cola) son seguros: cada lote descarta los ids que ya están.
+    global _ultimo_sync, _sincronizando
+    with _lock:
+        # Sin forzar, si ya hay uno en curso no se pide otra vez lo mismo
+        if not forzar and (_sincronizando or time.time() - _ultimo_sync < INTERVALO_SYNC): return 0
+        previo, _ultimo_sync = _ultimo_sync, time.time()
+        _sincronizando += 1
+    con = _conectar()
+    nuevas = 0
+    with trazas.tramo('sincronizar', lotes=0, red_ms=0.0, aplanar_ms=0.0, escritura_ms=0.0) as t:
+        try:
+            with _lock:
+                if not con.execute("SELECT 1 FROM precios_diarios LIMIT 1").fetchone(): _reconstruir_diarios(con)
+                marca, _ = _marca_de_agua(con)
+            # Cada lote se escribe y se suelta: la memoria no crece con el historial
+            t0 = time.perf_counter()
+            for lote in iterar_items(supabase, _con_solape(marca), None):
+                t1 = time.perf_counter()
+                df = aplanar(lote)
+                t2 = time.perf_counter()
+                with _lock:
+                    # Otro proceso (worker.py) puede estar sincronizando el mismo archivo: lote atómico
+                    con.execute("BEGIN IMMEDIATE")
+                    ids = df['id'].tolist()
+                    ya = {f[0] for f in con.execute(f"SELECT id FROM items WHERE id IN ({','.join('?' * len(ids))})", ids)}
+                    con.executemany(f"INSERT OR REPLACE INTO items VALUES ({','.join('?' * len(COLUMNAS))})", _filas_sqlite(df))
+                    nuevas_df = df[~df['id'].isin(ya)] if ya else df
+                    _sumar_diarios(con, nuevas_df)
+                    if len(nuevas_df): _subir_version(con, nuevas_df['user_id'])
+                    con.commit()
+                nuevas += len(nuevas_df)
+                t3 = time.perf_counter()
+                # Tiempo de cada etapa sumado sobre los lotes (un tramo por lote serían miles)
+                t['red_ms'] += (t1 - t0) * 1000; t['aplanar_ms'] += (t2 - t1) * 1000; t['escritura_ms'] += (t3 - t2) * 1000
+                t['lotes'] += 1
+                t0 = t3
+        except Exception:
+            _ultimo_sync = previo  # se reintenta en la próxima consulta
+            raise
+        finally:
+            con.close()
+            with _lock: _sincronizando -= 1
+            t['filas'] = nuevas
+            for k in ('red_ms', 'aplanar_ms', 'escritura_ms'): t[k] = round(t[k], 2)
+    return nuevas
+
+
+def borrar_ticket_local(ticket_id):
+    # El borrado en Supabase es en cascada; replicamos lo mismo en el espejo.
+    with _lock:
+        con = _conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            borradas = pd.read_sql_query("SELECT * FROM items WHERE ticket_id = ?", con, params=(ticket_id,))
+            con.execute("DELETE FROM items WHERE ticket_id = ?", (ticket_id,))
+            _restar_diarios(con, borradas)
+            if len(borradas):
+                _subir_version(con, borradas['user_id'])
+                # Registro de borrados: las copias derivadas (analitica.py) quitan solo esas filas
+                con.execute("INSERT INTO borrados (ticket_id) VALUES (?)", (ticket_id,))
+            con.commit()
+        finally:
+            con.close()
+
+
+# --- VERSIONES DE DATOS ---
+# Contador por ámbito ('*' = todo el club, o un user_id) que sube cada vez que el espejo gana o
+# pierde filas de ese ámbito. Los cachés de las páginas (cache_datos.py) se invalidan por versión.
+GLOBAL = '*'
+
+
+def _subir_version(con, user_ids):
+    ambitos = [GLOBAL] + [str(u) for u in pd.Series(user_ids).dropna().unique()]
+    con.executemany("INSERT INTO versiones VALUES (?, 1) ON CONFLICT (ambito) DO UPDATE SET version = version + 1",
+                    [(a,) for a in ambitos])
+
+
+def version(supabase, user_id=None):
+    # Versión actual del ámbito. Sincroniza antes (respeta INTERVALO_SYNC, así que casi siempre no sale a la red).
+    sincronizar(supabase)
+    con = _conectar()
+    try: fila = con.execute("SELECT version FROM versiones WHERE ambito = ?", (str(user_id) if user_id else GLOBAL,)).fetchone()
+    finally: con.close()
+    return fila[0] if fila else 0
+
+
+# --- AGREGADOS DIARIOS DE PRECIOS ---
+# Una fila por (producto, usuario, cadena, día, rubro) con compras, mínimo, máximo, suma y primer/último
+# precio del día. Se mantienen al sincronizar (suma de filas nuevas) y al borrar un ticket
+# (se recalculan solo los grupos tocados), así las métricas de precio no recorren el historial.
+_UPSERT_DIARIO = """
+INSERT INTO precios_diarios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (producto, user_id, cadena, fecha, rubro) DO UPDATE SET
+    compras = compras + excluded.compras, suma = suma + excluded.suma,
+    minimo = min(minimo, excluded.minimo), maximo = max(maximo, excluded.maximo),
+    primero = CASE WHEN (excluded.primero_marca, excluded.primero_id) < (primero_marca, primero_id) THEN excluded.primero ELSE primero END,
+    primero_marca = min(primero_marca, excluded.primero_marca),
+    primero_id = CASE WHEN (excluded.primero_marca, excluded.primero_id) < (primero_marca, primero_id) THEN excluded.primero_id ELSE primero_id END,
+    ultimo = CASE WHEN (excluded.ultimo_marca, excluded.ultimo_id) > (ultimo_marca, ultimo_id) THEN excluded.ultimo ELSE ultimo END,
+    ultimo_marca = max(ultimo_marca, excluded.ultimo_marca),
+    ultimo_id = CASE WHEN (excluded.ultimo_marca, excluded.ultimo_id) > (ultimo_marca, ultimo_id) THEN excluded.ultimo_id ELSE ultimo_id END
+"""
+CLAVE_DIARIA = ['producto', 'user_id', 'cadena', 'fecha', 'rubro']
+
+
+def _grupos_diarios(df):
+    # Filas de items (espejo o recién aplanadas) -> agregados por clave diaria
+    df = df[(df['precio_neto_unitario'] > 0) & df['fecha'].notna()]
+    if df.empty: return pd.DataFrame()
+    df = df.assign(
+        producto=df['producto_generico'].fillna(df['nombre_producto']).fillna(''),
+        user_id=df['user_id'].fillna('').astype(str),
+        cadena=cadenas.columna_cadena(df['supermercado_nombre']).astype(str),
+        fecha=pd.to_datetime(df['fecha']).dt.strftime('%Y-%m-%d'),
+        rubro=df['rubro'].fillna('').astype(str),  # '' = sin clasificar (NULL no sirve en la clave)
+    ).sort_values(['created_at', 'id'])
+    return df.groupby(CLAVE_DIARIA, sort=False).agg(
+        compras=('precio_neto_unitario', 'size'), minimo=('precio_neto_unitario', 'min'),
+        maximo=('precio_neto_unitario', 'max'), suma=('precio_neto_unitario', 'sum'),
+        primero=('precio_neto_unitario', 'first'), primero_marca=('created_at', 'first'), primero_id=('id', 'first'),
+        ultimo=('precio_neto_unitario', 'last'), ultimo_marca=('created_at', 'last'), ultimo_id=('id', 'last'),
+    ).reset_index()
+
+
+def _sumar_diarios(con, df):
+    g = _grupos_diarios(df)
+    if not g.empty: con.executemany(_UPSERT_DIARIO, g.astype(object).where(g.notna(), None).itertuples(index=False, name=None))
+
+
+def _restar_diarios(con, borradas):
+    # min/max/primero/último no se pueden "restar": se rearman los grupos afectados desde el espejo.
+    # Un ticket es de un solo usuario, día y sucursal, así que alcanza con releer ese (usuario, día).
+    g = _grupos_diarios(borradas)
+    if g.empty: return
+    con.executemany("DELETE FROM precios_diarios WHERE producto = ? AND user_id = ? AND cadena = ? AND fecha = ? AND rubro = ?",
+                    g[CLAVE_DIARIA].itertuples(index=False, name=None))
+    for (user_id, fecha), claves in g.groupby(['user_id', 'fecha']):
+        resto = pd.read_sql_query("SELECT * FROM items WHERE user_id IS ? AND fecha = ?", con, params=(user_id or None, fecha))
+        if resto.empty: continue
+        resto = _grupos_diarios(resto).merge(claves[CLAVE_DIARIA], on=CLAVE_DIARIA)
+        if not resto.empty: con.executemany(_UPSERT_DIARIO, resto.astype(object).where(resto.notna(), None).itertuples(index=False, name=None))
+
+
+def _reconstruir_diarios(con):
+    # Espejos creados antes de la tabla de agregados: se arman una vez desde items, por bloques
+    con.execute("DELETE FROM precios_diarios")
+    for bloque in pd.read_sql_query("SELECT * FROM items ORDER BY created_at, id", con, chunksize=50_000):
+        _sumar_diarios(con, bloque)
+    con.commit()
+
+
+def resumen_precio(producto, user_id=None, desde=None, hasta=None, tipo=None, rubro=None, rubro_nulo='Otros'):
+    # Métricas de precio de un producto leídas de los agregados diarios (no del historial):
+    # compras, mínimo (y dónde), máximo, promedio, primer y último precio. None si no hay compras.
+    # rubro_nulo: cómo llama la página a los items sin rubro (el mismo 'rellenar' de cargar_analisis)
+    sql = "SELECT * FROM precios_diarios WHERE producto = ?"
+    params = [producto]
+    if rubro and rubro != 'Todos':
+        sql += " AND rubro IN (?, ?)" if rubro == rubro_nulo else " AND rubro = ?"
+        params += [rubro, ''] if rubro == rubro_nulo else [rubro]
+    if user_id:
+        sql += " AND user_id = ?"; params.append(str(user_id))
+    if desde:
+        sql += " AND fecha >= ?"; params.append(str(desde))
+    if hasta:
+        sql += " AND fecha <= ?"; params.append(str(hasta))
+    with trazas.tramo('resumen_precio') as t, _lock:
+        con = _conectar()
+        con.row_factory = sqlite3.Row
+        try: filas = con.execute(sql, params).fetchall()
+        finally: con.close()
+        t['filas'] = len(filas)
+    if tipo and tipo != 'Todos': filas = [f for f in filas if cadenas.TIPO_POR_CADENA.get(f['cadena'], 'Supermercado') == tipo]
+    if not filas: return None
+    compras = sum(f['compras'] for f in filas)
+    mas_barato = min(filas, key=lambda f: f['minimo'])
+    primero = min(filas, key=lambda f: (f['fecha'], f['primero_marca'], f['primero_id']))
+    ultimo = max(filas, key=lambda f: (f['fecha'], f['ultimo_marca'], f['ultimo_id']))
+    return {
+        'compras': compras, 'minimo': mas_barato['minimo'], 'cadena_minimo': mas_barato['cadena'],
+        'maximo': max(f['maximo'] for f in filas), 'promedio': sum(f['suma'] for f in filas) / compras,
+        'primero': primero['primero'], 'ultimo': ultimo['ultimo'],
+    }
+
+
+def cargar_items(supabase, user_id=None):
+    # DataFrame plano con una fila por item. Sincroniza antes de leer.
+    sincronizar(supabase)
+    sql = f"SELECT {', '.join(COLUMNAS)} FROM items"
+    params = ()
+    if user_id:
+        sql += " WHERE user_id = ?"
+        params = (str(user_id),)
+    with _lock:
+        con = _conectar()
+        # Armamos el DataFrame por bloques para no tener todas las tuplas crudas en memoria a la vez
+        try: bloques = list(pd.read_sql_query(sql, con, params=params, chunksize=50_000))
+        finally: con.close()
+    df = pd.concat(bloques, ignore_index=True) if bloques else pd.DataFrame(columns=COLUMNAS)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+def historial_ean(supabase, ean):
+    # Historial de precios de un EAN-13 (todas las cadenas), por índice sobre codigo_barras.
+    # El mismo producto puede estar guardado como UPC-A (12 dígitos, sin el 0 inicial).
+    sincronizar(supabase)
+    claves = [ean] + ([ean[1:]] if ean.startswith('0') else [])
+    sql = (f"SELECT {', '.join(COLUMNAS)} FROM items WHERE codigo_barras IN ({','.join('?' * len(claves))}) "
+           "AND precio_neto_unitario > 0 ORDER BY fecha DESC")
+    with trazas.tramo('historial_ean') as t, _lock:
+        con = _conectar()
+        try: df = pd.read_sql_query(sql, con, params=claves)
+        finally: con.close()
+        t['filas'] = len(df)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+# --- DATASET COMPACTO PARA LAS PÁGINAS ---
+# Cada página pide solo las columnas que usa; los textos repetidos van como categóricas y los
+# números en 32 bits. 'producto_final' (genérico o nombre) y el filtro de precio se resuelven en SQL.
+CATEGORICAS = ['user_id', 'supermercado_nombre', 'sucursal_localidad', 'nombre_producto', 'producto_generico',
+               'producto_final', 'marca', 'rubro', 'unidad_medida', 'unidad_contenido', 'codigo_barras']
+FLOAT32 = ['cantidad', 'precio_neto_unitario', 'contenido_neto']
+DERIVADAS = {'producto_final': 'coalesce(producto_generico, nombre_producto) AS producto_final'}
+
+
+def _compactar(df, rellenar):
+    for col, valor in rellenar.items():
+        if col in df: df[col] = df[col].fillna(valor)
+    for col in df.columns:
+        if col in CATEGORICAS: df[col] = df[col].astype('category')
+        elif col in FLOAT32: df[col] = df[col].astype('float32')
+        elif col == 'fecha': df[col] = pd.to_datetime(df[col], format='%Y-%m-%d')
+        elif col in ('id', 'ticket_id') and pd.api.types.is_integer_dtype(df[col]): df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _unir(bloques, columnas):
+    # Concatena bloques ya compactos sin volver a object: las categóricas se unen por categorías
+    if len(bloques) == 1: return bloques[0]
+    unidas = {}
+    for col in columnas:
+        partes = [b[col] for b in bloques]
+        if isinstance(partes[0].dtype, pd.CategoricalDtype): unidas[col] = pd.Series(union_categoricals(partes), name=col)
+        else: unidas[col] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(unidas)
+
+
+def cargar_analisis(supabase, columnas, user_id=None, solo_con_precio=True, rellenar=None):
+    # DataFrame compacto con 'columnas' (de COLUMNAS o DERIVADAS). 'rellenar' = {columna: valor para nulos}.
+    sincronizar(supabase)
+    condiciones, params = [], []
+    if solo_con_precio: condiciones.append("precio_neto_unitario > 0")
+    if user_id:
+        condiciones.append("user_id = ?"); params.append(str(user_id))
+    sql = f"SELECT {', '.join(DERIVADAS.get(c, c) for c in columnas)} FROM items"
+    if condiciones: sql += " WHERE " + " AND ".join(condiciones)
+    with trazas.tramo('cargar_analisis', columnas=len(columnas)) as t, _lock:
+        con = _conectar()
+        try: bloques = [_compactar(b, rellenar or {}) for b in pd.read_sql_query(sql, con, params=params, chunksize=50_000)]
+        finally: con.close()
+        df = _unir(bloques, columnas) if bloques else pd.DataFrame(columns=columnas)
+        t['filas'], t['bytes'] = len(df), int(df.memory_usage(index=False).sum())
+    return df
+
+
+def bytes_por_fila(df):
+    return df.memory_usage(deep=True).sum() / max(1, len(df))
@@ -0,0 +1,162 @@
+import json
+import time
+import imagenes
+import cache_ocr
+import trazas
+
+# --- EXTRACCIÓN DE TICKETS CON GEMINI ---
+# Sin Streamlit: la usan la app y el modo lote (hilos), que informan los errores a su manera.
+
+MODELO_IA = 'gemini-2.5-flash'
+
+RUBROS_VALIDOS = """
+- Almacén
+- Bebidas s/Alcohol
+- Bebidas c/Alcohol
+- Carnicería
+- Pescadería
+- Frutas y Verduras
+- Lácteos
+- Quesos y Fiambres
+- Panadería y Galletitas
+- Golosinas
+- Congelados y Helados
+- Comida Elaborada / Rotisería
+- Limpieza
+- Perfumería e Higiene
+- Farmacia
+- Bebés y Maternidad
+- Mascotas
+- Electro y Tecnología
+- Juguetería
+- Ropa y Calzado
+- Librería
+- Hogar, Muebles y Bazar
+- Ferretería y Herramientas
+- Automotor
+- Otros
+"""
+
+# --- PROMPT MEJORADO PARA LEER CÓDIGOS ---
+PROMPT_TICKET = f"""
+Analiza este ticket. REGLA DE ORO: Si el nombre ocupa 2 líneas, ÚNELAS.
+
+NUEVA MISIÓN: Extraer el CÓDIGO DE BARRAS (EAN).
+- En tickets como COTO, suele estar DEBAJO del nombre del producto (ej: 000264.. 779007...).
+- El código EAN suele tener 13 dígitos y empezar con 779 (Argentina).
+- Si lo encuentras, extráelo en el campo "codigo_barras".
+- Para productos frescos (carne, verdura) suele no haber EAN, déjalo null.
+
+1. SUPERMERCADO: Nombre + Sucursal.
+2. PRODUCTOS: Marca, genérico, rubro, contenido, unidad y CÓDIGO.
+
+Rubros: {RUBROS_VALIDOS}
+
+JSON Estricto:
+{{
+    "supermercado": "Str", "sucursal_direccion": "Str", "sucursal_localidad": "Str",
+    "sucursal_provincia": "Str", "sucursal_pais": "Str", "moneda": "Str",
+    "fecha": "YYYY-MM-DD", "hora": "HH:MM", "nro_ticket": "str", "total_pagado": num,
+    "items": [
+        {{ "nombre": "Str", "codigo_barras": "Str o null", "cantidad": num, "unidad_medida": "Str", "precio_neto_final": num,
+           "marca": "Str", "producto_generico": "Str", "rubro": "Str", "contenido_neto": num, "unidad_contenido": "Str" }}
+    ]
+}}
+"""
+
+
+def partes_imagen(lista_imagenes, perfil=imagenes.PERFIL_TICKET):
+    # Fotos ya enderezadas, achicadas y recomprimidas (ver imagenes.PERFILES)
+    from google.genai import types  # import pesado (~0.5 s): solo cuando hay que llamar al modelo
+    partes = []
+    for img in lista_imagenes:
+        datos, mime = imagenes.preparar(img, perfil)
+        partes.append(types.Part.from_bytes(data=datos, mime_type=mime))
+    return partes
+
+
+class LectorItems:
+    # Parser incremental del JSON que llega en trozos: devuelve cada objeto de "items" apenas se cierra
+    # su llave, sin esperar al resto de la respuesta. Sigue comillas y escapes para no confundirse con
+    # llaves dentro de los textos; el JSON completo se valida igual con json.loads al final.
+    def __init__(self):
+        self.texto, self.pos, self.nivel = '', 0, 0
+        self.en_texto = self.escape = self.en_items = False
+        self.inicio_texto = self.inicio_item = None
+        self.ultima_clave = None
+
+    def agregar(self, trozo):
+        self.texto += trozo
+        nuevos = []
+        for i in range(self.pos, len(self.texto)):
+            c = self.texto[i]
+            if self.en_texto:
+                if self.escape: self.escape = False
+                elif c == '\\': self.escape = True
+                elif c == '"':
+                    self.en_texto = False
+                    if self.nivel == 1: self.ultima_clave = self.texto[self.inicio_texto + 1:i]
+            elif c == '"':
+                self.en_texto, self.inicio_texto = True, i
+            elif c in '{[':
+                if c == '[' and self.nivel == 1 and self.ultima_clave == 'items': self.en_items = True
+                elif c == '{' and self.en_items and self.nivel == 2: self.inicio_item = i
+                self.nivel += 1
+            elif c in '}]':
+                self.nivel -= 1
+                if c == '}' and self.en_items and self.nivel == 2 and self.inicio_item is not None:
+                    try: nuevos.append(json.loads(self.texto[self.inicio_item:i + 1]))
+                    except ValueError: pass
+                    self.inicio_item = None
+                elif c == ']' and self.en_items and self.nivel == 1: self.en_items = False
+        self.pos = len(self.texto)
+        return nuevos
+
+
+def extraer_ticket(client, lista_imagenes, modelo=MODELO_IA, perfil=imagenes.PERFIL_TICKET, al_item=None, forzar=False):
+    # Devuelve el JSON del ticket como dict. Los errores de la IA se propagan.
+    # Las mismas fotos ya leídas salen del caché local sin llamar al modelo (salvo forzar=True).
+    # Con al_item(item) la respuesta se pide en streaming y cada producto se entrega apenas se lee;
+    # el ticket completo se devuelve recién cuando cierra el stream (listo para guardar).
+    with trazas.tramo('extraer_ticket', imagenes=len(lista_imagenes), cache='hit') as t:
+        def llamar():
+            from google.genai import types
+            t['cache'] = 'miss'
+            with trazas.tramo('preparar_imagenes') as tp:
+                partes = partes_imagen(lista_imagenes, perfil)
+                tp['bytes'] = t['bytes'] = sum(len(p.inline_data.data) for p in partes)
+            pedido = dict(model=modelo, contents=[PROMPT_TICKET] + partes, config=types.GenerateContentConfig(response_mime_type='application/json'))
+            t['stream'] = stream = al_item is not None and hasattr(client.models, 'generate_content_stream')
+            with trazas.tramo('gemini', modelo=modelo, stream=stream) as tg:
+                if stream:
+                    lector, t0 = LectorItems(), time.perf_counter()
+                    for trozo in client.models.generate_content_stream(**pedido):
+                        for item in lector.agregar(trozo.text or ''):
+                            if 'primer_item_ms' not in tg: tg['primer_item_ms'] = round((time.perf_counter() - t0) * 1000, 2)
+                            al_item(item)
+                    texto = lector.texto
+                else: texto = client.models.generate_content(**pedido).text
+                tg['bytes_respuesta'] = len(texto or '')
+            json.loads(texto)  # solo cacheamos respuestas válidas
+            return texto
+        data = json.loads(cache_ocr.obtener('ticket', lista_imagenes, llamar, forzar=forzar))
+        t['items'] = len(data.get('items') or [])
+        if al_item is not None and not t.get('stream'):  # del caché o de un cliente sin streaming: todos juntos
+            for item in data.get('items') or []: al_item(item)
+    return data
+
+
+def posible_duplicado(lista_imagenes, user_id=None):
+    # Si estas fotos se parecen a un ticket que el socio ya guardó, devuelve su resumen (dict); si no, None
+    try: previo = cache_ocr.parecido_guardado(cache_ocr.huella(lista_imagenes), user_id)
+    except Exception: return None  # el aviso es opcional: nunca frena la carga
+    return json.loads(previo) if previo else None
+
+
+def recordar_guardado(lista_imagenes, data, user_id):
+    # Después de guardar el ticket: cuenta para el aviso de duplicado hasta que se borre
+    import ingesta
+    resumen = json.dumps({'supermercado': data.get('supermercado'), 'fecha': data.get('fecha')}, ensure_ascii=False)
+    try: cache_ocr.marcar_guardado(cache_ocr.huella(lista_imagenes), user_id, ingesta.limpiar_fecha(data.get('fecha')),
+                                   ingesta.limpiar_numero(data.get('total_pagado')), resumen)
+    except Exception: pass
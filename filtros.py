@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# --- ÍNDICE DE FILTROS ---
+# El dataset cacheado queda ordenado por fecha: un rango de fechas es una búsqueda binaria
+# (dos searchsorted) y el resultado es un corte contiguo. Las columnas de filtro (tipo, rubro,
+# cadena, producto...) se guardan como códigos enteros; para las de pocos valores se arma
+# además un bitmap por valor (a demanda) y los filtros combinados son un AND de arrays.
+# Ningún filtro toca objetos Python ni compara strings fila por fila.
+
+TODOS = 'Todos'
+MAX_BITMAP = 64  # columnas con más valores distintos comparan códigos en vez de guardar bitmaps
+
+
+class IndiceFiltros:
+    def __init__(self, df, columnas, fecha='fecha'):
+        self.df = df.sort_values(fecha, kind='stable', na_position='last', ignore_index=True)
+        fechas = self.df[fecha].to_numpy(dtype='datetime64[ns]')
+        self._n_fechas = int((~np.isnat(fechas)).sum())  # los NaT quedan al final y fuera de cualquier rango
+        self._fechas = fechas[:self._n_fechas]
+        self._codigos, self._valores, self._posicion, self._bitmaps = {}, {}, {}, {}
+        for col in columnas:
+            serie = self.df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                # Ya viene con códigos: solo se renumeran para que los valores queden ordenados (-1 sigue siendo nulo)
+                valores = serie.cat.categories.sort_values()
+                codigos = np.append(valores.get_indexer(serie.cat.categories), -1)[serie.cat.codes.to_numpy()]
+            else: codigos, valores = pd.factorize(serie, sort=True)
+            self._codigos[col] = codigos.astype(np.int8 if len(valores) < 127 else np.int16 if len(valores) < 32767 else np.int32)  # -1 = nulo
+            self._valores[col] = list(valores)
+            self._posicion[col] = {v: i for i, v in enumerate(valores)}
+
+    @property
+    def fecha_min(self):
+        return pd.Timestamp(self._fechas[0]) if self._n_fechas else None
+
+    @property
+    def fecha_max(self):
+        return pd.Timestamp(self._fechas[-1]) if self._n_fechas else None
+
+    def rango(self, desde=None, hasta=None):
+        # Fechas inclusivas (date o Timestamp) -> slice de posiciones sobre el df ordenado
+        if desde is None and hasta is None: return slice(0, len(self.df))
+        ini = 0 if desde is None else int(np.searchsorted(self._fechas, np.datetime64(pd.Timestamp(desde), 'ns'), 'left'))
+        fin = self._n_fechas if hasta is None else int(np.searchsorted(self._fechas, np.datetime64(pd.Timestamp(hasta) + pd.Timedelta(days=1), 'ns'), 'left'))
+        return slice(ini, max(ini, fin))
+
+    def _bitmap(self, col, codigo):
+        clave = (col, codigo)
+        if clave not in self._bitmaps: self._bitmaps[clave] = self._codigos[col] == codigo
+        return self._bitmaps[clave]
+
+    def _mascara(self, corte, filtros):
+        # AND de los filtros activos sobre el corte; None = sin filtros (todo el corte)
+        mascara = None
+        for col, valor in filtros.items():
+            if valor is None or valor == TODOS: continue
+            codigo = self._posicion[col].get(valor, -2)  # -2: valor inexistente, no matchea nada
+            if len(self._valores[col]) <= MAX_BITMAP and codigo >= 0: m = self._bitmap(col, codigo)[corte]
+            else: m = self._codigos[col][corte] == codigo
+            mascara = m if mascara is None else mascara & m
+        return mascara
+
+    def posiciones(self, desde=None, hasta=None, **filtros):
+        corte = self.rango(desde, hasta)
+        mascara = self._mascara(corte, filtros)
+        if mascara is None: return np.arange(corte.start, corte.stop)
+        return np.flatnonzero(mascara) + corte.start
+
+    def filtrar(self, desde=None, hasta=None, **filtros):
+        # Filas que cumplen todo. Sin filtros de columna es un corte del df ordenado (sin copiar filas).
+        corte = self.rango(desde, hasta)
+        mascara = self._mascara(corte, filtros)
+        if mascara is None: return self.df.iloc[corte]
+        return self.df.iloc[np.flatnonzero(mascara) + corte.start]
+
+    def valores(self, columna, desde=None, hasta=None, **filtros):
+        # Valores de 'columna' presentes bajo los filtros (para armar selectbox en cascada)
+        corte = self.rango(desde, hasta)
+        mascara = self._mascara(corte, filtros)
+        codigos = self._codigos[columna][corte]
+        if mascara is not None: codigos = codigos[mascara]
+        presentes = np.flatnonzero(np.bincount(codigos[codigos >= 0].astype(np.int64), minlength=len(self._valores[columna])))
+        return [self._valores[columna][i] for i in presentes]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# --- DATOS PARA GRÁFICOS ---
+# Altair serializa todo el DataFrame dentro de la página: los gráficos reciben datos ya
+# agrupados (gasto por mes y cadena) o series de precio reducidas con LTTB, con un tope
+# de filas por gráfico. Así el peso de la página no crece con el historial.
+
+MAX_PUNTOS = 500   # tope de filas por serie de precios (todas las series del gráfico juntas)
+MAX_SERIES = 10    # cadenas con nombre propio; el resto se suma como 'OTRAS'
+OTRAS = 'OTRAS'
+
+
+def _principales(df, color, valor=None, limite=MAX_SERIES):
+    # Las 'limite' categorías con más 'valor' (sin 'valor': con más filas); las demás pasan a OTRAS
+    # (se decide por valor distinto, no por fila)
+    codigos, unicos = pd.factorize(df[color])
+    pesos = np.ones(len(df)) if valor is None else np.nan_to_num(df[valor].to_numpy(dtype='float64'))
+    totales = np.bincount(codigos[codigos >= 0], weights=pesos[codigos >= 0], minlength=len(unicos))
+    top = set(np.argsort(totales)[::-1][:limite])
+    etiquetas = pd.Index([str(u) if i in top else OTRAS for i, u in enumerate(unicos)] + [OTRAS])  # código -1 (nulo) -> OTRAS
+    nuevos, categorias = pd.factorize(etiquetas)
+    return pd.Series(pd.Categorical.from_codes(nuevos[codigos], categories=categorias), index=df.index, name=color)
+
+
+def gasto_por_mes(df, color, fecha='fecha', valor='gasto_total'):
+    # Una fila por (mes, color) con la suma de 'valor'
+    if df.empty: return pd.DataFrame(columns=['mes', color, valor])
+    mes = pd.Series(df[fecha].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]'), index=df.index, name='mes')
+    return df[valor].groupby([mes, _principales(df, color, valor)], observed=True).sum().reset_index()
+
+
+def gasto_por(df, color, valor='gasto_total'):
+    # Una fila por color con la suma de 'valor' (torta / barras de participación)
+    if df.empty: return pd.DataFrame(columns=[color, valor])
+    return df[valor].groupby(_principales(df, color, valor), observed=True).sum().reset_index()
+
+
+def lttb(x, y, n):
+    # Largest-Triangle-Three-Buckets: índices de n puntos que conservan la forma de la serie.
+    # x ordenado y numérico. Siempre conserva el primero y el último (con n < 3, solo esos).
+    largo = len(x)
+    if n >= largo: return np.arange(largo)
+    if n < 3: return np.array([0, largo - 1][:max(n, 0)], dtype=np.int64)
+    x, y = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+    bordes = np.linspace(1, largo - 1, n - 1).astype(np.int64)  # n-2 baldes entre el primero y el último
+    idx = np.empty(n, dtype=np.int64)
+    idx[0], idx[-1] = 0, largo - 1
+    a = 0
+    for i in range(n - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        # Promedio del balde siguiente (o el último punto)
+        if i == n - 3: cx, cy = x[-1], y[-1]
+        else: cx, cy = x[fin:bordes[i + 2]].mean(), y[fin:bordes[i + 2]].mean()
+        area = np.abs((x[a] - cx) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (cy - y[a]))
+        a = ini + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def serie_reducida(df, x='fecha', y='precio_neto_unitario', color=None, max_puntos=MAX_PUNTOS):
+    # Filas originales (con todas sus columnas para tooltips) reducidas a max_puntos como mucho.
+    # Con 'color' cada serie recibe 3 puntos (primero, último y uno en el medio) más una parte
+    # del resto proporcional a su tamaño; si no alcanza para 3 por serie, las más chicas van a OTRAS.
+    if len(df) <= max_puntos: return df.sort_values(x)
+    base = min(3, max_puntos)
+    tope_series = max(1, max_puntos // max(1, base))
+    if color and df[color].nunique() > tope_series:
+        df = df.assign(**{color: _principales(df, color, limite=tope_series - 1)})
+    grupos = df.groupby(color, observed=True, sort=False) if color else [(None, df)]
+    series = len(grupos) if color else 1
+    libre = max(0, max_puntos - base * series)
+    partes = []
+    for _, g in grupos:
+        g = g.sort_values(x)
+        cupo = base + int(libre * len(g) / len(df))
+        xs = g[x].to_numpy(dtype='datetime64[ns]').astype('int64') if np.issubdtype(g[x].dtype, np.datetime64) else g[x].to_numpy()
+        partes.append(g.iloc[lttb(xs, g[y].to_numpy(), cupo)])
+    return pd.concat(partes)
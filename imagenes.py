@@ -0,0 +1,52 @@
+import io
+import os
+
+# --- PREPROCESAMIENTO DE IMÁGENES ---
+# Antes de mandar la foto a Gemini: enderezar (EXIF), achicar, pasar a gris y estirar
+# contraste (papel térmico) y recomprimir a JPEG dentro de un presupuesto de bytes.
+# Una foto de 12 MP pasa de varios MB a unos cientos de KB sin perder legibilidad.
+
+PERFILES = {
+    # Tickets: texto chico y largo, gris + contraste ayudan con el papel térmico gastado
+    'ticket': {'lado_max': 2000, 'gris': True, 'contraste': True, 'calidad': 85, 'max_bytes': 700_000},
+    # Fotos de producto (Buscador): alcanza con menos resolución, el color ayuda a reconocer la marca
+    'producto': {'lado_max': 1024, 'gris': False, 'contraste': False, 'calidad': 80, 'max_bytes': 300_000},
+    # Sin cambios (para comparar)
+    'original': None,
+}
+PERFIL_TICKET = os.environ.get("PERFIL_IMAGEN", "ticket")
+CALIDAD_MIN = 45
+
+
+def leer_bytes(archivo):
+    if hasattr(archivo, 'getvalue'): return archivo.getvalue()
+    if hasattr(archivo, 'read'):
+        archivo.seek(0)
+        return archivo.read()
+    with open(archivo, 'rb') as f: return f.read()
+
+
+def preparar(archivo, perfil='ticket'):
+    # Devuelve (bytes, mime_type) listos para mandar al modelo
+    from PIL import Image, ImageOps  # Pillow solo cuando hay una foto que preparar
+    conf = PERFILES[perfil]
+    if conf is None:
+        datos = leer_bytes(archivo)
+        return datos, Image.MIME.get(Image.open(io.BytesIO(datos)).format, 'image/jpeg')
+
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(leer_bytes(archivo))))
+    if conf['gris']: img = img.convert('L')
+    elif img.mode != 'RGB': img = img.convert('RGB')
+    if conf['contraste']: img = ImageOps.autocontrast(img, cutoff=1)
+    if max(img.size) > conf['lado_max']: img.thumbnail((conf['lado_max'], conf['lado_max']), Image.LANCZOS)
+
+    # Bajamos calidad y, si no alcanza, resolución hasta entrar en el presupuesto
+    calidad = conf['calidad']
+    while True:
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=calidad, optimize=True)
+        if buf.tell() <= conf['max_bytes']: break
+        if calidad > CALIDAD_MIN: calidad -= 10
+        elif min(img.size) > 300: img = img.resize((int(img.width * 0.8), int(img.height * 0.8)), Image.LANCZOS)
+        else: break
+    return buf.getvalue(), 'image/jpeg'
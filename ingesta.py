@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+import codigos
+import trazas
+
+# --- LIMPIEZA DE DATOS DEL TICKET ---
+def limpiar_numero(valor):
+    if not valor: return 0.0
+    if isinstance(valor, (int, float)): return float(valor)
+    texto = str(valor).replace('$', '').replace('kg', '').replace('lt', '').replace('un', '').strip()
+    texto = re.sub(r'[^\d.,-]', '', texto)
+    try: return float(texto)
+    except:
+        try:
+            if ',' in texto and '.' in texto: texto = texto.replace('.', '').replace(',', '.')
+            elif ',' in texto: texto = texto.replace(',', '.')
+            return float(texto)
+        except: return 0.0
+
+def limpiar_fecha(fecha_str):
+    if not fecha_str: return "2025-01-01"
+    if len(fecha_str) != 10: return time.strftime("%Y-%m-%d")
+    return fecha_str
+
+# --- CACHÉ DE SUPERMERCADOS ---
+# Nombre normalizado -> id. Vive en el proceso (no en el script, que Streamlit re-ejecuta en cada rerun).
+# Acotada (LRU) y precargada al arrancar; un miss se resuelve con un único upsert atómico
+# contra la restricción única de supermercados.nombre (ver sql/001_supermercados_nombre_unico.sql).
+MAX_SUPERS_CACHE = 1024
+_supers = OrderedDict()
+_lock_supers = threading.Lock()
+_precargado = False
+
+def normalizar_super(nombre):
+    return ' '.join(str(nombre or '').strip().upper().split())
+
+def _recordar_super(nombre, super_id):
+    with _lock_supers:
+        _supers[nombre] = super_id
+        _supers.move_to_end(nombre)
+        while len(_supers) > MAX_SUPERS_CACHE: _supers.popitem(last=False)
+
+def precargar_supers(supabase):
+    global _precargado
+    if _precargado: return
+    _precargado = True
+    try:
+        filas = supabase.table('supermercados').select('id, nombre').limit(MAX_SUPERS_CACHE).execute().data
+        for s in filas or []: _recordar_super(normalizar_super(s['nombre']), s['id'])
+    except Exception:
+        _precargado = False  # se reintenta en el próximo arranque de página
+
+def obtener_super_id(supabase, nombre):
+    clave = normalizar_super(nombre)
+    with _lock_supers:
+        if clave in _supers:
+            _supers.move_to_end(clave)
+            return _supers[clave]
+    # Si dos usuarios suben la misma cadena nueva a la vez, ambos reciben la misma fila
+    res = supabase.table('supermercados').upsert({"nombre": clave}, on_conflict='nombre').execute()
+    super_id = res.data[0]['id']
+    _recordar_super(clave, super_id)
+    return super_id
+
+# --- PERSISTENCIA ---
+def guardar_ticket(supabase, data, user_id):
+    # Devuelve la cantidad de items guardados o "DUPLICADO". Otros errores se propagan.
+    with trazas.tramo('guardar_ticket', items=len(data.get('items') or [])) as t:
+        res = _guardar_ticket(supabase, data, user_id, t)
+        t['resultado'] = 'duplicado' if res == "DUPLICADO" else 'ok'
+    return res
+
+def _guardar_ticket(supabase, data, user_id, t):
+    super_id = obtener_super_id(supabase, data['supermercado'])
+
+    ticket_data = {
+        "user_id": user_id, "supermercado_id": super_id, "fecha": limpiar_fecha(data['fecha']),
+        "hora": data['hora'], "monto_total": limpiar_numero(data['total_pagado']),
+        "imagen_url": "v5.1_codigos", "sucursal_direccion": data.get('sucursal_direccion'),
+        "sucursal_localidad": data.get('sucursal_localidad'), "sucursal_provincia": data.get('sucursal_provincia'),
+        "sucursal_pais": data.get('sucursal_pais'), "moneda": data.get('moneda')
+    }
+    items = []
+    for item in data['items']:
+        items.append({
+            "nombre_producto": item['nombre'],
+            "cantidad": limpiar_numero(item['cantidad']), "precio_neto_unitario": limpiar_numero(item['precio_neto_final']),
+            "unidad_medida": item['unidad_medida'], "rubro": item.get('rubro'),
+            "marca": item.get('marca'), "producto_generico": item.get('producto_generico'),
+            "contenido_neto": limpiar_numero(item.get('contenido_neto')), 
+            "unidad_contenido": item.get('unidad_contenido'),
+            # EAN válido en su forma de 13 dígitos (UPC-A con 0 adelante), así matchea con el lector del
+            # Buscador; si no valida queda tal como lo leyó la IA
+            "codigo_barras": codigos.normalizar_ean(item.get('codigo_barras')) or item.get('codigo_barras')
+        })
+    t['bytes'] = len(json.dumps({"p_ticket": ticket_data, "p_items": items}, default=str))
+    try:
+        # Cabecera + items en una sola llamada transaccional (sql/002_guardar_ticket.sql):
+        # si algo falla no queda un ticket huérfano
+        res = supabase.rpc('guardar_ticket', {"p_ticket": ticket_data, "p_items": items}).execute()
+        return res.data
+    except Exception as e:
+        if "unique" in str(e).lower(): return "DUPLICADO"
+        raise
+
+# --- VARIOS TICKETS ---
+# La carga por lote agrupa las fotos por nombre y encola un trabajo por ticket (cola.py)
+def agrupar_por_nombre(archivos):
+    # 'ticket1_a.jpg', 'ticket1-2.jpg', 'ticket1 (3).jpg' -> ticket 'ticket1'. 'IMG_1234.jpg' queda solo.
+    grupos = OrderedDict()
+    for f in archivos:
+        base = os.path.splitext(os.path.basename(f.name))[0]
+        clave = re.sub(r'(\s*\(\d{1,2}\)|[_\-](\d{1,2}|[a-zA-Z]))$', '', base) or base
+        grupos.setdefault(clave, []).append(f)
+    return grupos
+
+def procesar_ticket(imagenes, extraer, guardar):
+    # Extrae y guarda un ticket; nunca lanza: devuelve {'estado': 'ok'|'duplicado'|'error', ...}
+    try: data = extraer(imagenes)
+    except Exception as e: return {"estado": "error", "detalle": f"IA: {e}"}
+    if not data: return {"estado": "error", "detalle": "IA: respuesta vacía"}
+    try: res = guardar(data)
+    except Exception as e: return {"estado": "error", "detalle": f"DB: {e}", "data": data}
+    if res == "DUPLICADO": return {"estado": "duplicado", "data": data}
+    return {"estado": "ok", "items": res, "data": data}
@@ -1,18 +1,19 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import datos
+import cadenas
+import graficos
+import analitica
+import cache_datos
+import backend
+import trazas
 
 st.set_page_config(page_title="Mis Estadísticas", page_icon="📊", layout="wide")
+trazas.iniciar("Mis Estadísticas")
 st.markdown("<style>.block-container {padding-top: 2rem;}</style>", unsafe_allow_html=True)
 
-try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    supabase = create_client(URL, KEY)
+# Cliente compartido del proceso (backend.py): no se recrea en cada rerun
+try: supabase, _ = backend.iniciar()
 except: st.stop()
 
 if 'user' not in st.session_state or not st.session_state['user']:
@@ -23,55 +24,49 @@ st.title("📊 Mis Consumos")
 
 # 1. TRAER DATOS
 user_id = st.session_state['user'].id
-response = supabase.table('items_compra').select('*, tickets!inner(fecha, supermercados(nombre))').eq('tickets.user_id', user_id).execute()
-
-if not response.data:
-    st.info("Aún no tienes datos cargados.")
+# Solo las columnas que usa esta página, con precio > 0 y nulos ya rellenos (dataset compacto)
+def obtener_datos():
+    df = datos.cargar_analisis(
+        supabase, ['fecha', 'supermercado_nombre', 'rubro', 'marca', 'producto_final', 'precio_neto_unitario', 'cantidad'],
+        user_id=user_id, rellenar={'rubro': 'Otros', 'marca': 'Genérica'}
+    )
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    # --- LIMPIEZA DE NOMBRES (Estandarización) ---
+    df['supermercado'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    return df
+
+# Con MOTOR_ANALISIS=duckdb se consulta el archivo analítico local filtrado por socio;
+# si no, caché propio del socio: se invalida cuando él (u otro proceso) carga o borra uno de sus tickets
+motor = analitica.activo()
+if motor:
+    vista = analitica.Vista(supabase, rubro_nulo='Otros', user_id=user_id, nombres={'supermercado': 'cadena'})
+    sin_datos = vista.fecha_min is None
+else:
+    df = cache_datos.obtener('mis_estadisticas', user_id, datos.version(supabase, user_id), obtener_datos)
+    sin_datos = df.empty
+
+if sin_datos:
+    st.info("Aún no tienes datos válidos cargados (Precios > 0).")
     st.stop()
 
-df = pd.DataFrame(response.data)
-
-# --- FILTRO DE SEGURIDAD (PRECIOS > 0) ---
-df = df[df['precio_neto_unitario'] > 0]
-
-if df.empty:
-    st.warning("No hay datos válidos (Precios > 0).")
-    st.stop()
-
-df['fecha'] = pd.to_datetime(df['tickets'].apply(lambda x: x['fecha']))
-df['sucursal_original'] = df['tickets'].apply(lambda x: x['supermercados']['nombre'])
-df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
-
-# --- LIMPIEZA DE NOMBRES (Estandarización) ---
-def limpiar_nombre(nombre):
-    n = nombre.upper() if nombre else ""
-    if 'COTO' in n: return 'COTO'
-    if 'JUMBO' in n: return 'JUMBO'
-    if 'CARREFOUR' in n: return 'CARREFOUR'
-    if 'DIA' in n: return 'DIA'
-    if 'DISCO' in n: return 'DISCO'
-    if 'VEA' in n: return 'VEA'
-    if 'MAKRO' in n: return 'MAKRO'
-    if 'FARMACITY' in n or 'SIMPLICITY' in n or 'FARMCITY' in n: return 'FARMACITY'
-    if 'SELMA' in n: return 'SELMA'
-    return n
-
-df['supermercado'] = df['sucursal_original'].apply(limpiar_nombre)
-df['rubro'] = df['rubro'].fillna('Otros')
-df['marca'] = df['marca'].fillna('Genérica')
-df['producto_final'] = df['producto_generico'].fillna(df['nombre_producto'])
-
 # --- PARTE A: ANÁLISIS POR PRODUCTO ---
 st.markdown("#### 🔎 Evolución de Precio")
 
-lista_productos = sorted(df['producto_final'].unique())
+if motor: lista_productos = vista.valores('producto_final')
+else: lista_productos = sorted(df['producto_final'].cat.remove_unused_categories().cat.categories)
 producto_selec = st.selectbox("Selecciona un producto:", lista_productos)
 
 if producto_selec:
-    df_prod = df[df['producto_final'] == producto_selec].sort_values('fecha')
+    if motor:
+        df_prod = vista.filas(['fecha', 'supermercado', 'rubro', 'marca', 'producto_final', 'precio_neto_unitario', 'cantidad', 'gasto_total'],
+                              orden='fecha', producto_final=producto_selec)
+        df_prod['marca'] = df_prod['marca'].fillna('Genérica')
+    else: df_prod = df[df['producto_final'] == producto_selec].sort_values('fecha')
     
-    precio_actual = df_prod.iloc[-1]['precio_neto_unitario']
-    precio_anterior = df_prod.iloc[0]['precio_neto_unitario']
+    # Primer y último precio salen de los agregados diarios del espejo, sin recorrer el historial
+    resumen = datos.resumen_precio(producto_selec, user_id=user_id)
+    precio_actual = resumen['ultimo'] if resumen else df_prod.iloc[-1]['precio_neto_unitario']
+    precio_anterior = resumen['primero'] if resumen else df_prod.iloc[0]['precio_neto_unitario']
     variacion = ((precio_actual - precio_anterior) / precio_anterior) * 100 if precio_anterior > 0 else 0
     
     c1, c2, c3 = st.columns(3)
@@ -79,13 +74,13 @@ if producto_selec:
     c2.metric("Precio Inicial", f"${precio_anterior:,.2f}")
     c3.metric("Variación Histórica", f"{variacion:+.1f}%", delta_color="inverse")
 
-    chart = alt.Chart(df_prod).mark_line(point=True).encode(
+    chart = alt.Chart(graficos.serie_reducida(df_prod, color='supermercado')).mark_line(point=True).encode(
         x='fecha:T',
         y=alt.Y('precio_neto_unitario', title='Precio ($)'),
         color='supermercado',
         tooltip=['fecha', 'supermercado', 'precio_neto_unitario', 'marca']
     ).interactive()
-    st.altair_chart(chart, use_container_width=True)
+    trazas.grafico(chart)
 
 # --- PARTE B: DETALLE FILTRADO ---
 st.divider()
@@ -107,4 +102,6 @@ st.dataframe(
         "Fecha": st.column_config.DateColumn(format="DD/MM/YYYY"),
         "Cant.": st.column_config.NumberColumn(format="%.2f")
     }
-)
\ No newline at end of file
+)
+
+trazas.cerrar()
@@ -1,22 +1,21 @@
 import streamlit as st
-import pandas as pd
-from PIL import Image
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from supabase import create_client, Client
+import busqueda
+import codigos
+import datos
+import cadenas
+import cache_ocr
+import extraccion
+import pasarela
+import backend
+import trazas
 
 st.set_page_config(page_title="Buscador", page_icon="🔎", layout="wide")
+trazas.iniciar("Buscador")
 
 # --- CONFIGURACIÓN ---
+# Cliente compartido del proceso (backend.py); Gemini se crea (e importa) recién si hace falta
 try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    GOOGLE_KEY = st.secrets["GOOGLE_API_KEY"] if "GOOGLE_API_KEY" in st.secrets else os.environ.get("GOOGLE_API_KEY")
-    
-    supabase = create_client(URL, KEY)
-    client = genai.Client(api_key=GOOGLE_KEY)
+    supabase, _ = backend.iniciar()
 except:
     st.error("Error de configuración")
     st.stop()
@@ -26,47 +25,70 @@ if 'user' not in st.session_state or not st.session_state['user']:
     st.stop()
 
 st.markdown("### 🔎 ¿Está barato o caro?")
-st.info("Saca una foto al producto (frente o etiqueta) y te diré si ya lo compraste antes.")
+st.info("Saca una foto al código de barras (o al frente del producto) y te diré si ya lo compraste antes.")
 
 # --- 1. ENTRADA DE IMAGEN ---
 img_buffer = st.camera_input("Foto del producto", label_visibility="collapsed")
 
+# --- 2. CAMINO RÁPIDO: CÓDIGO DE BARRAS ---
+# Si la foto muestra el EAN, se responde desde el índice local sin llamar a la IA
+def mostrar_historial_ean(ean, df):
+    df['Cadena'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    st.success(f"Código **{ean}**: {df.iloc[0]['nombre_producto']}")
+    por_cadena = df.groupby('Cadena', observed=True).agg(
+        Mejor=('precio_neto_unitario', 'min'), Ultimo=('precio_neto_unitario', 'first'),
+        Fecha=('fecha', 'first'), Compras=('precio_neto_unitario', 'size')).sort_values('Mejor').reset_index()
+    st.dataframe(
+        por_cadena, hide_index=True,
+        column_config={"Mejor": st.column_config.NumberColumn(format="$ %.2f"), "Ultimo": st.column_config.NumberColumn("Último", format="$ %.2f"),
+                       "Fecha": st.column_config.DateColumn("Última compra")}
+    )
+    mejor = por_cadena.iloc[0]
+    st.metric("Mejor Precio Histórico", f"${mejor['Mejor']:,.2f}", f"en {mejor['Cadena']}")
+    with st.expander("Historial completo"):
+        st.dataframe(
+            df[['fecha', 'Cadena', 'precio_neto_unitario', 'nombre_producto']].rename(columns={'fecha': 'Fecha', 'precio_neto_unitario': 'Precio', 'nombre_producto': 'Producto'}),
+            hide_index=True, column_config={"Precio": st.column_config.NumberColumn(format="$ %.2f")}
+        )
+
+resuelto = False
 if img_buffer:
     st.image(img_buffer, width=150, caption="Producto detectado")
-    
+    try:
+        ean = codigos.leer_codigo(img_buffer)
+        if ean:
+            df_ean = datos.historial_ean(supabase, ean)
+            if not df_ean.empty:
+                mostrar_historial_ean(ean, df_ean)
+                resuelto = True
+            else: st.caption(f"Código {ean} leído, pero no está en el historial. Pruebo por nombre...")
+    except Exception as e:
+        st.caption(f"No pude leer el código de barras ({e}).")
+
+# --- 3. SIN CÓDIGO: IDENTIFICAR CON LA IA ---
+if img_buffer and not resuelto:
     with st.spinner("🤖 Identificando producto..."):
-        # A. PREGUNTAR A LA IA QUÉ ES
-        img = Image.open(img_buffer)
+        # A. PREGUNTAR A LA IA QUÉ ES (la misma foto ya identificada sale del caché local)
         prompt = "Identifica este producto. Devuelve SOLO el nombre genérico y la marca. Ejemplo: 'Aceite de Girasol Cocinero'. Se breve."
         
+        def identificar():
+            partes = extraccion.partes_imagen([img_buffer], 'producto')
+            with trazas.tramo('gemini', modelo=extraccion.MODELO_IA, bytes=sum(len(p.inline_data.data) for p in partes)):
+                response = backend.gemini().models.generate_content(model=extraccion.MODELO_IA, contents=[prompt] + partes)
+            return response.text.strip()
+        
         try:
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[prompt, img]
-            )
-            producto_detectado = response.text.strip()
+            producto_detectado = cache_ocr.obtener('producto', [img_buffer], identificar)
             st.success(f"Busco: **{producto_detectado}**")
             
-            # B. BUSCAR EN LA BASE DE DATOS (Búsqueda de texto)
-            # Usamos 'ilike' con comodines % para buscar coincidencias parciales
-            terminos = producto_detectado.split()
-            # Tomamos las palabras clave (ej: Aceite, Cocinero)
-            busqueda = f"%{terminos[0]}%" 
-            if len(terminos) > 1: busqueda += f"{terminos[1]}%"
-
-            response_db = supabase.table('items_compra').select(
-                'precio_neto_unitario, nombre_producto, fecha:tickets(fecha), super:tickets(supermercados(nombre))'
-            ).ilike('nombre_producto', busqueda).order('precio_neto_unitario', desc=False).execute()
-            
-            resultados = response_db.data
+            # B. BUSCAR EN LA BASE DE DATOS (índice de trigramas: tolera orden, acentos y errores de OCR)
+            df = busqueda.mejores(busqueda.buscar(supabase, producto_detectado))
             
-            if resultados:
-                st.write(f"✅ Encontré {len(resultados)} referencias:")
+            if not df.empty:
+                st.write(f"✅ Encontré {len(df)} referencias:")
                 
-                df = pd.DataFrame(resultados)
-                # Aplanar datos
-                df['Supermercado'] = df['super'].apply(lambda x: x['supermercados']['nombre'])
-                df['Fecha'] = df['fecha'].apply(lambda x: x['fecha'])
+                df['Supermercado'] = df['supermercado']
+                df['Fecha'] = df['fecha']
                 df['Producto'] = df['nombre_producto']
                 df['Precio'] = df['precio_neto_unitario']
                 
@@ -83,5 +105,9 @@ if img_buffer:
             else:
                 st.warning(f"No encontré '{producto_detectado}' en tu historial de compras.")
                 
+        except pasarela.IANoDisponible as e:
+            st.warning(f"⏳ {e}")
         except Exception as e:
-            st.error(f"Error: {e}")
\ No newline at end of file
+            st.error(f"Error: {e}")
+
+trazas.cerrar()
@@ -1,70 +1,63 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import datos
+import cadenas
+import agregados
+import graficos
+import analitica
+import cache_datos
+import backend
+import trazas
 
 st.set_page_config(page_title="El Club", page_icon="🌎", layout="wide")
+trazas.iniciar("El Club")
 st.markdown("<style>.block-container {padding-top: 2rem;}</style>", unsafe_allow_html=True)
 
-try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    supabase = create_client(URL, KEY)
+# Cliente compartido del proceso (backend.py): no se recrea en cada rerun
+try: supabase, _ = backend.iniciar()
 except: st.stop()
 
 st.title("🌎 Inteligencia del Club")
 st.caption("Comparativa basada en datos de todos los socios.")
 
 # --- DATOS GLOBALES ---
-# Traemos últimos 2000 registros para tener muestra
-response = supabase.table('items_compra').select(
-    'precio_neto_unitario, nombre_producto, producto_generico, rubro, marca, tickets(fecha, sucursal_localidad, supermercados(nombre))'
-).order('created_at', desc=True).limit(2000).execute()
-
-if not response.data:
-    st.info("Faltan datos en la comunidad.")
-    st.stop()
-
-df = pd.DataFrame(response.data)
-
-# --- FILTRO DE SEGURIDAD (PRECIOS > 0) ---
-df = df[df['precio_neto_unitario'] > 0]
-
-if df.empty:
-    st.warning("No hay datos válidos.")
+# Historial completo desde el espejo local (se sincroniza por páginas, sin tope de filas)
+# Solo las columnas que se muestran, compactas (categóricas / float32) y con precio > 0
+def obtener_datos():
+    df = datos.cargar_analisis(
+        supabase, ['fecha', 'supermercado_nombre', 'sucursal_localidad', 'producto_final', 'precio_neto_unitario'],
+        rellenar={'sucursal_localidad': 'S/D'}
+    ).rename(columns={'fecha': 'Fecha', 'sucursal_localidad': 'Localidad', 'producto_final': 'Producto', 'precio_neto_unitario': 'Precio'})
+    # Limpieza de Supermercados (compartida con las otras páginas)
+    df['Supermercado'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    return df
+
+# Compartido entre sesiones y reruns hasta que cambie la versión de los datos del club
+version = datos.version(supabase)
+# Con MOTOR_ANALISIS=duckdb ranking, productos e historial salen con SQL del archivo analítico local
+motor = analitica.activo()
+if motor:
+    vista = analitica.Vista(supabase)
+    sin_datos = vista.fecha_min is None
+else:
+    df = cache_datos.obtener('club', datos.GLOBAL, version, obtener_datos)
+    sin_datos = df.empty
+
+if sin_datos:
+    st.info("Faltan datos válidos en la comunidad.")
     st.stop()
 
-# Procesamiento
-df['Fecha'] = pd.to_datetime(df['tickets'].apply(lambda x: x['fecha']))
-df['sucursal_raw'] = df['tickets'].apply(lambda x: x['supermercados']['nombre'] if x['supermercados'] else 'Desconocido')
-df['Localidad'] = df['tickets'].apply(lambda x: x['sucursal_localidad'] or 'S/D')
-df['Producto'] = df['producto_generico'].fillna(df['nombre_producto'])
-df['Precio'] = df['precio_neto_unitario']
-
-# Limpieza de Supermercados (Igual que en las otras apps)
-def limpiar_nombre(nombre):
-    n = nombre.upper()
-    if 'COTO' in n: return 'COTO'
-    if 'JUMBO' in n: return 'JUMBO'
-    if 'CARREFOUR' in n: return 'CARREFOUR'
-    if 'DIA' in n: return 'DIA'
-    if 'DISCO' in n: return 'DISCO'
-    if 'VEA' in n: return 'VEA'
-    if 'MAKRO' in n: return 'MAKRO'
-    if 'FARMACITY' in n or 'SIMPLICITY' in n or 'FARMCITY' in n: return 'FARMACITY'
-    if 'SELMA' in n: return 'SELMA'
-    return n
-
-df['Supermercado'] = df['sucursal_raw'].apply(limpiar_nombre)
-
 # --- KPI 1: RANKING PRECIOS ---
 st.subheader("🏆 Ranking de Precios Promedio")
 st.caption("Quién vende más barato (promedio general).")
 
-ranking = df.groupby('Supermercado')['Precio'].mean().reset_index().sort_values('Precio')
+# Promedio por cadena calculado en la base (solo viajan las cadenas)
+def obtener_precios_cadena(producto=None):
+    if motor: return vista.precios_por_cadena(producto=producto, por_producto=producto is not None)
+    return cache_datos.obtener(('precios_cadena', producto), datos.GLOBAL, version,
+                               lambda: agregados.precios_por_cadena(supabase, producto=producto, por_producto=producto is not None))
+
+ranking = obtener_precios_cadena().rename(columns={'cadena': 'Supermercado', 'precio_promedio': 'Precio'})[['Supermercado', 'Precio']]
 
 chart_rank = alt.Chart(ranking).mark_bar().encode(
     x=alt.X('Precio', title='Precio Promedio ($)'),
@@ -73,37 +66,58 @@ chart_rank = alt.Chart(ranking).mark_bar().encode(
     tooltip=['Supermercado', alt.Tooltip('Precio', format='$,.0f')]
 ).properties(height=300)
 
-st.altair_chart(chart_rank, use_container_width=True)
+trazas.grafico(chart_rank)
 
 # --- KPI 2: COMPARADOR ---
 st.divider()
 st.subheader("🔍 Comparador de Productos")
 
-lista_prods = sorted(df['Producto'].unique().astype(str))
+lista_prods = vista.valores('producto_final') if motor else sorted(df['Producto'].unique().astype(str))
 prod_selec = st.selectbox("¿Qué producto quieres comparar?", lista_prods)
 
 if prod_selec:
-    df_prod = df[df['Producto'] == prod_selec]
+    if motor:
+        df_prod = vista.filas(['fecha', 'cadena', 'sucursal_localidad', 'precio_neto_unitario'], producto_final=prod_selec).rename(
+            columns={'fecha': 'Fecha', 'cadena': 'Supermercado', 'sucursal_localidad': 'Localidad', 'precio_neto_unitario': 'Precio'})
+        df_prod['Localidad'] = df_prod['Localidad'].fillna('S/D')
+    else: df_prod = df[df['Producto'] == prod_selec]
     
-    min_val = df_prod['Precio'].min()
-    avg_val = df_prod['Precio'].mean()
-    max_val = df_prod['Precio'].max()
+    resumen = datos.resumen_precio(prod_selec)
+    if resumen: min_val, avg_val, max_val = resumen['minimo'], resumen['promedio'], resumen['maximo']
+    else: min_val, avg_val, max_val = df_prod['Precio'].min(), df_prod['Precio'].mean(), df_prod['Precio'].max()
     
     c1, c2, c3 = st.columns(3)
     c1.metric("Mínimo Conseguido", f"${min_val:,.0f}")
     c2.metric("Promedio Club", f"${avg_val:,.0f}")
     c3.metric("Máximo Detectado", f"${max_val:,.0f}")
     
+    st.markdown("#### Precio por cadena")
+    por_cadena = obtener_precios_cadena(prod_selec)[['cadena', 'precio_min', 'precio_promedio', 'precio_max', 'compras']]
+    st.dataframe(
+        por_cadena,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "cadena": "Supermercado",
+            "precio_min": st.column_config.NumberColumn("Mínimo", format="$ %.2f"),
+            "precio_promedio": st.column_config.NumberColumn("Promedio", format="$ %.2f"),
+            "precio_max": st.column_config.NumberColumn("Máximo", format="$ %.2f"),
+            "compras": "Compras"
+        }
+    )
+    
     st.markdown("#### Dispersión de precios")
-    scatter = alt.Chart(df_prod).mark_circle(size=100).encode(
+    scatter = alt.Chart(graficos.serie_reducida(df_prod, x='Fecha', y='Precio', color='Supermercado')).mark_circle(size=100).encode(
         x='Fecha',
         y='Precio',
         color='Supermercado',
         tooltip=['Fecha', 'Supermercado', 'Precio', 'Localidad']
     ).interactive()
     
-    st.altair_chart(scatter, use_container_width=True)
+    trazas.grafico(scatter)
     
     st.markdown("#### Oportunidades (Top 5 Baratos)")
     mejores = df_prod.sort_values('Precio').head(5)[['Supermercado', 'Precio', 'Fecha', 'Localidad']]
-    st.dataframe(mejores, use_container_width=True, hide_index=True, column_config={"Precio": st.column_config.NumberColumn(format="$ %.2f"), "Fecha": st.column_config.DateColumn(format="DD/MM/YYYY")})
\ No newline at end of file
+    st.dataframe(mejores, use_container_width=True, hide_index=True, column_config={"Precio": st.column_config.NumberColumn(format="$ %.2f"), "Fecha": st.column_config.DateColumn(format="DD/MM/YYYY")})
+
+trazas.cerrar()
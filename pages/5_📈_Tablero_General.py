@@ -1,20 +1,23 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import datos
+import cadenas
+import filtros
+import analitica
+import graficos
+import tablas
+import cache_datos
+import backend
+import trazas
 
 # Configuración de página
 st.set_page_config(page_title="Tablero General", page_icon="📈", layout="wide")
+trazas.iniciar("Tablero General")
 st.markdown("<style>.block-container {padding-top: 2rem;}</style>", unsafe_allow_html=True)
 
 # --- CONEXIÓN ---
-try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    supabase = create_client(URL, KEY)
+# Cliente compartido del proceso (backend.py): no se recrea en cada rerun
+try: supabase, _ = backend.iniciar()
 except: st.stop()
 
 if 'user' not in st.session_state or not st.session_state['user']:
@@ -24,69 +27,38 @@ if 'user' not in st.session_state or not st.session_state['user']:
 st.title("📈 Tablero de Inteligencia")
 
 # --- 1. CARGA Y PROCESAMIENTO ---
-@st.cache_data(ttl=60) 
+# Caché por versión de datos (cache_datos.py): el mismo índice sirve a todas las sesiones hasta que
+# se carga o borra un ticket; no se copia entre reruns (las páginas solo lo leen)
 def obtener_datos():
-    try:
-        response = supabase.table('items_compra').select(
-            '*, tickets!inner(fecha, supermercados(nombre))'
-        ).execute()
-        
-        if not response.data: return pd.DataFrame()
-        
-        df = pd.DataFrame(response.data)
-        
-        # --- FILTRO DE LIMPIEZA CRÍTICO ---
-        # Eliminamos cualquier registro con precio 0 o negativo
-        df = df[df['precio_neto_unitario'] > 0]
-        
-        if df.empty: return pd.DataFrame()
-
-        # Aplanar datos
-        df['fecha'] = pd.to_datetime(df['tickets'].apply(lambda x: x['fecha']))
-        
-        df['sucursal_original'] = df['tickets'].apply(
-            lambda x: x['supermercados']['nombre'] if x['supermercados'] else "Desconocido"
-        )
-        
-        df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
-        
-        # Limpieza de Nombres
-        def limpiar_nombre(nombre):
-            n = nombre.upper() if nombre else ""
-            if 'COTO' in n: return 'COTO'
-            if 'JUMBO' in n: return 'JUMBO'
-            if 'CARREFOUR' in n: return 'CARREFOUR'
-            if 'DIA' in n: return 'DIA'
-            if 'DISCO' in n: return 'DISCO'
-            if 'VEA' in n: return 'VEA'
-            if 'MAKRO' in n: return 'MAKRO'
-            if 'FARMACITY' in n or 'SIMPLICITY' in n or 'FARMCITY' in n: return 'FARMACITY'
-            if 'SELMA' in n: return 'SELMA'
-            return n
-
-        df['cadena_comercial'] = df['sucursal_original'].apply(limpiar_nombre)
-
-        # Clasificación Tipo
-        def clasificar_tipo(cadena):
-            farmacias = ['FARMACITY', 'SELMA', 'SIMPLICITY']
-            if cadena in farmacias: return 'Farmacia'
-            return 'Supermercado'
-
-        df['tipo_comercio'] = df['cadena_comercial'].apply(clasificar_tipo)
-
-        # Arreglar los NULLs
-        df['producto_final'] = df['producto_generico'].fillna(df['nombre_producto'])
-        df['rubro'] = df['rubro'].fillna('Sin Clasificar')
-        
-        return df
-
-    except Exception as e:
-        st.error(f"Error cargando datos: {e}")
-        return pd.DataFrame()
-
-df = obtener_datos()
-
-if df.empty:
+    # Leemos del espejo local solo las columnas del tablero, compactas y con precio > 0
+    df = datos.cargar_analisis(
+        supabase, ['fecha', 'supermercado_nombre', 'producto_final', 'rubro', 'cantidad', 'precio_neto_unitario'],
+        rellenar={'rubro': 'Sin Clasificar'}
+    )
+    
+    if df.empty: return None
+    
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    
+    # Limpieza de Nombres (una vez por sucursal distinta, columna categórica)
+    df['cadena_comercial'] = cadenas.columna_cadena(df['supermercado_nombre'])
+
+    # Clasificación Tipo
+    df['tipo_comercio'] = cadenas.columna_tipo(df['cadena_comercial'])
+    
+    # Ordenado por fecha + códigos por columna de filtro
+    return filtros.IndiceFiltros(df, ['tipo_comercio', 'rubro', 'cadena_comercial', 'producto_final'])
+
+# Con el motor analítico (MOTOR_ANALISIS=duckdb) las mismas consultas van como SQL al archivo DuckDB
+motor = analitica.activo()
+try:
+    if motor: indice = analitica.Vista(supabase, rubro_nulo='Sin Clasificar', nombres={'cadena_comercial': 'cadena'})
+    else: indice = cache_datos.obtener('tablero', datos.GLOBAL, datos.version(supabase), obtener_datos)
+except Exception as e:
+    st.error(f"Error cargando datos: {e}")
+    indice = None
+
+if indice is None or indice.fecha_min is None:
     st.info("No hay datos válidos cargados aún (Precios > 0).")
     st.stop()
 
@@ -95,38 +67,38 @@ with st.expander("🔎 Filtros Generales", expanded=True):
     c1, c2, c3 = st.columns(3)
     
     # Filtro Tipo
-    tipos = ['Todos'] + sorted(list(df['tipo_comercio'].unique()))
+    tipos = ['Todos'] + indice.valores('tipo_comercio')
     sel_tipo = c1.selectbox("Tipo de Comercio", tipos)
     
     # Filtro Rubro
-    df_temp = df if sel_tipo == 'Todos' else df[df['tipo_comercio'] == sel_tipo]
-    rubros = ['Todos'] + sorted(list(df_temp['rubro'].unique()))
+    rubros = ['Todos'] + indice.valores('rubro', tipo_comercio=sel_tipo)
     sel_rubro = c2.selectbox("Rubro", rubros)
     
     # Filtro Fecha
-    min_date = df['fecha'].min().date()
-    max_date = df['fecha'].max().date()
+    min_date = indice.fecha_min.date()
+    max_date = indice.fecha_max.date()
     sel_fechas = c3.date_input("Rango de Fechas", [min_date, max_date])
 
-# Aplicar filtros
-if isinstance(sel_fechas, list) and len(sel_fechas) == 2:
-    mask = (df['fecha'].dt.date >= sel_fechas[0]) & (df['fecha'].dt.date <= sel_fechas[1])
-    if sel_tipo != 'Todos': mask &= (df['tipo_comercio'] == sel_tipo)
-    if sel_rubro != 'Todos': mask &= (df['rubro'] == sel_rubro)
-    df_filtrado = df[mask]
+# Aplicar filtros (búsqueda binaria por fecha + bitmaps de tipo y rubro)
+if isinstance(sel_fechas, (list, tuple)) and len(sel_fechas) == 2:
+    filtro = {'desde': sel_fechas[0], 'hasta': sel_fechas[1], 'tipo_comercio': sel_tipo, 'rubro': sel_rubro}
+else:
+    filtro = {}
+if motor:
+    totales = indice.totales(**filtro)
+    hay_datos, total_gastado, items_comprados = totales['filas'] > 0, totales['gasto'], totales['unidades']
 else:
-    df_filtrado = df
+    df_filtrado = indice.filtrar(**filtro)
+    hay_datos, total_gastado, items_comprados = not df_filtrado.empty, df_filtrado['gasto_total'].sum(), df_filtrado['cantidad'].sum()
 
 # --- 3. GRÁFICOS RESUMEN ---
 st.divider()
 
-if df_filtrado.empty:
+if not hay_datos:
     st.warning("No hay datos para estos filtros.")
     st.stop()
 
 # Métricas
-total_gastado = df_filtrado['gasto_total'].sum()
-items_comprados = df_filtrado['cantidad'].sum()
 col_met1, col_met2 = st.columns(2)
 col_met1.metric("Gasto Total", f"${total_gastado:,.2f}")
 col_met2.metric("Unidades", f"{items_comprados:.0f}")
@@ -135,38 +107,40 @@ c_chart1, c_chart2 = st.columns([2, 1])
 
 with c_chart1:
     st.subheader("📊 Evolución del Gasto")
-    chart_bar = alt.Chart(df_filtrado).mark_bar().encode(
-        x=alt.X('yearmonth(fecha):O', title='Mes'),
-        y=alt.Y('sum(gasto_total)', title='Monto ($)'),
+    # Sumas por mes y cadena hechas acá: al navegador viajan decenas de filas, no el historial
+    por_mes = indice.gasto_por_mes('cadena_comercial', **filtro) if motor else graficos.gasto_por_mes(df_filtrado, 'cadena_comercial')
+    chart_bar = alt.Chart(por_mes).mark_bar().encode(
+        x=alt.X('yearmonth(mes):O', title='Mes'),
+        y=alt.Y('gasto_total', title='Monto ($)'),
         color='cadena_comercial',
-        tooltip=['yearmonth(fecha)', 'cadena_comercial', 'sum(gasto_total)']
+        tooltip=[alt.Tooltip('yearmonth(mes)', title='Mes'), 'cadena_comercial', alt.Tooltip('gasto_total', format='$,.2f')]
     ).interactive()
-    st.altair_chart(chart_bar, use_container_width=True)
+    trazas.grafico(chart_bar)
 
 with c_chart2:
     st.subheader("🛒 Participación")
-    chart_pie = alt.Chart(df_filtrado).mark_arc(innerRadius=50).encode(
-        theta=alt.Theta(field="gasto_total", aggregate="sum"),
+    participacion = indice.gasto_por('cadena_comercial', **filtro) if motor else graficos.gasto_por(df_filtrado, 'cadena_comercial')
+    chart_pie = alt.Chart(participacion).mark_arc(innerRadius=50).encode(
+        theta=alt.Theta(field="gasto_total", type="quantitative"),
         color=alt.Color(field="cadena_comercial"),
-        tooltip=['cadena_comercial', 'sum(gasto_total)']
+        tooltip=['cadena_comercial', alt.Tooltip('gasto_total', format='$,.2f')]
     )
-    st.altair_chart(chart_pie, use_container_width=True)
+    trazas.grafico(chart_pie)
 
 # --- 4. DETALLE DE PRODUCTOS ---
 st.divider()
 st.subheader("📝 Historial de Productos")
 
 # Buscador de Producto
-lista_productos_disponibles = ['Todos'] + sorted(list(df_filtrado['producto_final'].unique()))
+lista_productos_disponibles = ['Todos'] + indice.valores('producto_final', **filtro)
 sel_producto = st.selectbox("🔍 Buscar producto específico:", lista_productos_disponibles)
 
-if sel_producto != 'Todos':
-    df_tabla = df_filtrado[df_filtrado['producto_final'] == sel_producto]
-else:
-    df_tabla = df_filtrado
-
-st.dataframe(
-    df_tabla[['fecha', 'cadena_comercial', 'producto_final', 'cantidad', 'precio_neto_unitario', 'gasto_total']].sort_values('fecha', ascending=False),
+# Paginada: se ordena y filtra sobre posiciones del dataset cacheado (o con SQL) y viaja solo la página visible
+if motor: fuente = {'vista': indice, 'filtros': dict(producto_final=sel_producto, **filtro)}
+else: fuente = {'posiciones': indice.posiciones(producto_final=sel_producto, **filtro)}
+tablas.tabla_paginada(
+    None if motor else indice.df, ['fecha', 'cadena_comercial', 'producto_final', 'cantidad', 'precio_neto_unitario', 'gasto_total'], 'historial',
+    orden='fecha', **fuente,
     column_config={
         "fecha": st.column_config.DateColumn("Fecha", format="DD/MM/YYYY"),
         "precio_neto_unitario": st.column_config.NumberColumn("Precio Unitario", format="$ %.2f"),
@@ -174,7 +148,7 @@ st.dataframe(
         "producto_final": "Producto",
         "cadena_comercial": "Comercio",
         "cantidad": st.column_config.NumberColumn("Cant.", format="%.2f")
-    },
-    use_container_width=True,
-    hide_index=True
-)
\ No newline at end of file
+    }
+)
+
+trazas.cerrar()
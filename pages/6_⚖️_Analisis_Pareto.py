@@ -1,21 +1,25 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import datos
+import cadenas
+import agregados
+import filtros
+import analitica
+import graficos
+import tablas
+import cache_datos
+import backend
+import trazas
 from datetime import datetime, timedelta
 
 # Configuración
 st.set_page_config(page_title="Análisis Pareto", page_icon="⚖️", layout="wide")
+trazas.iniciar("Análisis Pareto")
 st.markdown("<style>.block-container {padding-top: 2rem;}</style>", unsafe_allow_html=True)
 
 # --- CONEXIÓN ---
-try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    supabase = create_client(URL, KEY)
+# Cliente compartido del proceso (backend.py): no se recrea en cada rerun
+try: supabase, _ = backend.iniciar()
 except: st.stop()
 
 if 'user' not in st.session_state or not st.session_state['user']:
@@ -30,57 +34,33 @@ Aquí identificamos esos productos "VITALES" para que sepas dónde conviene comp
 """)
 
 # --- 1. CARGA DE DATOS ---
-@st.cache_data(ttl=60)
+# Caché compartido por versión de datos: se recalcula solo cuando entra o sale un ticket
 def obtener_datos():
-    try:
-        # Traemos datos brutos
-        response = supabase.table('items_compra').select(
-            '*, tickets!inner(fecha, supermercados(nombre))'
-        ).execute()
-        
-        if not response.data: return pd.DataFrame()
-        
-        df = pd.DataFrame(response.data)
-        
-        # Procesamiento básico
-        df['fecha'] = pd.to_datetime(df['tickets'].apply(lambda x: x['fecha']))
-        df['sucursal_original'] = df['tickets'].apply(lambda x: x['supermercados']['nombre'] if x['supermercados'] else "Desconocido")
-        df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
-        
-        # Limpieza Nombres y Tipos
-        def limpiar_nombre(nombre):
-            n = nombre.upper() if nombre else ""
-            if 'COTO' in n: return 'COTO'
-            if 'JUMBO' in n: return 'JUMBO'
-            if 'CARREFOUR' in n: return 'CARREFOUR'
-            if 'DIA' in n: return 'DIA'
-            if 'DISCO' in n: return 'DISCO'
-            if 'VEA' in n: return 'VEA'
-            if 'MAKRO' in n: return 'MAKRO'
-            if 'FARMACITY' in n or 'SIMPLICITY' in n or 'FARMCITY' in n: return 'FARMACITY'
-            if 'SELMA' in n: return 'SELMA'
-            return n
-
-        df['cadena'] = df['sucursal_original'].apply(limpiar_nombre)
-        
-        def clasificar_tipo(cadena):
-            if cadena in ['FARMACITY', 'SELMA', 'SIMPLICITY']: return 'Farmacia'
-            return 'Supermercado'
-        
-        df['tipo_comercio'] = df['cadena'].apply(clasificar_tipo)
-        
-        # Nombres de producto limpios
-        df['producto_final'] = df['producto_generico'].fillna(df['nombre_producto'])
-        df['rubro'] = df['rubro'].fillna('Otros')
-        
-        return df
-    except Exception as e:
-        st.error(f"Error: {e}")
-        return pd.DataFrame()
-
-df_raw = obtener_datos()
-
-if df_raw.empty:
+    # Del espejo local solo las columnas del análisis, compactas (el Pareto de la base también ignora precios <= 0)
+    df = datos.cargar_analisis(
+        supabase, ['fecha', 'supermercado_nombre', 'producto_final', 'rubro', 'cantidad', 'precio_neto_unitario'],
+        rellenar={'rubro': 'Otros'}
+    )
+    
+    if df.empty: return None
+    
+    df['gasto_total'] = df['precio_neto_unitario'] * df['cantidad']
+    
+    # Limpieza Nombres y Tipos
+    df['cadena'] = cadenas.columna_cadena(df['supermercado_nombre'])
+    df['tipo_comercio'] = cadenas.columna_tipo(df['cadena'])
+    
+    # Mismo índice que el Tablero: orden por fecha + códigos de tipo, rubro y producto
+    return filtros.IndiceFiltros(df, ['tipo_comercio', 'rubro', 'producto_final'])
+
+version = datos.version(supabase)
+motor = analitica.activo()  # MOTOR_ANALISIS=duckdb: ranking e historial con SQL sobre el archivo local
+try: indice = analitica.Vista(supabase, rubro_nulo='Otros') if motor else cache_datos.obtener('pareto', datos.GLOBAL, version, obtener_datos)
+except Exception as e:
+    st.error(f"Error: {e}")
+    indice = None
+
+if indice is None or indice.fecha_min is None:
     st.info("Faltan datos para el análisis.")
     st.stop()
 
@@ -89,12 +69,11 @@ with st.expander("🔎 Configurar Análisis", expanded=True):
     c1, c2, c3 = st.columns(3)
     
     # Filtro Tipo
-    tipos = ['Todos'] + list(df_raw['tipo_comercio'].unique())
+    tipos = ['Todos'] + indice.valores('tipo_comercio')
     sel_tipo = c1.selectbox("Tipo de Comercio", tipos)
     
     # Filtro Rubro
-    df_temp = df_raw if sel_tipo == 'Todos' else df_raw[df_raw['tipo_comercio'] == sel_tipo]
-    rubros = ['Todos'] + sorted(list(df_temp['rubro'].unique()))
+    rubros = ['Todos'] + indice.valores('rubro', tipo_comercio=sel_tipo)
     sel_rubro = c2.selectbox("Rubro", rubros)
     
     # Filtro Fecha (Default: Últimos 90 días)
@@ -102,37 +81,22 @@ with st.expander("🔎 Configurar Análisis", expanded=True):
     hace_3_meses = hoy - timedelta(days=90)
     sel_fechas = c3.date_input("Período", [hace_3_meses, hoy])
 
-# Aplicar Filtros
-mask = (df_raw['fecha'].dt.date >= sel_fechas[0]) & (df_raw['fecha'].dt.date <= sel_fechas[1])
-if sel_tipo != 'Todos': mask &= (df_raw['tipo_comercio'] == sel_tipo)
-if sel_rubro != 'Todos': mask &= (df_raw['rubro'] == sel_rubro)
+# --- 3. CÁLCULO DE PARETO (en la base: solo viaja el ranking ya agrupado) ---
+def obtener_pareto(desde, hasta, rubro, tipo):
+    if motor: return indice.pareto(desde, hasta, rubro=rubro, tipo_comercio=tipo)
+    return cache_datos.obtener(('pareto_rpc', desde, hasta, rubro, tipo), datos.GLOBAL, version,
+                               lambda: agregados.pareto(supabase, desde, hasta, rubro, tipo))
 
-df = df_raw[mask].copy()
+try: pareto = obtener_pareto(sel_fechas[0], sel_fechas[1], sel_rubro, sel_tipo)
+except Exception as e:
+    st.error(f"Error: {e}")
+    st.stop()
 
-if df.empty:
+if pareto.empty:
     st.warning("No hay compras en este período con estos filtros.")
     st.stop()
 
-# --- 3. CÁLCULO DE PARETO ---
-# Agrupamos por producto y sumamos gasto
-pareto = df.groupby('producto_final')['gasto_total'].sum().reset_index()
-pareto = pareto.sort_values('gasto_total', ascending=False)
-
-# Cálculos acumulados
 total_general = pareto['gasto_total'].sum()
-pareto['porcentaje'] = (pareto['gasto_total'] / total_general) * 100
-pareto['acumulado'] = pareto['porcentaje'].cumsum()
-
-# Definir Categoría ABC
-# A: Hasta el 80% del gasto (Los Vitales)
-# B: del 80% al 95%
-# C: El resto (Triviales)
-def clasificar_abc(acumulado):
-    if acumulado <= 80: return 'A - Vital (80% Gasto)'
-    elif acumulado <= 95: return 'B - Importante'
-    else: return 'C - Trivial'
-
-pareto['categoria'] = pareto['acumulado'].apply(clasificar_abc)
 
 # --- 4. VISUALIZACIÓN ---
 st.divider()
@@ -165,7 +129,7 @@ line = base.mark_line(color='red', point=True).encode(
     y=alt.Y('acumulado', title='% Acumulado', scale=alt.Scale(domain=[0, 100])),
 )
 
-st.altair_chart((bars + line).resolve_scale(y='independent'), use_container_width=True)
+trazas.grafico((bars + line).resolve_scale(y='independent'))
 
 # --- 5. ANÁLISIS DETALLADO (DRILL DOWN) ---
 st.divider()
@@ -177,13 +141,25 @@ lista_vitales = pareto[pareto['acumulado'] <= 95]['producto_final'].unique()
 prod_selec = st.selectbox("Seleccionar Producto:", lista_vitales)
 
 if prod_selec:
-    # Filtramos el DF original (el que tiene todas las fechas)
-    df_historia = df[df['producto_final'] == prod_selec].sort_values('fecha', ascending=False)
+    # Historial del producto elegido dentro de los filtros (desde el espejo local)
+    filtro = dict(desde=sel_fechas[0], hasta=sel_fechas[1], producto_final=prod_selec, tipo_comercio=sel_tipo, rubro=sel_rubro)
+    columnas = ['fecha', 'cadena', 'precio_neto_unitario', 'cantidad', 'gasto_total']
+    if motor:
+        df_historia = indice.filas(columnas, orden='fecha', **filtro)
+        fuente = {'vista': indice, 'filtros': filtro}
+    else:
+        pos_historia = indice.posiciones(**filtro)
+        df_historia = indice.df.iloc[pos_historia[::-1]]
+        fuente = {'posiciones': pos_historia}
     
-    # Métricas del producto
-    precio_min = df_historia['precio_neto_unitario'].min()
-    precio_max = df_historia['precio_neto_unitario'].max()
-    super_barato = df_historia.loc[df_historia['precio_neto_unitario'].idxmin()]['cadena']
+    # Métricas del producto (agregados diarios del espejo)
+    resumen = datos.resumen_precio(prod_selec, desde=sel_fechas[0], hasta=sel_fechas[1], tipo=sel_tipo, rubro=sel_rubro, rubro_nulo='Otros')
+    if resumen:
+        precio_min, precio_max, super_barato = resumen['minimo'], resumen['maximo'], resumen['cadena_minimo']
+    else:
+        precio_min = df_historia['precio_neto_unitario'].min()
+        precio_max = df_historia['precio_neto_unitario'].max()
+        super_barato = df_historia.loc[df_historia['precio_neto_unitario'].idxmin()]['cadena']
     
     m1, m2, m3 = st.columns(3)
     m1.metric("Mejor Precio Pagado", f"${precio_min:,.2f}")
@@ -191,24 +167,24 @@ if prod_selec:
     m3.metric("Precio Máximo Pagado", f"${precio_max:,.2f}")
     
     # Gráfico de evolución del precio
-    chart_line = alt.Chart(df_historia).mark_line(point=True).encode(
+    chart_line = alt.Chart(graficos.serie_reducida(df_historia, color='cadena')).mark_line(point=True).encode(
         x='fecha:T',
         y=alt.Y('precio_neto_unitario', title='Precio Unitario ($)', scale=alt.Scale(zero=False)),
         color='cadena',
         tooltip=['fecha', 'cadena', 'precio_neto_unitario', 'cantidad']
     ).properties(height=300)
     
-    st.altair_chart(chart_line, use_container_width=True)
+    trazas.grafico(chart_line)
     
     # Tabla detalle
     st.write("Historial de compras:")
-    st.dataframe(
-        df_historia[['fecha', 'cadena', 'precio_neto_unitario', 'cantidad', 'gasto_total']],
-        hide_index=True,
+    tablas.tabla_paginada(
+        None if motor else indice.df, columnas, 'historia_pareto', orden='fecha', **fuente,
         column_config={
             "fecha": st.column_config.DateColumn("Fecha", format="DD/MM/YYYY"),
             "precio_neto_unitario": st.column_config.NumberColumn("Precio Unit.", format="$ %.2f"),
             "gasto_total": st.column_config.NumberColumn("Total Ticket", format="$ %.2f")
-        },
-        use_container_width=True
-    )
\ No newline at end of file
+        }
+    )
+
+trazas.cerrar()
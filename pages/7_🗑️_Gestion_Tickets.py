@@ -1,18 +1,17 @@
 import streamlit as st
 import pandas as pd
 import time
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import datos
+import cache_ocr
+import backend
+import trazas
 
 st.set_page_config(page_title="Gestión de Tickets", page_icon="🗑️", layout="centered")
+trazas.iniciar("Gestión de Tickets")
 
 # --- CONEXIÓN ---
-try:
-    load_dotenv()
-    URL = st.secrets["SUPABASE_URL"] if "SUPABASE_URL" in st.secrets else os.environ.get("SUPABASE_URL")
-    KEY = st.secrets["SUPABASE_KEY"] if "SUPABASE_KEY" in st.secrets else os.environ.get("SUPABASE_KEY")
-    supabase = create_client(URL, KEY)
+# Cliente compartido del proceso (backend.py): no se recrea en cada rerun
+try: supabase, _ = backend.iniciar()
 except: st.stop()
 
 if 'user' not in st.session_state or not st.session_state['user']:
@@ -37,17 +36,18 @@ if not tickets:
     st.stop()
 
 # --- 2. SELECCIONAR TICKET ---
-# Creamos un diccionario para el selectbox: "Texto Bonito" -> "ID Real"
+# Creamos un diccionario para el selectbox: "Texto Bonito" -> ticket (id, fecha, monto)
 opciones_visuales = {}
 for t in tickets:
     nombre_super = t['supermercados']['nombre'] if t['supermercados'] else "Desconocido"
     texto = f"{t['fecha']} | {nombre_super} | ${t['monto_total']}"
-    opciones_visuales[texto] = t['id']
+    opciones_visuales[texto] = t
 
 st.divider()
 st.subheader("1. Selecciona el Ticket")
 seleccion = st.selectbox("Elige cuál quieres revisar o borrar:", list(opciones_visuales.keys()))
-ticket_id_seleccionado = opciones_visuales[seleccion]
+ticket_seleccionado = opciones_visuales[seleccion]
+ticket_id_seleccionado = ticket_seleccionado['id']
 
 # --- 3. MOSTRAR DETALLE (PREVIEW) ---
 st.subheader("2. Contenido del Ticket")
@@ -78,9 +78,14 @@ with col2:
         try:
             # Borramos el ticket (Supabase borrará los items en cascada automáticamente)
             supabase.table('tickets').delete().eq('id', ticket_id_seleccionado).execute()
+            datos.borrar_ticket_local(ticket_id_seleccionado)
+            # Sin aviso de duplicado ni lectura cacheada: si se vuelven a subir las fotos, se leen de nuevo
+            cache_ocr.olvidar_ticket(user_id, ticket_seleccionado['fecha'], ticket_seleccionado['monto_total'])
             
             st.success("✅ Ticket eliminado correctamente.")
             time.sleep(2)
             st.rerun() # Recargar la página para actualizar la lista
         except Exception as e:
-            st.error(f"Error al borrar: {e}")
\ No newline at end of file
+            st.error(f"Error al borrar: {e}")
+
+trazas.cerrar()
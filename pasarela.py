@@ -0,0 +1,280 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import trazas
+
+# --- PASARELA DE LLAMADAS AL MODELO ---
+# Envuelve al cliente de Gemini (o a un doble de prueba) con la misma interfaz
+# (client.models.generate_content / generate_content_stream), así extraccion, la cola y el
+# Buscador la usan sin cambios. Una por proceso (backend.gemini), compartida por todos los hilos:
+#  - cubeta de fichas: tasa de pedidos por segundo + tope de llamadas en vuelo. La tasa se adapta:
+#    baja a la mitad con cada 429 y se recupera de a poco con cada respuesta buena.
+#  - reintentos con espera exponencial y jitter para 429, 5xx, timeouts y cortes de conexión.
+#  - pedido de cobertura (hedge) opcional: si la respuesta tarda más de IA_HEDGE_S se lanza un
+#    segundo pedido igual y gana el primero que responde.
+#  - cortacircuitos: tras varias fallas seguidas (5xx, timeouts) deja de llamar un rato y falla al instante.
+# Con worker.py cada proceso tiene su propia pasarela: los límites son por proceso.
+
+def _num(nombre, defecto):
+    return float(os.environ.get(nombre, defecto))
+
+
+RPS = _num("IA_RPS", 4)                       # pedidos por segundo (tasa máxima)
+RAFAGA = _num("IA_RAFAGA", 8)                 # fichas acumulables
+CONCURRENCIA = int(_num("IA_CONCURRENCIA", 8))
+ESPERA_MAX = _num("IA_ESPERA_MAX", 60)        # segundos esperando ficha antes de rendirse
+INTENTOS = int(_num("IA_INTENTOS", 4))
+BACKOFF_BASE, BACKOFF_TOPE = _num("IA_BACKOFF_BASE", 0.5), _num("IA_BACKOFF_TOPE", 20)
+HEDGE_S = _num("IA_HEDGE_S", 0)               # 0 = sin pedido de cobertura
+FALLAS_CORTE = int(_num("IA_FALLAS_CORTE", 5))
+CORTE_S = _num("IA_CORTE_S", 30)
+
+CODIGOS_REINTENTABLES = {408, 429, 500, 502, 503, 504}
+TEXTOS_REINTENTABLES = ('RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'overloaded')
+
+
+class IANoDisponible(RuntimeError):
+    # Cortacircuitos abierto o sin fichas a tiempo: no se llegó a llamar al modelo
+    pass
+
+
+def _codigo(e):
+    for attr in ('code', 'status_code'):
+        v = getattr(e, attr, None)
+        if isinstance(v, int): return v
+    return getattr(getattr(e, 'response', None), 'status_code', None)
+
+
+def reintentable(e):
+    if isinstance(e, IANoDisponible): return False
+    if isinstance(e, (TimeoutError, ConnectionError)): return True
+    if _codigo(e) in CODIGOS_REINTENTABLES: return True
+    nombre = type(e).__name__
+    return 'Timeout' in nombre or 'Connect' in nombre or any(t in str(e) for t in TEXTOS_REINTENTABLES)
+
+
+class Cubeta:
+    # Fichas a 'tasa' por segundo hasta 'rafaga', más un tope de llamadas en vuelo
+    def __init__(self, tasa=RPS, rafaga=RAFAGA, concurrencia=CONCURRENCIA):
+        self.tasa_max, self.tasa, self.rafaga = tasa, tasa, rafaga
+        self.fichas, self.t = rafaga, time.monotonic()
+        self.en_vuelo, self.concurrencia = 0, concurrencia
+        self.frenada = 0.0
+        self._cond = threading.Condition()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.fichas = min(self.rafaga, self.fichas + (ahora - self.t) * self.tasa)
+        self.t = ahora
+
+    def tomar(self, espera_max=ESPERA_MAX):
+        # Bloquea hasta tener ficha y lugar; devuelve False si no llegó a tiempo (espera_max=0: no espera)
+        limite = time.monotonic() + espera_max
+        with self._cond:
+            while True:
+                self._recargar()
+                if self.fichas >= 1 and self.en_vuelo < self.concurrencia:
+                    self.fichas -= 1
+                    self.en_vuelo += 1
+                    return True
+                resta = limite - time.monotonic()
+                if resta <= 0: return False
+                falta = 0.05 if self.fichas >= 1 else (1 - self.fichas) / self.tasa
+                self._cond.wait(min(resta, max(falta, 0.001)))
+
+    def soltar(self):
+        with self._cond:
+            self.en_vuelo -= 1
+            self._cond.notify()
+
+    def frenar(self):
+        # 429: la mitad de la tasa (no menos de un pedido cada 5 s) y sin ráfaga acumulada.
+        # Los 429 de pedidos que ya estaban en vuelo llegan juntos: se frena una vez por segundo.
+        with self._cond:
+            self.fichas = min(self.fichas, 0)
+            if time.monotonic() - self.frenada < 1.0: return
+            self.tasa = max(0.2, self.tasa / 2)
+            self.frenada = time.monotonic()
+
+    def acelerar(self):
+        with self._cond: self.tasa = min(self.tasa_max, self.tasa + self.tasa_max / 20)
+
+
+class Cortacircuitos:
+    # cerrado -> (FALLAS_CORTE fallas seguidas) -> abierto -> (CORTE_S) -> semiabierto: una prueba decide
+    def __init__(self, fallas=FALLAS_CORTE, corte_s=CORTE_S):
+        self.fallas_corte, self.corte_s = fallas, corte_s
+        self.estado, self.fallas, self.abierto_desde, self.probando = 'cerrado', 0, 0.0, False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == 'abierto' and time.monotonic() - self.abierto_desde >= self.corte_s: self.estado = 'semiabierto'
+            if self.estado == 'cerrado': return True
+            if self.estado == 'semiabierto' and not self.probando:
+                self.probando = True
+                return True
+            return False
+
+    def cortado(self):
+        return self.estado == 'abierto' and self.resta_s() > 0
+
+    def resta_s(self):
+        return max(0.0, self.corte_s - (time.monotonic() - self.abierto_desde))
+
+    def liberar(self):
+        # La prueba del semiabierto no llegó a hacerse: queda libre para el próximo pedido
+        with self._lock: self.probando = False
+
+    def exito(self):
+        with self._lock: self.estado, self.fallas, self.probando = 'cerrado', 0, False
+
+    def falla(self):
+        with self._lock:
+            self.fallas += 1
+            if self.estado == 'semiabierto' or self.fallas >= self.fallas_corte:
+                self.estado, self.abierto_desde = 'abierto', time.monotonic()
+            self.probando = False
+
+
+class Pasarela:
+    def __init__(self, cliente, cubeta=None, cortacircuitos=None, intentos=INTENTOS, hedge_s=HEDGE_S):
+        self.cliente, self.intentos, self.hedge_s = cliente, intentos, hedge_s
+        self.cubeta = cubeta or Cubeta()
+        self.circuito = cortacircuitos or Cortacircuitos()
+        self.models = self  # misma forma que genai.Client: pasarela.models.generate_content(...)
+        # Cada pedido del pool tiene su ficha tomada: con 'concurrencia' hilos nunca hace cola
+        self._hedges = ThreadPoolExecutor(max_workers=self.cubeta.concurrencia, thread_name_prefix='hedge') if hedge_s else None
+        self._lock = threading.Lock()
+        self._metricas = {'llamadas': 0, 'ok': 0, 'errores': 0, 'reintentos': 0, 'limitadas': 0, 'rechazadas': 0,
+                          'hedges': 0, 'hedges_ganados': 0, 'espera_ms': 0.0}
+        self._latencias = deque(maxlen=500)
+
+    def _contar(self, **sumas):
+        with self._lock:
+            for k, v in sumas.items(): self._metricas[k] += v
+
+    def metricas(self):
+        with self._lock:
+            m = dict(self._metricas)
+            lat = sorted(self._latencias)
+        m['p50_ms'] = lat[len(lat) // 2] if lat else None
+        m['p95_ms'] = lat[min(len(lat) - 1, int(0.95 * len(lat)))] if lat else None
+        m['tasa_rps'] = round(self.cubeta.tasa, 2)
+        m['en_vuelo'] = self.cubeta.en_vuelo
+        m['circuito'] = self.circuito.estado
+        return m
+
+    # --- UN INTENTO ---
+    def _entrar(self, t):
+        if not self.circuito.permitir():
+            self._contar(rechazadas=1)
+            raise IANoDisponible(f"La IA no responde, se reintenta en {self.circuito.resta_s():.0f} s")
+        t0 = time.perf_counter()
+        if not self.cubeta.tomar():
+            self.circuito.liberar()
+            self._contar(rechazadas=1)
+            raise IANoDisponible("Demasiados pedidos a la IA, probá en un momento")
+        espera = (time.perf_counter() - t0) * 1000
+        t['espera_ms'] = round(t.get('espera_ms', 0) + espera, 2)
+        self._contar(espera_ms=espera)
+
+    def _registrar(self, error=None):
+        if error is None:
+            self.circuito.exito()
+            self.cubeta.acelerar()
+            return
+        if not reintentable(error):  # un pedido mal armado no dice nada de la salud del servicio
+            self.circuito.liberar()
+            return
+        if _codigo(error) == 429 or 'RESOURCE_EXHAUSTED' in str(error):
+            # Saturación: la resuelve la cubeta bajando la tasa, no el cortacircuitos
+            self.cubeta.frenar()
+            self.circuito.liberar()
+            self._contar(limitadas=1)
+        else: self.circuito.falla()
+
+    def _una(self, kwargs):
+        try: r = self.cliente.models.generate_content(**kwargs)
+        except Exception as e:
+            self._registrar(e)
+            raise
+        finally: self.cubeta.soltar()
+        self._registrar()
+        return r
+
+    def _con_cobertura(self, kwargs, t):
+        # Pedido principal y, si tarda más de hedge_s, uno igual en paralelo (solo si hay ficha sin esperar)
+        principal = self._hedges.submit(self._una, kwargs)
+        listos, _ = wait([principal], timeout=self.hedge_s)
+        if listos or self.circuito.estado != 'cerrado' or not self.cubeta.tomar(espera_max=0): return principal.result()
+        self._contar(hedges=1)
+        t['hedge'] = True
+        cobertura = self._hedges.submit(self._una, kwargs)
+        pendientes = {principal, cobertura}
+        while pendientes:
+            listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for f in listos:
+                if f.exception() is None:
+                    if f is cobertura: self._contar(hedges_ganados=1)
+                    return f.result()
+        return principal.result()  # fallaron los dos: se propaga el error del principal
+
+    def _esperar(self, intento, t):
+        espera = random.uniform(0, min(BACKOFF_TOPE, BACKOFF_BASE * 2 ** intento))  # jitter completo
+        self._contar(reintentos=1)
+        t['intentos'] = intento + 2
+        time.sleep(espera)
+
+    # --- INTERFAZ DEL CLIENTE ---
+    def generate_content(self, **kwargs):
+        self._contar(llamadas=1)
+        t0 = time.perf_counter()
+        with trazas.tramo('pasarela ia', intentos=1) as t:
+            for intento in range(self.intentos):
+                self._entrar(t)
+                try:
+                    r = self._con_cobertura(kwargs, t) if self._hedges else self._una(kwargs)
+                    break
+                except Exception as e:
+                    if not reintentable(e) or intento == self.intentos - 1:
+                        self._contar(errores=1)
+                        raise
+                    self._esperar(intento, t)
+        self._contar(ok=1)
+        with self._lock: self._latencias.append(round((time.perf_counter() - t0) * 1000, 1))
+        return r
+
+    def generate_content_stream(self, **kwargs):
+        # Se reintenta solo hasta recibir el primer trozo; un corte a mitad del stream se propaga
+        # (lo ya entregado no se puede deshacer). Sin pedido de cobertura.
+        self._contar(llamadas=1)
+        t0 = time.perf_counter()
+        with trazas.tramo('pasarela ia', intentos=1, stream=True) as t:
+            for intento in range(self.intentos):
+                self._entrar(t)
+                try:
+                    stream = iter(self.cliente.models.generate_content_stream(**kwargs))
+                    primero = next(stream, None)
+                    break
+                except Exception as e:
+                    self.cubeta.soltar()
+                    self._registrar(e)
+                    if not reintentable(e) or intento == self.intentos - 1:
+                        self._contar(errores=1)
+                        raise
+                    self._esperar(intento, t)
+        try:
+            if primero is not None: yield primero
+            yield from stream
+        except Exception as e:
+            self._registrar(e)
+            self._contar(errores=1)
+            raise
+        finally: self.cubeta.soltar()
+        self._registrar()
+        self._contar(ok=1)
+        with self._lock: self._latencias.append(round((time.perf_counter() - t0) * 1000, 1))
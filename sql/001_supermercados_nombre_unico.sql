@@ -0,0 +1,21 @@
+-- Nombre de supermercado único y normalizado (MAYÚSCULAS, espacios simples),
+-- necesario para resolver el id con un solo upsert (on_conflict=nombre) desde ingesta.py.
+
+BEGIN;
+
+UPDATE supermercados SET nombre = upper(regexp_replace(trim(nombre), '\s+', ' ', 'g'));
+
+-- Unificar duplicados: los tickets pasan al primer id y se borran las copias
+WITH dups AS (
+    SELECT id, first_value(id) OVER (PARTITION BY nombre ORDER BY id) AS id_ok FROM supermercados
+)
+UPDATE tickets t SET supermercado_id = d.id_ok
+FROM dups d WHERE t.supermercado_id = d.id AND d.id <> d.id_ok;
+
+DELETE FROM supermercados s
+USING supermercados s2
+WHERE s.nombre = s2.nombre AND s.id > s2.id;
+
+ALTER TABLE supermercados ADD CONSTRAINT supermercados_nombre_key UNIQUE (nombre);
+
+COMMIT;
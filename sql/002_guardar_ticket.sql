@@ -0,0 +1,31 @@
+-- Guarda cabecera + items de un ticket en una sola llamada (RPC) y una sola transacción.
+-- Si falla cualquier insert no queda un ticket huérfano. Devuelve la cantidad de items.
+-- Un ticket repetido dispara la restricción única de tickets (el cliente lo informa como DUPLICADO).
+
+CREATE OR REPLACE FUNCTION guardar_ticket(p_ticket jsonb, p_items jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ticket_id tickets.id%TYPE;
+    v_items integer;
+BEGIN
+    INSERT INTO tickets (user_id, supermercado_id, fecha, hora, monto_total, imagen_url,
+                         sucursal_direccion, sucursal_localidad, sucursal_provincia, sucursal_pais, moneda)
+    SELECT t.user_id, t.supermercado_id, t.fecha, t.hora, t.monto_total, t.imagen_url,
+           t.sucursal_direccion, t.sucursal_localidad, t.sucursal_provincia, t.sucursal_pais, t.moneda
+    FROM jsonb_populate_record(NULL::tickets, p_ticket) t
+    RETURNING id INTO v_ticket_id;
+
+    INSERT INTO items_compra (ticket_id, nombre_producto, cantidad, precio_neto_unitario, unidad_medida, rubro,
+                              marca, producto_generico, contenido_neto, unidad_contenido, codigo_barras)
+    SELECT v_ticket_id, i.nombre_producto, i.cantidad, i.precio_neto_unitario, i.unidad_medida, i.rubro,
+           i.marca, i.producto_generico, i.contenido_neto, i.unidad_contenido, i.codigo_barras
+    FROM jsonb_populate_recordset(NULL::items_compra, coalesce(p_items, '[]'::jsonb)) i;
+
+    GET DIAGNOSTICS v_items = ROW_COUNT;
+    RETURN v_items;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION guardar_ticket(jsonb, jsonb) TO anon, authenticated;
@@ -0,0 +1,100 @@
+-- Agregados calculados en la base: solo viajan las filas ya agrupadas.
+-- Los filtros (fechas, rubro, tipo de comercio, usuario) son parámetros; NULL = sin filtro.
+
+-- Alias de cadenas (mismo contenido que cadenas.ALIAS_CADENAS / TIPO_POR_CADENA)
+CREATE TABLE IF NOT EXISTS alias_cadenas (
+    alias text PRIMARY KEY,
+    cadena text NOT NULL,
+    tipo text NOT NULL DEFAULT 'Supermercado'
+);
+
+INSERT INTO alias_cadenas (alias, cadena, tipo) VALUES
+    ('COTO', 'COTO', 'Supermercado'), ('JUMBO', 'JUMBO', 'Supermercado'), ('CARREFOUR', 'CARREFOUR', 'Supermercado'),
+    ('DIA', 'DIA', 'Supermercado'), ('DISCO', 'DISCO', 'Supermercado'), ('VEA', 'VEA', 'Supermercado'),
+    ('MAKRO', 'MAKRO', 'Supermercado'), ('FARMACITY', 'FARMACITY', 'Farmacia'), ('SIMPLICITY', 'FARMACITY', 'Farmacia'),
+    ('FARMCITY', 'FARMACITY', 'Farmacia'), ('SELMA', 'SELMA', 'Farmacia')
+ON CONFLICT (alias) DO NOTHING;
+
+-- Nombre de sucursal -> cadena canónica (palabra completa, sin acentos; igual que cadenas.canonizar)
+CREATE OR REPLACE FUNCTION cadena_canonica(p_nombre text)
+RETURNS text
+LANGUAGE sql STABLE
+AS $$
+    WITH n AS (
+        SELECT regexp_replace(trim(translate(upper(coalesce(p_nombre, '')), 'ÁÉÍÓÚÜÑÀÈÌÒÙ', 'AEIOUUNAEIOU')), '\s+', ' ', 'g') AS nombre
+    )
+    SELECT coalesce(
+        (SELECT a.cadena FROM alias_cadenas a, n
+         WHERE n.nombre ~ ('(^|[^A-Z0-9])' || a.alias || '([^A-Z0-9]|$)')
+         ORDER BY length(a.alias) DESC LIMIT 1),
+        (SELECT nombre FROM n)
+    );
+$$;
+
+-- Base común: una fila por item con precio válido, cadena y tipo ya resueltos por supermercado
+CREATE OR REPLACE VIEW v_items_analisis AS
+WITH sup AS (
+    SELECT s.id, cadena_canonica(s.nombre) AS cadena FROM supermercados s
+)
+SELECT t.user_id, t.fecha, coalesce(i.rubro, 'Otros') AS rubro,
+       coalesce(i.producto_generico, i.nombre_producto) AS producto_final,
+       coalesce(sup.cadena, 'DESCONOCIDO') AS cadena,
+       coalesce((SELECT a.tipo FROM alias_cadenas a WHERE a.alias = sup.cadena), 'Supermercado') AS tipo_comercio,
+       i.precio_neto_unitario::float8 AS precio, i.cantidad::float8 AS cantidad,
+       (i.precio_neto_unitario * i.cantidad)::float8 AS gasto_total
+FROM items_compra i
+JOIN tickets t ON t.id = i.ticket_id
+LEFT JOIN sup ON sup.id = t.supermercado_id
+WHERE i.precio_neto_unitario > 0;
+
+-- Gasto por producto con participación, acumulado y clase ABC (Pareto)
+CREATE OR REPLACE FUNCTION pareto_productos(
+    p_desde date DEFAULT NULL, p_hasta date DEFAULT NULL, p_rubro text DEFAULT NULL,
+    p_tipo text DEFAULT NULL, p_user_id text DEFAULT NULL
+)
+RETURNS TABLE (producto_final text, gasto_total float8, porcentaje float8, acumulado float8, categoria text)
+LANGUAGE sql STABLE
+AS $$
+    WITH g AS (
+        SELECT v.producto_final, sum(v.gasto_total) AS gasto_total
+        FROM v_items_analisis v
+        WHERE (p_desde IS NULL OR v.fecha >= p_desde) AND (p_hasta IS NULL OR v.fecha <= p_hasta)
+          AND (p_rubro IS NULL OR v.rubro = p_rubro) AND (p_tipo IS NULL OR v.tipo_comercio = p_tipo)
+          AND (p_user_id IS NULL OR v.user_id::text = p_user_id)
+        GROUP BY v.producto_final
+    ), p AS (
+        SELECT g.producto_final, g.gasto_total,
+               100 * g.gasto_total / sum(g.gasto_total) OVER () AS porcentaje,
+               100 * sum(g.gasto_total) OVER (ORDER BY g.gasto_total DESC, g.producto_final ROWS UNBOUNDED PRECEDING)
+                   / sum(g.gasto_total) OVER () AS acumulado
+        FROM g
+    )
+    SELECT p.producto_final, p.gasto_total, p.porcentaje, p.acumulado,
+           CASE WHEN p.acumulado <= 80 THEN 'A - Vital (80% Gasto)'
+                WHEN p.acumulado <= 95 THEN 'B - Importante'
+                ELSE 'C - Trivial' END
+    FROM p
+    ORDER BY p.gasto_total DESC, p.producto_final;
+$$;
+
+-- Precio promedio / mínimo / máximo por cadena (y por producto si p_por_producto)
+CREATE OR REPLACE FUNCTION precios_por_cadena(
+    p_desde date DEFAULT NULL, p_hasta date DEFAULT NULL, p_rubro text DEFAULT NULL,
+    p_tipo text DEFAULT NULL, p_producto text DEFAULT NULL, p_por_producto boolean DEFAULT false
+)
+RETURNS TABLE (cadena text, producto_final text, compras bigint, precio_promedio float8, precio_min float8, precio_max float8)
+LANGUAGE sql STABLE
+AS $$
+    SELECT v.cadena, CASE WHEN p_por_producto THEN v.producto_final END,
+           count(*), avg(v.precio), min(v.precio), max(v.precio)
+    FROM v_items_analisis v
+    WHERE (p_desde IS NULL OR v.fecha >= p_desde) AND (p_hasta IS NULL OR v.fecha <= p_hasta)
+      AND (p_rubro IS NULL OR v.rubro = p_rubro) AND (p_tipo IS NULL OR v.tipo_comercio = p_tipo)
+      AND (p_producto IS NULL OR v.producto_final = p_producto)
+    GROUP BY 1, 2
+    ORDER BY 4;
+$$;
+
+GRANT SELECT ON alias_cadenas, v_items_analisis TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION pareto_productos(date, date, text, text, text) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION precios_por_cadena(date, date, text, text, text, boolean) TO anon, authenticated;
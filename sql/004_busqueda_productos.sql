@@ -0,0 +1,57 @@
+-- Búsqueda difusa de productos para el Buscador: trigramas (pg_trgm) sobre nombre, genérico y marca,
+-- sin acentos ni mayúsculas. El índice GIN se mantiene solo a medida que entran tickets.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() no es IMMUTABLE; este envoltorio fija el diccionario para poder indexar
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+ALTER TABLE items_compra ADD COLUMN IF NOT EXISTS texto_busqueda text
+    GENERATED ALWAYS AS (lower(f_unaccent(
+        coalesce(nombre_producto, '') || ' ' || coalesce(producto_generico, '') || ' ' || coalesce(marca, '')
+    ))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_items_texto_busqueda ON items_compra USING gin (texto_busqueda gin_trgm_ops);
+
+-- Fracción de los trigramas de la consulta presentes en el texto (palabras en cualquier orden)
+CREATE OR REPLACE FUNCTION cobertura_trigramas(p_consulta text, p_texto text)
+RETURNS float4
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT CASE WHEN cardinality(show_trgm(p_consulta)) = 0 THEN 0::float4 ELSE
+        (SELECT count(*) FROM unnest(show_trgm(p_consulta)) g WHERE g = ANY (show_trgm(p_texto)))::float4
+        / cardinality(show_trgm(p_consulta)) END
+$$;
+
+-- Compras cuyo producto se parece al texto (palabras desordenadas, acentos, errores de OCR).
+-- El índice filtra candidatos (<%) y se ordena por cobertura; a igual puntaje, la más barata primero.
+CREATE OR REPLACE FUNCTION buscar_productos(p_texto text, p_limite integer DEFAULT 200, p_minimo float4 DEFAULT 0.5)
+RETURNS TABLE (precio_neto_unitario float8, nombre_producto text, producto_generico text, marca text,
+               codigo_barras text, fecha date, supermercado text, puntaje float4)
+LANGUAGE plpgsql STABLE
+AS $$
+DECLARE
+    q text := lower(f_unaccent(p_texto));
+BEGIN
+    PERFORM set_config('pg_trgm.word_similarity_threshold', '0.3', true);
+    RETURN QUERY
+    SELECT * FROM (
+        SELECT i.precio_neto_unitario::float8, i.nombre_producto::text, i.producto_generico::text, i.marca::text,
+               i.codigo_barras::text, t.fecha::date, coalesce(s.nombre, 'Desconocido')::text,
+               cobertura_trigramas(q, i.texto_busqueda) AS puntaje
+        FROM items_compra i
+        JOIN tickets t ON t.id = i.ticket_id
+        LEFT JOIN supermercados s ON s.id = t.supermercado_id
+        WHERE q <% i.texto_busqueda AND i.precio_neto_unitario > 0
+    ) r
+    WHERE r.puntaje >= p_minimo
+    ORDER BY r.puntaje DESC, r.precio_neto_unitario
+    LIMIT p_limite;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION buscar_productos(text, integer, float4) TO anon, authenticated;
@@ -0,0 +1,29 @@
+-- Pareto y precios por cadena en un solo valor json por llamada.
+-- PostgREST corta las RPC que devuelven filas en max-rows (1000 en Supabase), y pedirlas por
+-- páginas con .range recalcula el GROUP BY entero en cada página. Un json escalar no se corta:
+-- el agregado se calcula una vez y viaja completo.
+
+CREATE OR REPLACE FUNCTION pareto_productos_json(
+    p_desde date DEFAULT NULL, p_hasta date DEFAULT NULL, p_rubro text DEFAULT NULL,
+    p_tipo text DEFAULT NULL, p_user_id text DEFAULT NULL
+)
+RETURNS json
+LANGUAGE sql STABLE
+AS $$
+    SELECT coalesce(json_agg(p ORDER BY p.gasto_total DESC, p.producto_final), '[]'::json)
+    FROM pareto_productos(p_desde, p_hasta, p_rubro, p_tipo, p_user_id) p;
+$$;
+
+CREATE OR REPLACE FUNCTION precios_por_cadena_json(
+    p_desde date DEFAULT NULL, p_hasta date DEFAULT NULL, p_rubro text DEFAULT NULL,
+    p_tipo text DEFAULT NULL, p_producto text DEFAULT NULL, p_por_producto boolean DEFAULT false
+)
+RETURNS json
+LANGUAGE sql STABLE
+AS $$
+    SELECT coalesce(json_agg(p ORDER BY p.precio_promedio), '[]'::json)
+    FROM precios_por_cadena(p_desde, p_hasta, p_rubro, p_tipo, p_producto, p_por_producto) p;
+$$;
+
+GRANT EXECUTE ON FUNCTION pareto_productos_json(date, date, text, text, text) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION precios_por_cadena_json(date, date, text, text, text, boolean) TO anon, authenticated;
@@ -0,0 +1,94 @@
+import math
+import numpy as np
+import pandas as pd
+import busqueda
+import trazas
+
+# --- TABLAS PAGINADAS ---
+# El filtro de texto, el orden y el corte de página se resuelven sobre posiciones (enteros)
+# del DataFrame cacheado: no se copia el historial y al navegador viaja solo la página visible.
+
+TAMANOS = (25, 50, 100, 250)
+
+
+def _es_texto(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)
+
+
+def _codigos(serie, posiciones):
+    # (códigos por fila, valores distintos) sin recorrer strings fila por fila; -1 = nulo
+    if isinstance(serie.dtype, pd.CategoricalDtype): return serie.cat.codes.to_numpy()[posiciones], serie.cat.categories
+    return pd.factorize(serie.to_numpy()[posiciones])
+
+
+def _coincide(serie, posiciones, texto):
+    codigos, unicos = _codigos(serie, posiciones)
+    ok = np.array([texto in busqueda.normalizar(u) for u in unicos] + [False])  # el -1 cae en el False agregado
+    return ok[codigos]
+
+
+def _clave(serie, posiciones):
+    # Clave numérica de orden (float, NaN = nulo) para cualquier tipo de columna
+    if _es_texto(serie):
+        codigos, unicos = _codigos(serie, posiciones)
+        rango = np.append(np.argsort(np.argsort(np.asarray(unicos, dtype=str), kind='stable')).astype('float64'), np.nan)
+        return rango[codigos]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        v = serie.to_numpy(dtype='datetime64[ns]')[posiciones]
+        return np.where(np.isnat(v), np.nan, v.astype('int64').astype('float64'))
+    return serie.to_numpy(dtype='float64', na_value=np.nan)[posiciones]
+
+
+def posiciones_tabla(df, posiciones=None, texto='', orden=None, ascendente=True, columnas_texto=None):
+    # Posiciones de 'df' que contienen 'texto' (sin acentos ni mayúsculas) en alguna columna de texto,
+    # ordenadas por 'orden'. Los nulos quedan al final en los dos sentidos.
+    posiciones = np.arange(len(df)) if posiciones is None else np.asarray(posiciones)
+    texto = busqueda.normalizar(texto)
+    if texto:
+        columnas_texto = [c for c in (columnas_texto or df.columns) if _es_texto(df[c])]
+        if not columnas_texto: return posiciones[:0]
+        mascara = np.zeros(len(posiciones), dtype=bool)
+        for c in columnas_texto: mascara |= _coincide(df[c], posiciones, texto)
+        posiciones = posiciones[mascara]
+    if orden:
+        clave = _clave(df[orden], posiciones)
+        posiciones = posiciones[np.argsort(clave if ascendente else -clave, kind='stable')]
+    return posiciones
+
+
+def pagina(df, posiciones, numero, tamano, columnas):
+    # Solo las filas de la página 'numero' (desde 0): el único recorte que se materializa
+    return df.iloc[posiciones[numero * tamano:(numero + 1) * tamano]][columnas]
+
+
+def tabla_paginada(df, columnas, clave, posiciones=None, column_config=None, orden=None, ascendente=False, tamanos=TAMANOS, vista=None, filtros=None):
+    # Tabla con filtro de texto, orden y tamaño de página. 'clave' separa el estado de cada tabla.
+    # Con 'vista' (analitica.Vista) el filtro, el conteo y la página salen de SQL con 'filtros'; 'df' no se usa.
+    import streamlit as st  # solo la parte visual necesita Streamlit
+    column_config = column_config or {}
+    etiqueta = lambda c: column_config[c] if isinstance(column_config.get(c), str) else (column_config.get(c) or {}).get('label') or c
+
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    texto = c1.text_input("🔍 Filtrar", key=f"{clave}_texto", placeholder="Texto a buscar...")
+    col_orden = c2.selectbox("Ordenar por", columnas, index=columnas.index(orden) if orden in columnas else 0, format_func=etiqueta, key=f"{clave}_orden")
+    asc = c3.toggle("Ascendente", value=ascendente, key=f"{clave}_asc")
+    tamano = c4.selectbox("Filas", tamanos, key=f"{clave}_tamano")
+
+    filtros = filtros or {}
+    with trazas.tramo(f"tabla {clave}") as t:
+        if vista is not None: total = vista.contar(texto, columnas, **filtros)
+        else:
+            pos = posiciones_tabla(df, posiciones, texto, col_orden, asc, columnas_texto=columnas)
+            total = len(pos)
+        t['filas'] = total
+    paginas = max(1, math.ceil(total / tamano))
+    # Si el filtro achicó el resultado, la página guardada puede quedar fuera de rango
+    if st.session_state.get(f"{clave}_pagina", 1) > paginas: st.session_state[f"{clave}_pagina"] = paginas
+    numero = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, key=f"{clave}_pagina") - 1
+
+    with trazas.tramo(f"tabla {clave} página", filas=min(tamano, max(0, total - numero * tamano))):
+        if vista is not None: visible = vista.filas(columnas, col_orden, asc, tamano, numero * tamano, texto, columnas, **filtros)
+        else: visible = pagina(df, pos, numero, tamano, columnas)
+        st.dataframe(visible, column_config=column_config, use_container_width=True, hide_index=True)
+    desde = numero * tamano + 1 if total else 0
+    st.caption(f"Filas {desde:,}–{min(total, (numero + 1) * tamano):,} de {total:,}")
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- TRAZAS DE RENDIMIENTO ---
+# Cada ejecución de una página (o cada ticket que procesa la cola) es una traza con tramos
+# medidos: consulta / sincronización, carga y aplanado, caché, RPC, gráficos, IA y guardado,
+# con filas, bytes y hit/miss de caché cuando aplica. Las trazas terminadas van a un JSONL local
+# (una por línea) y las últimas quedan en memoria para el panel de perfilado de los admins.
+# Un tramo abierto fuera de una traza (hilos de fondo, scripts) se guarda como traza propia.
+
+RUTA_TRAZAS = os.environ.get("RUTA_TRAZAS") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "trazas.jsonl")
+EXPORTAR = os.environ.get("TRAZAS_JSONL", "1") != "0"
+MAX_MB = float(os.environ.get("TRAZAS_MAX_MB", 20))  # al pasarse se rota a trazas.jsonl.1
+MAX_RECIENTES = 200
+
+_actual = contextvars.ContextVar('traza', default=None)
+_nivel = contextvars.ContextVar('nivel_tramo', default=0)
+_recientes = deque(maxlen=MAX_RECIENTES)
+_lock = threading.Lock()
+
+
+def _nueva(nombre, atributos):
+    return {'id': uuid.uuid4().hex[:12], 'nombre': nombre, 'inicio': datetime.now().isoformat(timespec='milliseconds'),
+            '_t0': time.perf_counter(), 'ms': None, 'estado': 'abierta', **atributos, 'tramos': []}
+
+
+def _terminar(traza, estado='ok'):
+    if traza['ms'] is not None: return
+    traza['ms'] = round((time.perf_counter() - traza['_t0']) * 1000, 2)
+    traza['estado'] = estado
+    with _lock:
+        _recientes.append(traza)
+        if not EXPORTAR: return
+        try:
+            os.makedirs(os.path.dirname(RUTA_TRAZAS), exist_ok=True)
+            if os.path.exists(RUTA_TRAZAS) and os.path.getsize(RUTA_TRAZAS) > MAX_MB * 2**20: os.replace(RUTA_TRAZAS, RUTA_TRAZAS + '.1')
+            with open(RUTA_TRAZAS, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({k: v for k, v in traza.items() if k != '_t0'}, ensure_ascii=False, default=str) + '\n')
+        except OSError: pass  # las trazas nunca frenan la app
+
+
+@contextmanager
+def tramo(nombre, **atributos):
+    # with trazas.tramo('cargar', filas=...) as t: ... t['bytes'] = ...   (el dict admite más atributos)
+    traza = _actual.get()
+    propia = traza is None or traza['ms'] is not None
+    if propia:
+        traza = _nueva(nombre, {})
+        token_traza = _actual.set(traza)
+    nivel = _nivel.get()
+    token_nivel = _nivel.set(nivel + 1)
+    t = {'nombre': nombre, 'nivel': nivel, 'desde_ms': round((time.perf_counter() - traza['_t0']) * 1000, 2), **atributos}
+    t0 = time.perf_counter()
+    try: yield t
+    except Exception as e:
+        t['error'] = type(e).__name__
+        raise
+    finally:
+        t['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+        traza['tramos'].append(t)
+        _nivel.reset(token_nivel)
+        if propia:
+            _actual.reset(token_traza)
+            _terminar(traza, 'error' if 'error' in t else 'ok')
+
+
+@contextmanager
+def traza(nombre, **atributos):
+    # Traza explícita para trabajos de fondo (un ticket de la cola, un lote)
+    t = _nueva(nombre, atributos)
+    token = _actual.set(t)
+    try: yield t
+    except Exception:
+        _terminar(t, 'error')
+        raise
+    finally:
+        _actual.reset(token)
+        _terminar(t)
+
+
+def recientes(nombre=None):
+    with _lock: return [t for t in _recientes if nombre is None or t['nombre'] == nombre]
+
+
+# --- PÁGINAS DE STREAMLIT ---
+# Una página no tiene un 'with' que la envuelva: iniciar() abre la traza al principio del script y
+# cerrar() la termina y dibuja el panel al final. Si el script cortó antes (st.stop, st.rerun), la
+# traza queda abierta en la sesión y el próximo iniciar() la cierra como 'cortada'.
+
+def iniciar(pagina):
+    import streamlit as st
+    previa = st.session_state.get('_traza')
+    if previa is not None: _terminar(previa, 'cortada')
+    usuario = st.session_state.get('user')
+    t = _nueva(pagina, {'usuario': getattr(usuario, 'email', None)})
+    st.session_state['_traza'] = t
+    _actual.set(t)
+    _nivel.set(0)
+    return t
+
+
+def cerrar():
+    import streamlit as st
+    t = st.session_state.pop('_traza', None)
+    if t is None: return
+    _terminar(t)
+    _actual.set(None)
+    panel(t)
+
+
+def grafico(chart, nombre='grafico'):
+    # st.altair_chart medido: la serialización a Vega-Lite (con todos los datos) pasa acá
+    import streamlit as st
+    datos = getattr(chart, 'data', None)
+    if not hasattr(datos, '__len__'): datos = getattr((getattr(chart, 'layer', None) or [None])[0], 'data', None)
+    with tramo(nombre, filas=len(datos) if hasattr(datos, '__len__') else None):
+        st.altair_chart(chart, use_container_width=True)
+
+
+def es_admin():
+    # Emails con acceso al panel: clave ADMIN_EMAILS separada por comas (secrets o .env)
+    import streamlit as st
+    import backend
+    usuario = st.session_state.get('user')
+    admins = {e.strip().lower() for e in (backend.clave("ADMIN_EMAILS") or '').split(',') if e.strip()}
+    return bool(usuario and getattr(usuario, 'email', '') and usuario.email.lower() in admins)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))] if valores else None
+
+
+def panel(t):
+    import streamlit as st
+    if not es_admin(): return
+    import pandas as pd
+    with st.sidebar.expander(f"⏱️ Perfilado · {t['ms']:.0f} ms"):
+        tramos = pd.DataFrame(t['tramos'])
+        if not tramos.empty:
+            tramos = tramos.sort_values('desde_ms')
+            tramos['nombre'] = ['  ' * n + x for n, x in zip(tramos['nivel'], tramos['nombre'])]
+            st.dataframe(tramos.drop(columns=['nivel']), hide_index=True, use_container_width=True)
+        previas = [x['ms'] for x in recientes(t['nombre'])]
+        st.caption(f"{t['nombre']}: {len(previas)} ejecuciones · p50 {_percentil(previas, 0.5):.0f} ms · p95 {_percentil(previas, 0.95):.0f} ms")
+        jsonl = '\n'.join(json.dumps({k: v for k, v in x.items() if k != '_t0'}, ensure_ascii=False, default=str) for x in recientes())
+        st.download_button("Descargar trazas (JSONL)", jsonl, file_name="trazas.jsonl", mime="application/jsonl")
+        if EXPORTAR: st.caption(f"Exportadas en {RUTA_TRAZAS}")
@@ -0,0 +1,27 @@
+# Trabajador de tickets sin interfaz: procesa la cola (cola.py) por fuera de Streamlit.
+# Uso: python worker.py [hilos]      (con COLA_SOLO_EXTERNA=1 la app deja de procesar por su cuenta)
+import sys
+import signal
+import threading
+import backend
+import cola
+import ingesta
+
+if __name__ == "__main__":
+    # Sin sesión de usuario: conviene una clave de servicio para no chocar con RLS
+    try:
+        supabase = backend.supabase(servicio=True)
+        client = backend.gemini()
+    except RuntimeError as e: sys.exit(f"❌ {e}")
+    ingesta.precargar_supers(supabase)
+
+    hilos = int(sys.argv[1]) if len(sys.argv) > 1 else cola.HILOS
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    trabajadores = [threading.Thread(target=cola.trabajar, args=(supabase, client, parar), daemon=True) for _ in range(hilos)]
+    for t in trabajadores: t.start()
+    print(f"🧠 Worker de tickets con {hilos} hilos. Cola: {cola.RUTA_COLA}")
+    try:
+        while not parar.is_set(): parar.wait(1)
+    except KeyboardInterrupt: parar.set()
+    for t in trabajadores: t.join()